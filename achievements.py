@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成就规则引擎
+==========
+
+modern-demo.html 的 checkAchievements() 每次更新统计都把 achievements
+数组从头到尾检查一遍。规则一多、会话一多，这种线性扫描就成了每个节拍的
+主要开销。本模块在服务端按指标为规则建立阈值索引：
+
+- 规则按 (指标, 文本, 最少按键数, 限时) 分组，组内阈值升序排列；
+- 每个会话在每组里只记一个游标：阈值不超过历史最高值的规则都已解锁，
+  游标之后的才可能新触发，一次二分查找就能找出本次新解锁的全部规则；
+- evaluate() 对一批会话逐组向量化查找（安装了 NumPy 时），
+  每个节拍的开销与分组数和会话数成正比，与规则总数基本无关。
+
+指标取自 GameStatistics 兼容对象（ScoringSession、SlottedGameStatistics、
+SessionTable 的视图），见 METRICS。
+"""
+
+import argparse
+import bisect
+import json
+import math
+import random
+import time
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 可用的指标
+METRICS = ("wpm", "accuracy", "combo", "max_combo", "correct_chars",
+           "total_chars", "score", "completed_levels", "elapsed")
+
+# passage 为 None 时适用于所有文本；min_chars 是总按键数下限；
+# within 为限时秒数：会话开始 within 秒之后不再触发
+Rule = namedtuple("Rule", "id metric threshold title desc passage min_chars within",
+                  defaults=("", "", None, 0, None))
+
+# 与 modern-demo.html 中的 achievements 对应；准确率类规则与页面的
+# perfectionist 一样要求至少 11 次按键，避免第一个字符就解锁
+DEFAULT_RULES = (
+    Rule("speed_demon", "wpm", 50, "🚀 Speed Demon", "Reached 50+ WPM!"),
+    Rule("accuracy_master", "accuracy", 95, "🎯 Accuracy Master", "95%+ accuracy!",
+         min_chars=11),
+    Rule("combo_king", "combo", 20, "🔥 Combo King", "20+ character combo!"),
+    Rule("perfectionist", "accuracy", 100, "💎 Perfectionist", "100% accuracy!",
+         min_chars=11),
+    Rule("lightning_fast", "wpm", 80, "⚡ Lightning Fast", "80+ WPM achieved!"),
+)
+
+
+def load_rules(path):
+    """从 JSON 文件读取规则列表（每条规则一个对象，字段同 Rule）"""
+    with open(path, encoding="utf-8") as f:
+        return [Rule(**item) for item in json.load(f)]
+
+
+def collect_metrics(stats_list, now=None):
+    """从一批 GameStatistics 兼容对象收集指标，返回 {指标: 列表}
+
+    对象缺少的指标记为 NaN，依赖它的规则不会触发。
+    """
+    columns = {name: [] for name in METRICS}
+    nan = math.nan
+    for stats in stats_list:
+        correct = stats.correct_chars
+        total = correct + stats.incorrect_chars
+        columns["correct_chars"].append(correct)
+        columns["total_chars"].append(total)
+        columns["accuracy"].append(stats.get_accuracy())
+        columns["combo"].append(stats.combo)
+        columns["max_combo"].append(stats.max_combo)
+        columns["score"].append(getattr(stats, "score", nan))
+        columns["completed_levels"].append(getattr(stats, "completed_levels", nan))
+        get_wpm = getattr(stats, "get_wpm", None)
+        columns["wpm"].append(get_wpm(now) if get_wpm is not None else nan)
+        # 与 get_wpm() 一样，没有给出 now 时按最后一次按键计时
+        start_time = getattr(stats, "start_time", None)
+        end_time = now if now is not None else getattr(stats, "last_time", None)
+        if start_time is None or end_time is None:
+            columns["elapsed"].append(nan)
+        else:
+            columns["elapsed"].append(end_time - start_time)
+    return columns
+
+
+class _RuleGroup:
+    """同一 (指标, 文本, 最少按键数, 限时) 的规则，按阈值升序"""
+
+    __slots__ = ("index", "metric", "min_chars", "within", "rules", "thresholds",
+                 "thresholds_array")
+
+    def __init__(self, index, key, rules):
+        self.index = index
+        self.metric, _, self.min_chars, self.within = key
+        self.rules = sorted(rules, key=lambda rule: rule.threshold)
+        self.thresholds = [float(rule.threshold) for rule in self.rules]
+        self.thresholds_array = (np.array(self.thresholds) if np is not None
+                                 else None)
+
+
+class AchievementEngine:
+    """按阈值索引的成就引擎
+
+    register() 为会话分配一行，evaluate() 按批次更新并返回新解锁的
+    (行号, Rule)。每条规则对每个会话最多触发一次。
+    use_numpy=False 时强制使用纯 Python 实现。
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, use_numpy=None):
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        rules = list(rules)
+        seen = set()
+        grouped = {}
+        for rule in rules:
+            if rule.metric not in METRICS:
+                raise ValueError(f"unknown metric {rule.metric!r} in rule {rule.id!r}")
+            if rule.id in seen:
+                raise ValueError(f"duplicate rule id {rule.id!r}")
+            seen.add(rule.id)
+            key = (rule.metric, rule.passage, rule.min_chars, rule.within)
+            grouped.setdefault(key, []).append(rule)
+
+        self.rules = rules
+        self.groups = [_RuleGroup(i, key, members)
+                       for i, (key, members) in enumerate(grouped.items())]
+        # 通用分组，以及按文本编号索引的专属分组
+        self._global_groups = []
+        self._passage_codes = {}
+        self._passage_groups = {}
+        for group, key in zip(self.groups, grouped):
+            passage = key[1]
+            if passage is None:
+                self._global_groups.append(group)
+            else:
+                code = self._passage_codes.setdefault(passage, len(self._passage_codes))
+                self._passage_groups.setdefault(code, []).append(group)
+
+        # 游标表：每组一行、每个会话一列
+        self._capacity = 0
+        self._cursors = None
+        self._passages = None
+        self._free = []
+        self._size = 0
+        self._grow(64)
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self, capacity):
+        groups = len(self.groups)
+        if self.use_numpy:
+            cursors = np.zeros((groups, capacity), dtype=np.int32)
+            passages = np.full(capacity, -1, dtype=np.int32)
+            if self._cursors is not None:
+                cursors[:, :self._capacity] = self._cursors
+                passages[:self._capacity] = self._passages
+        else:
+            cursors = [[0] * capacity for _ in range(groups)]
+            passages = [-1] * capacity
+            if self._cursors is not None:
+                for row, old in zip(cursors, self._cursors):
+                    row[:self._capacity] = old
+                passages[:self._capacity] = self._passages
+        self._free.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._cursors = cursors
+        self._passages = passages
+        self._capacity = capacity
+
+    def register(self, passage=None):
+        """为一个会话分配一行，passage 决定哪些文本专属规则适用"""
+        if not self._free:
+            self._grow(self._capacity * 2)
+        row = self._free.pop()
+        for cursors in self._cursors:
+            cursors[row] = 0
+        self._passages[row] = self._passage_codes.get(passage, -1)
+        self._size += 1
+        return row
+
+    def release(self, row):
+        """释放一行"""
+        self._passages[row] = -1
+        self._free.append(row)
+        self._size -= 1
+
+    def unlocked(self, row):
+        """该行已解锁的规则"""
+        return [rule for group in self.groups
+                for rule in group.rules[:int(self._cursors[group.index][row])]]
+
+    def evaluate(self, rows, metrics):
+        """按一批会话的最新指标求值，返回本次新解锁的 [(行号, Rule)]
+
+        metrics 为 {指标: 与 rows 等长的序列}，可以来自 collect_metrics()。
+        只需提供规则用到的指标；没有用到的指标不会被读取。
+        """
+        if not self.use_numpy:
+            return self._evaluate_python(list(rows), metrics)
+        rows = np.asarray(rows, dtype=np.intp)
+        if not len(rows):
+            return []
+        arrays = {}
+
+        def column(name):
+            if name not in arrays:
+                arrays[name] = np.asarray(metrics[name], dtype=float)
+            return arrays[name]
+
+        unlocked = []
+        everyone = np.arange(len(rows))
+        for group in self._global_groups:
+            self._fire(group, rows, everyone, column, unlocked)
+
+        if self._passage_groups:
+            codes = self._passages[rows]
+            order = np.argsort(codes, kind="stable")
+            present, starts = np.unique(codes[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            for code, start, end in zip(present.tolist(), starts, ends):
+                groups = self._passage_groups.get(code)
+                if groups:
+                    members = order[start:end]
+                    for group in groups:
+                        self._fire(group, rows[members], members, column, unlocked)
+        return unlocked
+
+    def _fire(self, group, rows, members, column, unlocked):
+        values = column(group.metric)[members]
+        cursors = self._cursors[group.index]
+        current = cursors[rows]
+        reached = np.searchsorted(group.thresholds_array, values, side="right")
+        hit = reached > current
+        # NaN 会被排到最后，不能当作超过所有阈值
+        hit &= ~np.isnan(values)
+        if group.min_chars:
+            hit &= column("total_chars")[members] >= group.min_chars
+        if group.within is not None:
+            hit &= column("elapsed")[members] <= group.within
+        if not hit.any():
+            return
+        hit_rows = rows[hit]
+        new = reached[hit]
+        rules = group.rules
+        for row, start, end in zip(hit_rows.tolist(), current[hit].tolist(), new.tolist()):
+            for rule in rules[start:end]:
+                unlocked.append((row, rule))
+        cursors[hit_rows] = new
+
+    def _evaluate_python(self, rows, metrics):
+        """没有 NumPy 时逐会话二分查找"""
+        passage_groups = self._passage_groups
+        unlocked = []
+        for i, row in enumerate(rows):
+            groups = self._global_groups
+            extra = passage_groups.get(self._passages[row])
+            if extra:
+                groups = groups + extra
+            for group in groups:
+                value = metrics[group.metric][i]
+                if value != value:
+                    continue
+                if group.min_chars and metrics["total_chars"][i] < group.min_chars:
+                    continue
+                if group.within is not None and not metrics["elapsed"][i] <= group.within:
+                    continue
+                cursors = self._cursors[group.index]
+                start = cursors[row]
+                end = bisect.bisect_right(group.thresholds, value)
+                if end > start:
+                    unlocked.extend((row, rule) for rule in group.rules[start:end])
+                    cursors[row] = end
+        return unlocked
+
+
+def evaluate_linear(rules, rows, metrics, unlocked_sets, passages):
+    """页面 checkAchievements() 的做法：每个会话逐条检查全部规则，用作基准对照"""
+    unlocked = []
+    for i, row in enumerate(rows):
+        done = unlocked_sets[row]
+        for rule in rules:
+            if rule.id in done:
+                continue
+            if rule.passage is not None and rule.passage != passages[row]:
+                continue
+            value = metrics[rule.metric][i]
+            if value != value or value < rule.threshold:
+                continue
+            if metrics["total_chars"][i] < rule.min_chars:
+                continue
+            if rule.within is not None and not metrics["elapsed"][i] <= rule.within:
+                continue
+            done.add(rule.id)
+            unlocked.append((row, rule))
+    return unlocked
+
+
+def synthesize_rules(count, passages=50, seed=11):
+    """生成 count 条规则：各种指标、文本专属、按键数下限与限时规则混合"""
+    rng = random.Random(seed)
+    scales = {"wpm": 120, "accuracy": 100, "combo": 200, "max_combo": 400,
+              "correct_chars": 5000, "total_chars": 6000, "score": 50,
+              "completed_levels": 20}
+    rules = []
+    for i in range(count):
+        metric = rng.choice(list(scales))
+        kind = rng.random()
+        passage = f"p{rng.randrange(passages)}" if kind < 0.3 else None
+        min_chars = rng.choice((10, 50, 200)) if metric == "accuracy" else 0
+        within = rng.choice((60, 120, 300)) if 0.3 <= kind < 0.4 else None
+        threshold = round(rng.uniform(0.05, 1.0) * scales[metric], 1)
+        rules.append(Rule(f"rule-{i}", metric, threshold, f"Rule {i}", "",
+                          passage, min_chars, within))
+    return rules
+
+
+class _SyntheticStudent:
+    """基准用的模拟学生：统计随节拍增长"""
+
+    __slots__ = ("correct_chars", "incorrect_chars", "combo", "max_combo", "score",
+                 "completed_levels", "start_time", "speed", "skill")
+
+    def __init__(self, rng):
+        self.correct_chars = 0
+        self.incorrect_chars = 0
+        self.combo = 0
+        self.max_combo = 0
+        self.score = 0
+        self.completed_levels = 0
+        self.start_time = 0.0
+        self.speed = rng.uniform(2, 8)
+        self.skill = rng.uniform(0.85, 0.995)
+
+    def advance(self, rng):
+        for _ in range(max(1, round(rng.gauss(self.speed, 1)))):
+            if rng.random() < self.skill:
+                self.correct_chars += 1
+                self.combo += 1
+                if self.combo > self.max_combo:
+                    self.max_combo = self.combo
+            else:
+                self.incorrect_chars += 1
+                self.combo = 0
+        if self.correct_chars // 300 > self.completed_levels:
+            self.completed_levels += 1
+            self.score += 1
+
+    def get_accuracy(self):
+        total = self.correct_chars + self.incorrect_chars
+        return 100.0 if total == 0 else self.correct_chars / total * 100
+
+    def get_wpm(self, now):
+        minutes = (now - self.start_time) / 60
+        return 0.0 if minutes <= 0 else self.correct_chars / 5 / minutes
+
+
+def run_benchmark(rules=1000, sessions=1000, ticks=40, tick_s=1.0, seed=5):
+    """rules 条规则 × sessions 个会话，比较线性扫描与索引引擎每个节拍的耗时
+
+    三种实现解锁的规则必须完全一致。
+    """
+    rng = random.Random(seed)
+    rule_list = synthesize_rules(rules, seed=seed)
+    students = [_SyntheticStudent(rng) for _ in range(sessions)]
+    passages = [f"p{rng.randrange(50)}" for _ in range(sessions)]
+
+    engine = AchievementEngine(rule_list)
+    engine_rows = [engine.register(p) for p in passages]
+    fallback = AchievementEngine(rule_list, use_numpy=False)
+    fallback_rows = [fallback.register(p) for p in passages]
+    linear_sets = [set() for _ in range(sessions)]
+    rows = list(range(sessions))
+
+    times = {"collect": 0.0, "linear": 0.0, "indexed": 0.0, "python": 0.0}
+    counts = {"linear": 0, "indexed": 0, "python": 0}
+    for tick in range(1, ticks + 1):
+        for student in students:
+            student.advance(rng)
+        now = tick * tick_s
+
+        began = time.perf_counter()
+        metrics = collect_metrics(students, now)
+        times["collect"] += time.perf_counter() - began
+
+        began = time.perf_counter()
+        linear = evaluate_linear(rule_list, rows, metrics, linear_sets, passages)
+        times["linear"] += time.perf_counter() - began
+
+        began = time.perf_counter()
+        indexed = engine.evaluate(engine_rows, metrics)
+        times["indexed"] += time.perf_counter() - began
+
+        began = time.perf_counter()
+        python = fallback.evaluate(fallback_rows, metrics)
+        times["python"] += time.perf_counter() - began
+
+        expected = sorted((row, rule.id) for row, rule in linear)
+        if (sorted((row, rule.id) for row, rule in indexed) != expected
+                or sorted((row, rule.id) for row, rule in python) != expected):
+            raise AssertionError(f"engines disagree at tick {tick}")
+        counts["linear"] += len(linear)
+        counts["indexed"] += len(indexed)
+        counts["python"] += len(python)
+
+    return {
+        "rules": rules,
+        "sessions": sessions,
+        "groups": len(engine.groups),
+        "ticks": ticks,
+        "unlocked": counts["indexed"],
+        "collect_ms": times["collect"] / ticks * 1000,
+        "linear_ms": times["linear"] / ticks * 1000,
+        "indexed_ms": times["indexed"] / ticks * 1000,
+        "python_ms": times["python"] / ticks * 1000,
+        "numpy": engine.use_numpy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Achievement rule engine benchmark")
+    parser.add_argument("--rules", type=int, default=1000,
+                        help="number of rules (default: %(default)s)")
+    parser.add_argument("--sessions", type=int, default=1000,
+                        help="number of sessions (default: %(default)s)")
+    parser.add_argument("--ticks", type=int, default=40,
+                        help="ticks to simulate (default: %(default)s)")
+    args = parser.parse_args()
+
+    r = run_benchmark(args.rules, args.sessions, args.ticks)
+    print(f"📊 {r['rules']} rules ({r['groups']} threshold groups) × "
+          f"{r['sessions']} sessions, {r['ticks']} ticks, {r['unlocked']} unlocks")
+    print(f"   collect metrics           {r['collect_ms']:8.2f} ms/tick")
+    print(f"   linear scan (page)        {r['linear_ms']:8.2f} ms/tick")
+    if r["numpy"]:
+        print(f"   indexed, NumPy batch      {r['indexed_ms']:8.2f} ms/tick")
+    print(f"   indexed, pure Python      {r['python_ms']:8.2f} ms/tick")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于薄弱按键的自适应选文
+=====================
+
+为每个学生维护按键与双字母组合（bigram）的错误率和延迟直方图，
+再从预先建立的语料 bigram 索引中挑选最能练到薄弱环节的文本。
+索引只为每个 (年级, 字母组合) 保留密度最高的若干段，
+因此一次选择的开销与语料规模无关。
+"""
+
+import argparse
+import bisect
+import heapq
+import json
+import os
+import random
+import tempfile
+import time
+from array import array
+from collections import Counter
+
+from typing_scoring import BACKSPACE
+
+# 延迟直方图桶上界（秒），最后一个桶收纳更慢的按键
+LATENCY_BOUNDS = (0.08, 0.12, 0.16, 0.2, 0.25, 0.3, 0.4, 0.5, 0.7, 1.0, 1.5, 2.0)
+# 参与评分的最少尝试次数
+MIN_ATTEMPTS = 3
+# 每个 (年级, 字母组合) 保留的候选文本数
+TOP_POSTINGS = 256
+# 每次选文考虑的薄弱目标数与每个目标取的候选数
+TARGETS_PER_PICK = 8
+CANDIDATES_PER_TARGET = 64
+# 索引文件格式版本
+INDEX_FORMAT = 1
+
+
+def normalize(text):
+    """统一大小写，索引与画像使用相同的字母组合定义"""
+    return text.lower()
+
+
+def grade_key(grade):
+    """索引中的年级键：建立和查询时都转换为整数，"3" 与 3 是同一年级；无效时为 None"""
+    try:
+        return int(grade)
+    except (TypeError, ValueError):
+        return None
+
+
+def text_grams(text):
+    """统计文本中的单字母和双字母组合出现次数"""
+    text = normalize(text)
+    grams = Counter(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class KeyStats:
+    """单个按键或字母组合的错误计数与延迟直方图"""
+
+    __slots__ = ("attempts", "errors", "histogram")
+
+    def __init__(self):
+        self.attempts = 0
+        self.errors = 0
+        self.histogram = [0] * (len(LATENCY_BOUNDS) + 1)
+
+    def record(self, correct, latency=None):
+        self.attempts += 1
+        if not correct:
+            self.errors += 1
+        if latency is not None:
+            self.histogram[bisect.bisect_left(LATENCY_BOUNDS, latency)] += 1
+
+    def median_latency(self):
+        """由直方图估计的延迟中位数（取桶上界），没有数据时为 None"""
+        total = sum(self.histogram)
+        if not total:
+            return None
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if seen * 2 >= total:
+                return LATENCY_BOUNDS[min(i, len(LATENCY_BOUNDS) - 1)]
+        return LATENCY_BOUNDS[-1]
+
+
+class WeaknessProfile:
+    """学生的按键 / 字母组合薄弱画像"""
+
+    def __init__(self):
+        self.keys = {}
+        self.bigrams = {}
+        self.overall = KeyStats()
+
+    def record(self, expected, typed, latency=None, previous=None):
+        """记录一次按键：expected 为应输入字符，previous 为前一个应输入字符"""
+        expected = normalize(expected)
+        correct = normalize(typed) == expected
+        self.overall.record(correct, latency)
+        stats = self.keys.get(expected)
+        if stats is None:
+            stats = self.keys[expected] = KeyStats()
+        stats.record(correct, latency)
+        if previous:
+            bigram = normalize(previous) + expected
+            stats = self.bigrams.get(bigram)
+            if stats is None:
+                stats = self.bigrams[bigram] = KeyStats()
+            stats.record(correct, latency)
+
+    def update_from_log(self, text, keys, times):
+        """从一条按键记录（同 keystroke_replay.KeystrokeLog）更新画像"""
+        position = 0
+        last_time = None
+        for key, at in zip(keys, times):
+            latency = None if last_time is None else at - last_time
+            last_time = at
+            if key == BACKSPACE:
+                position = max(0, position - 1)
+                continue
+            if position >= len(text):
+                continue
+            previous = text[position - 1] if position else None
+            self.record(text[position], key, latency, previous)
+            position += 1
+
+    def _score(self, stats, baseline_error, baseline_latency):
+        # 错误率按全局错误率做平滑，避免少量样本的偶然错误
+        error_rate = (stats.errors + MIN_ATTEMPTS * baseline_error) / (
+            stats.attempts + MIN_ATTEMPTS)
+        score = error_rate / max(baseline_error, 0.01)
+        median = stats.median_latency()
+        if median is not None and baseline_latency:
+            score += max(0.0, median / baseline_latency - 1.0)
+        return score
+
+    def weaknesses(self, limit=TARGETS_PER_PICK):
+        """返回最薄弱的 [(字母组合, 分数)]，分数越高越需要练习"""
+        if not self.overall.attempts:
+            return []
+        baseline_error = self.overall.errors / self.overall.attempts
+        baseline_latency = self.overall.median_latency()
+        scored = []
+        for table in (self.keys, self.bigrams):
+            for gram, stats in table.items():
+                if stats.attempts >= MIN_ATTEMPTS and not gram.isspace():
+                    scored.append((self._score(stats, baseline_error,
+                                               baseline_latency), gram))
+        top = heapq.nlargest(limit, scored)
+        return [(gram, score) for score, gram in top if score > 1.0]
+
+    def to_dict(self):
+        """导出为可 JSON 序列化的字典"""
+        def dump(table):
+            return {g: [s.attempts, s.errors, s.histogram] for g, s in table.items()}
+        return {"keys": dump(self.keys), "bigrams": dump(self.bigrams),
+                "overall": [self.overall.attempts, self.overall.errors,
+                            self.overall.histogram]}
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict() 的结果恢复"""
+        def load(values):
+            stats = KeyStats()
+            stats.attempts, stats.errors, histogram = values
+            stats.histogram = list(histogram)
+            return stats
+        profile = cls()
+        profile.keys = {g: load(v) for g, v in data["keys"].items()}
+        profile.bigrams = {g: load(v) for g, v in data["bigrams"].items()}
+        profile.overall = load(data["overall"])
+        return profile
+
+
+class BigramIndex:
+    """(年级, 字母组合) → 按出现密度降序的候选记录号"""
+
+    def __init__(self, postings=None):
+        # (年级, 字母组合) -> (记录号 array('I'), 密度 array('f'))
+        self.postings = postings or {}
+
+    @classmethod
+    def build(cls, corpus, top=TOP_POSTINGS):
+        """扫描 CorpusContentManager 中的全部文本建立索引"""
+        heaps = {}
+        for grade in corpus.get_available_grades():
+            start, end = corpus.grade_range(grade)
+            grade = grade_key(grade)
+            for index in range(start, end):
+                text = corpus.get_passage(index)
+                length = max(len(text), 1)
+                for gram, count in text_grams(text).items():
+                    if gram.isspace():
+                        continue
+                    entry = (count / length, index)
+                    heap = heaps.get((grade, gram))
+                    if heap is None:
+                        heaps[(grade, gram)] = [entry]
+                    elif len(heap) < top:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+
+        postings = {}
+        for key, heap in heaps.items():
+            heap.sort(reverse=True)
+            postings[key] = (array("I", (i for _, i in heap)),
+                             array("f", (d for d, _ in heap)))
+        return cls(postings)
+
+    def save(self, path):
+        """保存索引到磁盘（JSON，原子替换）
+
+        每个倒排表写成 [年级, 字母组合, 记录号列表, 密度列表]；
+        不用 pickle，被替换的索引文件只能是错误的数据，不能执行代码。
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": INDEX_FORMAT,
+                       "postings": [[grade, gram, ids.tolist(), densities.tolist()]
+                                    for (grade, gram), (ids, densities)
+                                    in self.postings.items()]},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """从磁盘加载索引，格式不符时抛出 ValueError"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get("format") != INDEX_FORMAT:
+            raise ValueError(f"{path} is not a bigram index (format {INDEX_FORMAT})")
+        try:
+            return cls({(grade_key(grade), gram): (array("I", ids), array("f", densities))
+                        for grade, gram, ids, densities in data["postings"]})
+        except (KeyError, TypeError, OverflowError) as e:
+            raise ValueError(f"{path} is not a valid bigram index: {e}") from e
+
+    def candidates(self, grade, gram, limit=CANDIDATES_PER_TARGET):
+        """返回 [(记录号, 密度)]，按密度降序"""
+        posting = self.postings.get((grade_key(grade), gram))
+        if posting is None:
+            return []
+        ids, densities = posting
+        return list(zip(ids[:limit], densities[:limit]))
+
+
+class AdaptiveSelector:
+    """按薄弱画像从索引中选文"""
+
+    def __init__(self, index, rng=None):
+        self.index = index
+        self._rng = rng or random.Random()
+
+    def pick(self, profile, grade, exclude=()):
+        """返回最适合练习的记录号；画像为空或没有候选时返回 None
+
+        每个候选的得分为各薄弱目标的 (分数 × 出现密度) 之和，
+        从得分最高的前几名中随机选一个，避免总是给出同一段文本。
+        """
+        scores = {}
+        for gram, weight in profile.weaknesses():
+            for index, density in self.index.candidates(grade, gram):
+                if index not in exclude:
+                    scores[index] = scores.get(index, 0.0) + weight * density
+        if not scores:
+            return None
+        best = heapq.nlargest(5, scores.items(), key=lambda item: item[1])
+        return self._rng.choice(best)[0]
+
+
+class AdaptiveContentManager:
+    """在 CorpusContentManager 之上按画像选文
+
+    提供与 ContentManager 相同的 get_sentence_for_grade()，
+    GameController 可以直接替换使用；画像没有足够数据时退回随机抽取。
+    """
+
+    def __init__(self, corpus, index, profile=None, rng=None, history=20):
+        self.corpus = corpus
+        self.profile = profile or WeaknessProfile()
+        self.selector = AdaptiveSelector(index, rng)
+        self.history = history
+        self._recent = []
+
+    def get_available_grades(self):
+        return self.corpus.get_available_grades()
+
+    def validate_grade(self, grade):
+        return self.corpus.validate_grade(grade)
+
+    def get_sentence_for_grade(self, grade):
+        """按画像为指定年级选一段文本，年级无效时返回 None"""
+        if not self.corpus.validate_grade(grade):
+            return None
+        index = self.selector.pick(self.profile, grade, set(self._recent))
+        if index is None:
+            index = self.corpus.sample_index(grade=grade)
+        self._recent.append(index)
+        # history 为 0 时 [:-0] 是空切片，不能用负下标裁剪
+        if len(self._recent) > self.history:
+            del self._recent[:len(self._recent) - self.history]
+        return self.corpus.get_passage(index)
+
+
+def run_benchmark(count=100_000, picks=2000):
+    """在 count 段语料上测量建索引耗时与单次选文延迟"""
+    from content_corpus import CorpusContentManager, build_corpus, synthesize_passages
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.corpus")
+        build_corpus(path, synthesize_passages(count))
+        with CorpusContentManager(path) as corpus:
+            began = time.perf_counter()
+            index = BigramIndex.build(corpus)
+            build_s = time.perf_counter() - began
+
+            rng = random.Random(3)
+            profile = WeaknessProfile()
+            for _ in range(5000):
+                text = corpus.get_sentence_for_grade("3")
+                for prev, char in zip(text, text[1:]):
+                    slow = char in "wy"
+                    typed = "#" if slow and rng.random() < 0.3 else char
+                    profile.record(char, typed, 0.4 if slow else 0.15, prev)
+
+            selector = AdaptiveSelector(index, rng)
+            timings = []
+            for _ in range(picks):
+                began = time.perf_counter()
+                selector.pick(profile, "3")
+                timings.append(time.perf_counter() - began)
+            timings.sort()
+            return {
+                "passages": count,
+                "build_s": build_s,
+                "p50_ms": timings[len(timings) // 2] * 1000,
+                "p99_ms": timings[int(len(timings) * 0.99)] * 1000,
+                "targets": profile.weaknesses(),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive passage selection benchmark")
+    parser.add_argument("--passages", type=int, default=100_000,
+                        help="synthetic corpus size (default: %(default)s)")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.passages)
+    targets = ", ".join(f"{g!r}:{s:.1f}" for g, s in result["targets"])
+    print(f"📊 {result['passages']} passages, index built in {result['build_s']:.1f} s")
+    print(f"   weak targets: {targets}")
+    print(f"   selection p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态资源内存缓存
+==============
+
+启动时把服务目录载入内存，预先生成 gzip（以及可用时的 brotli）压缩版本，
+按 Accept-Encoding 协商返回，并通过轮询文件状态在开发时自动失效。
+
+这里也放着各服务引擎共用的 HTTP 缓存语义：条件请求（If-None-Match /
+If-Modified-Since / If-Match / If-Unmodified-Since）和 Range 请求
+（单段与多段 multipart/byteranges，If-Range）。response_plan() 只决定
+状态码、响应头和要发送的字节区间，内存资源和磁盘文件（file_delivery）共用。
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 超过该大小的文件不进入缓存，仍由磁盘提供
+MAX_CACHED_FILE_SIZE = 8 * 1024 * 1024
+# 小于该大小的文件压缩收益不大
+MIN_COMPRESS_SIZE = 256
+# 扫描时跳过的目录
+SKIP_DIRS = {"node_modules", "__pycache__"}
+# 可压缩的非 text/* 类型
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "application/wasm",
+    "image/svg+xml",
+}
+# 编码优先级（同等 q 值时优先选择压缩率高的）
+ENCODING_PREFERENCE = ("br", "gzip", "identity")
+# 文件名带内容哈希、内容永不改变的资源使用的缓存策略
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 单个请求最多接受的区间数，超过时忽略 Range 返回完整内容
+MAX_RANGES = 16
+
+_RANGE_SPEC_RE = re.compile(r"(\d*)-(\d*)", re.ASCII)
+
+# 与缓存和区间相关的请求头，缺失的为 None
+Conditions = namedtuple(
+    "Conditions", "if_none_match if_modified_since if_match if_unmodified_since range if_range",
+    defaults=(None,) * 6)
+_CONDITION_HEADERS = ("if-none-match", "if-modified-since", "if-match",
+                      "if-unmodified-since", "range", "if-range")
+
+
+def is_compressible(content_type):
+    """判断内容类型是否值得压缩"""
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+def parse_accept_encoding(header):
+    """解析 Accept-Encoding，返回 {编码: q值}"""
+    accepted = {}
+    if not header:
+        return accepted
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def etag_matches(if_none_match, etag):
+    """按弱比较规则判断 If-None-Match 是否命中"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def request_conditions(headers):
+    """从请求头（http.server 的 Message 或小写键的 dict）取出 Conditions"""
+    return Conditions(*(headers.get(name) for name in _CONDITION_HEADERS))
+
+
+def parse_http_date(value):
+    """HTTP 日期转为整数秒时间戳，无法解析时返回 None"""
+    try:
+        return int(parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _strong_match(header, etag):
+    """If-Match 使用强比较：弱 ETag 永不匹配"""
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip() == etag for candidate in header.split(","))
+
+
+def evaluate_preconditions(conditions, etag, mtime):
+    """按 RFC 9110 的顺序检查条件请求头，返回 412 / 304，或 None 表示继续"""
+    if conditions.if_match:
+        if not _strong_match(conditions.if_match, etag):
+            return 412
+    elif conditions.if_unmodified_since:
+        since = parse_http_date(conditions.if_unmodified_since)
+        if since is not None and int(mtime) > since:
+            return 412
+    if conditions.if_none_match:
+        if etag_matches(conditions.if_none_match, etag):
+            return 304
+    elif conditions.if_modified_since:
+        since = parse_http_date(conditions.if_modified_since)
+        if since is not None and int(mtime) <= since:
+            return 304
+    return None
+
+
+def if_range_matches(if_range, etag, mtime):
+    """If-Range 为空或与当前版本一致时才按 Range 返回部分内容"""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == etag
+    if if_range.startswith("W/"):
+        return False
+    return parse_http_date(if_range) == int(mtime)
+
+
+def parse_range(header, size):
+    """解析 Range 头，返回按起点排序、合并重叠后的 [(起点, 终点)]（终点不含）
+
+    单位不是 bytes、语法错误或区间过多时返回 None（忽略该头，返回完整内容）；
+    语法正确但没有可满足的区间时返回空列表（416）。
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    specs = [part.strip() for part in spec.split(",") if part.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
+    ranges = []
+    for part in specs:
+        match = _RANGE_SPEC_RE.fullmatch(part)
+        if match is None:
+            return None
+        first, last = match.groups()
+        if not first:
+            if not last:
+                return None
+            # 后缀区间：最后 N 个字节
+            start, stop = max(0, size - int(last)), size
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            stop = min(int(last) + 1, size) if last else size
+        if start < stop:
+            ranges.append((start, stop))
+    ranges.sort()
+    merged = []
+    for start, stop in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def response_plan(conditions, size, etag, mtime, content_type):
+    """决定响应方式，返回 (状态码, [(头, 值)], [(分段前缀, 起点, 终点)], 结尾)
+
+    调用方先写出 ETag / Last-Modified 等验证头，再写出这里返回的头；
+    正文依次为每段的前缀和 [起点, 终点) 之间的字节，最后是结尾。
+    304 / 412 / 416 没有正文。
+    """
+    status = evaluate_preconditions(conditions, etag, mtime)
+    if status == 304:
+        return 304, [], [], b""
+    if status == 412:
+        return 412, [("Content-Length", "0")], [], b""
+
+    ranges = None
+    if conditions.range and if_range_matches(conditions.if_range, etag, mtime):
+        ranges = parse_range(conditions.range, size)
+    if ranges is None:
+        return 200, [("Content-Type", content_type), ("Content-Length", str(size))], \
+            [(b"", 0, size)], b""
+    if not ranges:
+        return 416, [("Content-Range", f"bytes */{size}"), ("Content-Length", "0")], [], b""
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        return 206, [("Content-Type", content_type),
+                     ("Content-Range", f"bytes {start}-{stop - 1}/{size}"),
+                     ("Content-Length", str(stop - start))], [(b"", start, stop)], b""
+
+    boundary = os.urandom(12).hex()
+    parts = []
+    for i, (start, stop) in enumerate(ranges):
+        # 第一段前面不需要换行，之后每段的分隔符前有 CRLF
+        delimiter = f"--{boundary}" if i == 0 else f"\r\n--{boundary}"
+        prefix = (f"{delimiter}\r\n"
+                  f"Content-Type: {content_type}\r\n"
+                  f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n")
+        parts.append((prefix.encode("latin-1"), start, stop))
+    tail = f"\r\n--{boundary}--\r\n".encode("latin-1")
+    length = sum(len(prefix) + stop - start for prefix, start, stop in parts) + len(tail)
+    return 206, [("Content-Type", f"multipart/byteranges; boundary={boundary}"),
+                 ("Content-Length", str(length))], parts, tail
+
+
+def cached_response(cache, asset, accept_encoding, if_none_match, conditions=None):
+    """生成缓存命中时的响应，返回 (状态码, [(头, 值)], 正文)
+
+    conditions 为 request_conditions() 的结果时同时处理其余条件请求头和
+    Range（区间针对协商出的编码版本）；单段区间的正文是 memoryview 切片，
+    不复制数据。304 / 412 / 416 时正文为空。
+    """
+    if conditions is None:
+        conditions = Conditions(if_none_match=if_none_match)
+    encoding, data, etag = asset.negotiate(accept_encoding)
+    headers = [
+        ("ETag", etag),
+        ("Cache-Control", IMMUTABLE_CACHE_CONTROL if asset.immutable
+         else cache.cache_control),
+        ("Vary", "Accept-Encoding"),
+        ("Last-Modified", asset.last_modified),
+    ]
+    status, extra, parts, tail = response_plan(
+        conditions, len(data), etag, asset.mtime_ns / 1e9, asset.content_type)
+    if status == 304:
+        return status, headers, b""
+    headers.append(("Accept-Ranges", "bytes"))
+    if encoding != "identity":
+        headers.append(("Content-Encoding", encoding))
+    headers.extend(extra)
+    if status == 200:
+        body = data
+    elif len(parts) == 1:
+        _, start, stop = parts[0]
+        body = memoryview(data)[start:stop]
+    else:
+        body = b"".join(prefix + data[start:stop] for prefix, start, stop in parts) + tail
+    return status, headers, body
+
+
+class CachedAsset:
+    """单个文件的内存副本及其压缩版本
+
+    gzip_data 为预先压缩好的数据（例如构建阶段生成的 .gz 文件）时直接使用，
+    不再重新压缩。immutable 为 True 时响应使用长期缓存。
+    """
+
+    __slots__ = ("path", "mtime_ns", "size", "content_type", "last_modified",
+                 "variants", "immutable")
+
+    def __init__(self, path, data, mtime_ns, content_type, gzip_data=None,
+                 immutable=False):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = len(data)
+        self.content_type = content_type
+        self.immutable = immutable
+        self.last_modified = formatdate(mtime_ns / 1e9, usegmt=True)
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        # 编码 -> (正文, 强 ETag)
+        self.variants = {"identity": (data, f'"{digest}"')}
+        if gzip_data is not None:
+            self.variants["gzip"] = (gzip_data, f'"{digest}-gzip"')
+        elif self.size >= MIN_COMPRESS_SIZE and is_compressible(content_type):
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < self.size:
+                self.variants["gzip"] = (compressed, f'"{digest}-gzip"')
+            if brotli is not None:
+                compressed = brotli.compress(data)
+                if len(compressed) < self.size:
+                    self.variants["br"] = (compressed, f'"{digest}-br"')
+
+    def negotiate(self, accept_encoding):
+        """根据 Accept-Encoding 选择编码，返回 (编码, 正文, ETag)"""
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*")
+        best = None
+        best_q = 0.0
+        for encoding in ENCODING_PREFERENCE:
+            if encoding not in self.variants:
+                continue
+            q = accepted.get(encoding, wildcard)
+            if q is None:
+                # identity 未被显式拒绝时总是可接受
+                q = 0.001 if encoding == "identity" else 0.0
+            if q > best_q:
+                best, best_q = encoding, q
+        if best is None:
+            best = "identity"
+        data, etag = self.variants[best]
+        return best, data, etag
+
+
+class AssetCache:
+    """服务目录的内存缓存
+
+    以绝对路径为键保存 CachedAsset。refresh() 比对 mtime/size，
+    只重新加载发生变化的文件；start_watcher() 在后台定期调用它。
+    """
+
+    def __init__(self, root=".", max_age=0, max_file_size=MAX_CACHED_FILE_SIZE):
+        self.root = os.path.abspath(root)
+        self.max_age = max_age
+        self.max_file_size = max_file_size
+        self._assets = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    @property
+    def cache_control(self):
+        """Cache-Control 头：max_age 为 0 时要求每次用 ETag 重新验证"""
+        if self.max_age > 0:
+            return f"public, max-age={self.max_age}"
+        return "no-cache"
+
+    def __len__(self):
+        return len(self._assets)
+
+    def get(self, path):
+        """按绝对路径取缓存项，未缓存时返回 None"""
+        return self._assets.get(path)
+
+    def _iter_files(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames
+                           if not d.startswith(".") and d not in SKIP_DIRS]
+            for name in filenames:
+                if not name.startswith("."):
+                    yield os.path.join(dirpath, name)
+
+    def _load(self, path, st):
+        with open(path, "rb") as f:
+            data = f.read()
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return CachedAsset(path, data, st.st_mtime_ns, content_type)
+
+    def refresh(self):
+        """扫描目录，重新加载变化的文件，返回变化的文件数"""
+        with self._lock:
+            seen = set()
+            changed = 0
+            for path in self._iter_files():
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_size > self.max_file_size:
+                    continue
+                seen.add(path)
+                current = self._assets.get(path)
+                if (current is not None and current.mtime_ns == st.st_mtime_ns
+                        and current.size == st.st_size):
+                    continue
+                try:
+                    self._assets[path] = self._load(path, st)
+                except OSError:
+                    continue
+                changed += 1
+            for path in list(self._assets):
+                if path not in seen:
+                    del self._assets[path]
+                    changed += 1
+            return changed
+
+    def start_watcher(self, interval=1.0):
+        """启动后台轮询线程，文件被修改后自动失效"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._watcher = threading.Thread(target=watch, name="asset-watcher",
+                                         daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        """停止后台轮询线程"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def summary(self):
+        """返回 (文件数, 原始字节数, 最小压缩后字节数)"""
+        assets = list(self._assets.values())
+        raw = sum(a.size for a in assets)
+        smallest = sum(min(len(data) for data, _ in a.variants.values())
+                       for a in assets)
+        return len(assets), raw, smallest
+
+
+def load_asset_cache(root=".", max_age=0, watch_interval=1.0):
+    """创建并预热缓存；watch_interval 为 0 时不监视文件变化"""
+    began = time.perf_counter()
+    cache = AssetCache(root, max_age=max_age)
+    cache.refresh()
+    if watch_interval:
+        cache.start_watcher(watch_interval)
+    count, raw, smallest = cache.summary()
+    elapsed = (time.perf_counter() - began) * 1000
+    encodings = "gzip+br" if brotli is not None else "gzip"
+    print(f"📦 Cached {count} files ({raw / 1024:.0f} KB, "
+          f"{smallest / 1024:.0f} KB with {encodings}) in {elapsed:.0f} ms")
+    return cache
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio 静态文件服务引擎
+=====================
+
+单个事件循环处理全部连接：支持 HTTP/1.1 持久连接，磁盘文件通过
+loop.sendfile 零拷贝发送，支持条件请求与单段 / 多段 Range；
+开始监听后立即回调通知启动器，而不是固定等待。
+"""
+
+import asyncio
+import json
+import mimetypes
+import os
+import posixpath
+import threading
+import urllib.parse
+from contextlib import suppress
+from email.utils import formatdate
+from http import HTTPStatus
+
+from asset_cache import cached_response, request_conditions, response_plan
+from file_delivery import file_etag
+from instrumentation import METRICS_PATH, PROMETHEUS_CONTENT_TYPE
+from pack_store import PACKS_URL
+from scoring_api import api_response, body_length, is_api_request
+from typing_scoring import ScoringService
+
+# 持久连接空闲超时（秒）
+KEEPALIVE_TIMEOUT = 5
+# 单个请求允许的最大头部行数
+MAX_HEADER_LINES = 100
+SERVER_NAME = "TypingAdventure-asyncio"
+
+
+class AsyncStaticServer:
+    """基于 asyncio streams 的静态文件服务器
+
+    静态文件只处理 GET/HEAD。服务器带有 asset_cache 时优先从内存返回，
+    否则打开磁盘文件并用 loop.sendfile 发送。/api/score 与 /api/segments
+    是与线程模式引擎相同的 JSON 接口（scoring_api），scoring 为空时新建
+    一个 ScoringService。websocket_routes 把路径映射到
+    handler(reader, writer, headers) 协程，请求升级为 WebSocket 时交给它接管连接。
+    metrics 为 instrumentation.Registry 时在 /metrics 导出。
+    packs 为 pack_store.PackStore 时在 /packs/ 下提供文本包。
+    """
+
+    def __init__(self, root=".", asset_cache=None,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT, websocket_routes=None,
+                 metrics=None, packs=None, scoring=None):
+        self.root = os.path.abspath(root)
+        self.asset_cache = asset_cache
+        self.metrics = metrics
+        self.packs = packs
+        self.scoring = scoring if scoring is not None else ScoringService()
+        self.keepalive_timeout = keepalive_timeout
+        self.websocket_routes = dict(websocket_routes or {})
+        self._server = None
+        self._writers = set()
+        self._handlers = set()
+
+    async def start(self, host="", port=0, backlog=64, sock=None):
+        """开始监听，返回实际绑定的端口；sock 为已绑定的套接字时直接接管"""
+        if sock is not None:
+            self._server = await asyncio.start_server(
+                self._handle_connection, sock=sock, backlog=backlog)
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, host or None, port, backlog=backlog,
+                reuse_address=True)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        """停止监听并关闭所有连接"""
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        # 等连接处理协程收尾，避免它们在 wait_closed() 中被事件循环取消
+        if self._handlers:
+            await asyncio.wait(self._handlers, timeout=1.0)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    def translate_path(self, url_path):
+        """把 URL 路径映射到服务目录下的绝对路径"""
+        path = posixpath.normpath(urllib.parse.unquote(url_path))
+        parts = [p for p in path.split("/") if p and p not in (".", "..")]
+        return os.path.join(self.root, *parts)
+
+    async def _handle_connection(self, reader, writer):
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        self._writers.add(writer)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers = request
+                route = self._websocket_route(method, target, headers)
+                if route is not None:
+                    await route(reader, writer, headers)
+                    break
+                keep_alive = self._keep_alive(version, headers)
+                keep_alive = await self._respond(reader, writer, method, target,
+                                                 headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+            self._handlers.discard(handler)
+
+    async def _read_request(self, reader):
+        """读取请求行和头部，连接关闭或超时返回 None
+
+        请求行之前是持久连接的空闲超时；头部整体另有同样长度的超时，
+        只发送部分头部后停下的客户端（slowloris）不会一直占用连接。
+        """
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+        except asyncio.TimeoutError:
+            return None
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise ValueError("malformed request line")
+        method, target, version = parts
+        try:
+            headers = await asyncio.wait_for(self._read_headers(reader),
+                                             self.keepalive_timeout)
+        except asyncio.TimeoutError:
+            return None
+        return method, target, version, headers
+
+    @staticmethod
+    async def _read_headers(reader):
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ValueError("too many headers")
+        return headers
+
+    def _websocket_route(self, method, target, headers):
+        if method != "GET" or headers.get("upgrade", "").lower() != "websocket":
+            return None
+        return self.websocket_routes.get(urllib.parse.urlsplit(target).path)
+
+    @staticmethod
+    def _keep_alive(version, headers):
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.1":
+            return connection != "close"
+        return connection == "keep-alive"
+
+    @staticmethod
+    def _head(status, headers, keep_alive):
+        status = HTTPStatus(status)
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 f"Server: {SERVER_NAME}",
+                 f"Date: {formatdate(usegmt=True)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_error(self, writer, status, keep_alive, extra_headers=()):
+        body = f"{status.value} {status.phrase}\n".encode()
+        headers = [("Content-Type", "text/plain; charset=utf-8"),
+                   ("Content-Length", str(len(body)))]
+        headers.extend(extra_headers)
+        writer.write(self._head(status, headers, keep_alive) + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status, payload, keep_alive):
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        writer.write(self._head(status, [
+            ("Content-Type", "application/json"),
+            ("Cache-Control", "no-store"),
+            ("Content-Length", str(len(body))),
+        ], keep_alive) + body)
+        await writer.drain()
+
+    async def _respond_api(self, reader, writer, method, url_path, headers, keep_alive):
+        """读取请求体并交给 scoring_api 处理"""
+        if "transfer-encoding" in headers:
+            await self._send_error(writer, HTTPStatus.LENGTH_REQUIRED, False)
+            return False
+        length, error = body_length(headers.get("content-length"))
+        if error:
+            # 请求体未读取，只能关闭连接
+            await self._send_json(writer, *error, False)
+            return False
+        body = b""
+        if length:
+            try:
+                body = await asyncio.wait_for(reader.readexactly(length),
+                                              self.keepalive_timeout)
+            except asyncio.TimeoutError:
+                return False
+        status, payload = api_response(self.scoring, method, url_path, body)
+        await self._send_json(writer, status, payload, keep_alive)
+        return keep_alive
+
+    async def _respond(self, reader, writer, method, target, headers, keep_alive):
+        """发送一个响应，返回连接是否继续保持"""
+        url_path = urllib.parse.urlsplit(target).path
+        if is_api_request(method, url_path):
+            return await self._respond_api(reader, writer, method, url_path, headers,
+                                           keep_alive)
+        if method not in ("GET", "HEAD"):
+            # 未读取请求体，只能关闭连接
+            await self._send_error(writer, HTTPStatus.NOT_IMPLEMENTED, False,
+                                   [("Allow", "GET, HEAD")])
+            return False
+        head_only = method == "HEAD"
+
+        if url_path == METRICS_PATH and self.metrics is not None:
+            body = self.metrics.render_prometheus().encode("utf-8")
+            data = self._head(HTTPStatus.OK, [
+                ("Content-Type", PROMETHEUS_CONTENT_TYPE),
+                ("Cache-Control", "no-store"),
+                ("Content-Length", str(len(body))),
+            ], keep_alive)
+            writer.write(data if head_only else data + body)
+            await writer.drain()
+            return keep_alive
+
+        cache = self.asset_cache
+        if self.packs is not None and url_path.startswith(PACKS_URL):
+            cache = self.packs
+            if cache.get(url_path) is None:
+                await self._send_error(writer, HTTPStatus.NOT_FOUND, keep_alive)
+                return keep_alive
+            path = url_path
+        else:
+            path = self.translate_path(url_path)
+
+        if cache is not None:
+            asset = cache.get(path)
+            if asset is not None:
+                status, response_headers, body = cached_response(
+                    cache, asset, headers.get("accept-encoding"),
+                    headers.get("if-none-match"), request_conditions(headers))
+                data = self._head(status, response_headers, keep_alive)
+                if not head_only:
+                    data += body
+                writer.write(data)
+                await writer.drain()
+                return keep_alive
+
+        # stat / open 可能阻塞在慢速磁盘或网络文件系统上，放到线程池中执行
+        status, f, st, path = await asyncio.to_thread(self._open_file, url_path)
+        if status == HTTPStatus.MOVED_PERMANENTLY:
+            await self._send_error(writer, status, keep_alive, [("Location", url_path + "/")])
+            return keep_alive
+        if f is None:
+            await self._send_error(writer, status, keep_alive)
+            return keep_alive
+        with f:
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            etag = file_etag(st)
+            status, plan_headers, parts, tail = response_plan(
+                request_conditions(headers), st.st_size, etag, st.st_mtime, content_type)
+            response_headers = [("ETag", etag),
+                                ("Last-Modified", formatdate(st.st_mtime, usegmt=True))]
+            if status != 304:
+                response_headers.append(("Accept-Ranges", "bytes"))
+            writer.write(self._head(status, response_headers + plan_headers, keep_alive))
+            await writer.drain()
+            if not head_only:
+                loop = asyncio.get_running_loop()
+                for prefix, start, stop in parts:
+                    if prefix:
+                        writer.write(prefix)
+                    if stop > start:
+                        await loop.sendfile(writer.transport, f, start, stop - start)
+                if tail:
+                    writer.write(tail)
+                    await writer.drain()
+        return keep_alive
+
+    def _open_file(self, url_path):
+        """找到 URL 对应的磁盘文件（目录取 index.html）并打开
+
+        返回 (状态, 文件, stat, 路径)；状态不是 200 时文件为 None。
+        """
+        path = self.translate_path(url_path)
+        if os.path.isdir(path):
+            if not url_path.endswith("/"):
+                return HTTPStatus.MOVED_PERMANENTLY, None, None, path
+            for index in ("index.html", "index.htm"):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+            else:
+                return HTTPStatus.NOT_FOUND, None, None, path
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return HTTPStatus.NOT_FOUND, None, None, path
+        try:
+            st = os.fstat(f.fileno())
+        except OSError:
+            f.close()
+            return HTTPStatus.NOT_FOUND, None, None, path
+        return HTTPStatus.OK, f, st, path
+
+
+class AsyncServerThread:
+    """在后台线程运行 AsyncStaticServer，供压测和测试使用"""
+
+    def __init__(self, root=".", asset_cache=None, host="127.0.0.1", port=0,
+                 backlog=64):
+        self.server = AsyncStaticServer(root, asset_cache)
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.ready = threading.Event()
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self.port = await self.server.start(self.host, self.port, self.backlog)
+        self.ready.set()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.server.close()
+
+    def _run(self):
+        with suppress(asyncio.CancelledError):
+            asyncio.run(self._main())
+
+    def start(self):
+        """启动并等待服务器就绪，返回端口"""
+        self._thread = threading.Thread(target=self._run, name="asyncio-server",
+                                        daemon=True)
+        self._thread.start()
+        self.ready.wait()
+        return self.port
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join()
+
+
+def run(port, host="", asset_cache=None, backlog=64, on_ready=None,
+        websocket_routes=None, sock=None, metrics=None, packs=None):
+    """在当前线程运行服务器直到被中断
+
+    on_ready(port) 在开始监听后于线程池中调用，可以安全地执行阻塞操作
+    （例如打开浏览器）。Ctrl+C 时 asyncio.run 取消服务任务并关闭所有连接，
+    然后抛出 KeyboardInterrupt。sock 为已绑定的监听套接字时忽略 host/port。
+    """
+    async def main():
+        server = AsyncStaticServer(".", asset_cache,
+                                   websocket_routes=websocket_routes,
+                                   metrics=metrics, packs=packs)
+        bound = await server.start(host, port, backlog, sock)
+        if on_ready is not None:
+            asyncio.get_running_loop().run_in_executor(None, on_ready, bound)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    asyncio.run(main())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重构版本性能基准
+==============
+
+与 test_refactoring.py 对应的性能基准：取文本、统计更新、按键处理、
+开始新一关和静态服务器吞吐。结果以“每次操作耗时（秒）”记录，
+保存为 JSON 基线；与基线相比变慢超过阈值时以非 0 状态退出，
+可以直接作为 CI 的回归门槛。
+
+    python3 benchmark_refactoring.py                 # 与基线比较
+    python3 benchmark_refactoring.py --update        # 重新生成基线
+    python3 benchmark_refactoring.py --only input_processing --threshold 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "benchmark_baseline.json")
+# 默认回归阈值（百分比）
+DEFAULT_THRESHOLD = 25.0
+DEFAULT_REPEAT = 5
+BASELINE_VERSION = 1
+
+# 名称 -> (说明, fixture)；fixture 是上下文管理器，产出 run()，
+# run() 执行一轮并返回 (操作次数, 耗时秒)
+BENCHMARKS = {}
+
+
+def benchmark(name, description):
+    """注册一个基准"""
+    def decorate(factory):
+        BENCHMARKS[name] = (description, contextmanager(factory))
+        return factory
+    return decorate
+
+
+@contextmanager
+def _corpus(count=10_000):
+    from content_corpus import CorpusContentManager, build_corpus, synthesize_passages
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.corpus")
+        build_corpus(path, synthesize_passages(count))
+        with CorpusContentManager(path, rng=random.Random(1)) as corpus:
+            yield corpus
+
+
+@benchmark("content_lookup", "ContentManager.get_sentence_for_grade (10k passages)")
+def bench_content_lookup(lookups=20_000):
+    with _corpus() as corpus:
+        grades = corpus.get_available_grades()
+
+        def run():
+            get = corpus.get_sentence_for_grade
+            began = time.perf_counter()
+            for i in range(lookups):
+                get(grades[i % len(grades)])
+            return lookups, time.perf_counter() - began
+        yield run
+
+
+@benchmark("statistics_update", "GameStatistics record_correct/incorrect_input")
+def bench_statistics_update(updates=200_000):
+    from session_table import SlottedGameStatistics
+
+    def run():
+        stats = SlottedGameStatistics()
+        correct = stats.record_correct_input
+        incorrect = stats.record_incorrect_input
+        began = time.perf_counter()
+        for i in range(updates):
+            if i % 20:
+                correct()
+            else:
+                incorrect()
+        return updates, time.perf_counter() - began
+    yield run
+
+
+@benchmark("input_processing", "per-keystroke input processing (10k-char passage)")
+def bench_input_processing(length=10_000):
+    from typing_scoring import ScoringSession, make_passage
+
+    text = make_passage(length)
+    keys = [("#" if i % 37 == 36 else ch) for i, ch in enumerate(text)]
+
+    def run():
+        session = ScoringSession(text)
+        type_char = session.type_char
+        began = time.perf_counter()
+        for key in keys:
+            type_char(key)
+        return len(keys), time.perf_counter() - began
+    yield run
+
+
+@benchmark("start_new_level", "start a level: fetch a passage and open a session")
+def bench_start_new_level(levels=5_000):
+    from typing_scoring import ScoringService
+
+    with _corpus() as corpus:
+        def run():
+            service = ScoringService()
+            began = time.perf_counter()
+            for i in range(levels):
+                session_id, _ = service.create(
+                    corpus.get_sentence_for_grade(str(i % 6 + 1)))
+                service.close(session_id)
+            return levels, time.perf_counter() - began
+        yield run
+
+
+@benchmark("static_server", "play.py threaded server, 10 clients x 50 keep-alive GETs")
+def bench_static_server(clients=10, requests_per_client=50):
+    import play
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    cwd = os.getcwd()
+    os.chdir(root)
+    httpd = play.create_server(0, workers=8, host="127.0.0.1")
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        def run():
+            latencies, _, elapsed, failed = play.run_load(
+                httpd.server_address[1], clients, requests_per_client)
+            if failed:
+                raise RuntimeError(f"{failed} requests failed")
+            return len(latencies), elapsed
+        yield run
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        os.chdir(cwd)
+
+
+def run_benchmarks(names=None, repeat=DEFAULT_REPEAT):
+    """运行基准，返回 {名称: 每次操作最短耗时（秒）}
+
+    每个基准先预热一轮，再取 repeat 轮中最快的一轮，降低调度噪声的影响。
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        _, fixture = BENCHMARKS[name]
+        with fixture() as run:
+            run()
+            best = min(elapsed / ops for ops, elapsed in (run() for _ in range(repeat)))
+        results[name] = best
+    return results
+
+
+def load_baseline(path):
+    """读取基线文件，不存在时返回空字典"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if data.get("version") != BASELINE_VERSION:
+        raise ValueError(f"unsupported baseline version in {path}")
+    return {name: entry["seconds_per_op"] for name, entry in data["results"].items()}
+
+
+def save_baseline(path, results, previous=None):
+    """写入基线；previous 中本次未运行的条目原样保留"""
+    merged = dict(previous or {})
+    merged.update(results)
+    data = {
+        "version": BASELINE_VERSION,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "results": {name: {"seconds_per_op": value,
+                           "description": BENCHMARKS[name][0] if name in BENCHMARKS else ""}
+                    for name, value in sorted(merged.items())},
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    """与基线比较，返回 [(名称, 基线, 当前, 变化百分比, 状态)]
+
+    状态为 ok / faster / regression / new；变化百分比为正表示变慢。
+    """
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, current, None, "new"))
+            continue
+        change = (current / base - 1.0) * 100
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, base, current, change, status))
+    return rows
+
+
+def _format_time(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.2f} µs"
+    return f"{seconds * 1e3:.2f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refactoring benchmark suite")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="baseline JSON file (default: %(default)s)")
+    parser.add_argument("--update", action="store_true",
+                        help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        metavar="PERCENT",
+                        help="fail when a benchmark is this much slower than the "
+                             "baseline (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="measured rounds per benchmark (default: %(default)s)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        metavar="NAME", help="run only these benchmarks")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (description, _) in BENCHMARKS.items():
+            print(f"{name:<20} {description}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    results = run_benchmarks(args.only, args.repeat)
+
+    print(f"📊 Benchmarks (threshold {args.threshold:g}%)")
+    print(f"{'benchmark':<20} {'baseline':>12} {'current':>12} {'change':>9}  status")
+    regressions = 0
+    for name, base, current, change, status in compare(baseline, results,
+                                                        args.threshold):
+        change_text = "-" if change is None else f"{change:+.1f}%"
+        mark = "❌" if status == "regression" else "✅"
+        print(f"{name:<20} {_format_time(base):>12} {_format_time(current):>12} "
+              f"{change_text:>9}  {mark} {status}")
+        regressions += status == "regression"
+
+    if args.update:
+        save_baseline(args.baseline, results, baseline)
+        print(f"💾 Baseline written to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"❌ {regressions} benchmark(s) regressed by more than {args.threshold:g}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
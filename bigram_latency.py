@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按键延迟分析
+==========
+
+WPM 只是一个平均数，看不出学生在哪些键位转换上慢。本模块接收带时间戳的
+按键流，按班级维护每个键和每个双键组合（bigram）的延迟分布，
+可以随时查询“这个班最慢的 10 个双键组合”。
+
+分布用对数分桶的分位数草图保存（与 DDSketch 相同的思路）：
+桶边界按 (1+α)/(1-α) 等比增长，任何分位数的相对误差不超过 α。
+每个键或双键组合只占固定数量的计数器，与录入的按键数无关，
+因此几百万次按键后内存仍然有界；各行可以直接相加合并。
+
+安装了 NumPy 时整批按键向量化分桶，查询时一次算出所有行的分位数；
+否则回退到纯 Python。
+"""
+
+import argparse
+import math
+import random
+import time
+
+from typing_scoring import BACKSPACE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 分位数的相对误差上限
+RELATIVE_ACCURACY = 0.02
+# 低于该值的间隔计入最低桶；超过 MAX_LATENCY 的间隔视为停顿，不计入
+MIN_LATENCY = 0.005
+MAX_LATENCY = 3.0
+# 默认查询：中位数，至少 20 个样本
+DEFAULT_QUANTILE = 0.5
+DEFAULT_MIN_COUNT = 20
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_OFFSET = math.ceil(math.log(MIN_LATENCY) / _LOG_GAMMA)
+BUCKETS = math.ceil(math.log(MAX_LATENCY) / _LOG_GAMMA) - _OFFSET + 1
+_BACKSPACE_CODE = ord(BACKSPACE)
+_CODE_SPACE = 0x110000
+
+
+def bucket_index(seconds):
+    """延迟所在的桶号"""
+    index = math.ceil(math.log(max(seconds, MIN_LATENCY)) / _LOG_GAMMA) - _OFFSET
+    return min(index, BUCKETS - 1)
+
+
+def bucket_value(index):
+    """桶的代表值：与桶内任意值的相对误差不超过 RELATIVE_ACCURACY"""
+    return 2 * _GAMMA ** (index + _OFFSET) / (_GAMMA + 1)
+
+
+def _encode(label):
+    """把键（单字符）或双键组合（两个字符）编码成行键"""
+    if len(label) == 2:
+        return (ord(label[0]) + 1) * _CODE_SPACE + ord(label[1])
+    return ord(label)
+
+
+def _decode(code):
+    """把行编码还原成键（单字符）或双键组合（两个字符）"""
+    if code >= _CODE_SPACE:
+        return chr(code // _CODE_SPACE - 1) + chr(code % _CODE_SPACE)
+    return chr(code)
+
+
+def _quantile_index(row, q):
+    """按计数数组求分位数所在的桶号"""
+    rank = q * (sum(row) - 1)
+    seen = 0
+    for index, count in enumerate(row):
+        seen += count
+        if seen > rank:
+            return index
+    return len(row) - 1
+
+
+class LatencyTable:
+    """一组延迟草图，每个键或双键组合一行，每行 BUCKETS 个计数器"""
+
+    def __init__(self):
+        self._rows = {}
+        self._codes = []
+        if np is not None:
+            self._counts = np.zeros((16, BUCKETS), dtype=np.uint32)
+        else:
+            self._counts = []
+
+    def __len__(self):
+        return len(self._codes)
+
+    @property
+    def nbytes(self):
+        """计数器占用的字节数"""
+        if np is not None:
+            return self._counts.nbytes
+        return len(self._counts) * BUCKETS * 8
+
+    def _row(self, code):
+        row = self._rows.get(code)
+        if row is None:
+            row = self._rows[code] = len(self._codes)
+            self._codes.append(code)
+            if np is None:
+                self._counts.append([0] * BUCKETS)
+            elif row == len(self._counts):
+                grown = np.zeros((row * 2, BUCKETS), dtype=np.uint32)
+                grown[:row] = self._counts
+                self._counts = grown
+        return row
+
+    def add(self, code, seconds):
+        """记录一次延迟"""
+        row = self._row(code)
+        self._counts[row][bucket_index(seconds)] += 1
+
+    def add_many(self, codes, buckets):
+        """批量记录；codes 与 buckets 为等长的 NumPy 数组"""
+        unique, inverse = np.unique(codes, return_inverse=True)
+        rows = np.fromiter((self._row(int(c)) for c in unique.tolist()),
+                           dtype=np.int64, count=len(unique))
+        flat = rows[inverse] * BUCKETS + buckets
+        used = len(self._codes) * BUCKETS
+        counts = np.bincount(flat, minlength=used).astype(np.uint32)
+        self._counts.reshape(-1)[:used] += counts
+
+    def merge(self, other):
+        """把另一张表的计数加到本表"""
+        for code, row in other._rows.items():
+            target = self._row(code)
+            if np is not None:
+                self._counts[target] += other._counts[row]
+            else:
+                self._counts[target] = [a + b for a, b in
+                                        zip(self._counts[target], other._counts[row])]
+
+    def count(self, label):
+        row = self._rows.get(_encode(label))
+        return 0 if row is None else int(sum(self._counts[row]))
+
+    def quantile(self, label, q=DEFAULT_QUANTILE):
+        """单个键或双键组合的延迟分位数（秒），没有样本时返回 None"""
+        row = self._rows.get(_encode(label))
+        if row is None:
+            return None
+        counts = [int(c) for c in self._counts[row]]
+        if not sum(counts):
+            return None
+        return bucket_value(_quantile_index(counts, q))
+
+    def slowest(self, n=10, q=DEFAULT_QUANTILE, min_count=DEFAULT_MIN_COUNT):
+        """分位数最大的 n 行，返回 [(键或双键组合, 延迟秒, 样本数)]"""
+        if not self._codes:
+            return []
+        if np is None:
+            ranked = []
+            for code, row in self._rows.items():
+                counts = self._counts[row]
+                total = sum(counts)
+                if total >= min_count:
+                    ranked.append((_quantile_index(counts, q), total, code))
+            ranked.sort(key=lambda item: (-item[0], -item[1], item[2]))
+            return [(_decode(code), bucket_value(index), total)
+                    for index, total, code in ranked[:n]]
+
+        counts = self._counts[:len(self._codes)]
+        cumulative = counts.cumsum(axis=1, dtype=np.int64)
+        totals = cumulative[:, -1]
+        ranks = q * (totals - 1)
+        indices = (cumulative > ranks[:, None]).argmax(axis=1)
+        candidates = np.flatnonzero(totals >= min_count)
+        if not len(candidates):
+            return []
+        # 先按分位数桶号、再按样本数降序
+        order = np.lexsort((-totals[candidates], -indices[candidates]))[:n]
+        return [(_decode(self._codes[i]), bucket_value(int(indices[i])), int(totals[i]))
+                for i in candidates[order].tolist()]
+
+
+class KeystrokeAnalytics:
+    """按班级维护单键与双键组合的延迟草图
+
+    每次按键的延迟是它与上一次按键的时间间隔。退格本身及其前后的
+    转换不计入双键组合；超过 MAX_LATENCY 的间隔视为停顿，不计入。
+    """
+
+    def __init__(self):
+        self._classes = {}
+        # 每个班级录入的按键数
+        self._keystrokes = {}
+
+    @property
+    def keystrokes(self):
+        """全部班级录入的按键总数"""
+        return sum(self._keystrokes.values())
+
+    def class_keystrokes(self, class_id):
+        """该班级录入的按键数"""
+        return self._keystrokes.get(class_id, 0)
+
+    def tables(self, class_id):
+        """返回班级的 (单键表, 双键表)，不存在时创建"""
+        tables = self._classes.get(class_id)
+        if tables is None:
+            tables = self._classes[class_id] = (LatencyTable(), LatencyTable())
+        return tables
+
+    def ingest(self, class_id, keys, times):
+        """录入一段按键流：keys 为字符串，times 为对应的时间戳（秒）"""
+        self.ingest_many(class_id, [(keys, times)])
+
+    def ingest_many(self, class_id, streams):
+        """录入多段按键流 [(keys, times), ...]，段与段之间不产生转换
+
+        每段的时间戳个数必须与按键数相同，否则抛出 ValueError（整批都不录入）。
+        """
+        streams = list(streams)
+        for i, (keys, times) in enumerate(streams):
+            if len(times) != len(keys):
+                raise ValueError(f"stream {i}: {len(keys)} keys but {len(times)} timestamps")
+        streams = [(keys, times) for keys, times in streams if len(keys) > 1]
+        if not streams:
+            return
+        key_table, bigram_table = self.tables(class_id)
+        self._keystrokes[class_id] = (self._keystrokes.get(class_id, 0)
+                                      + sum(len(keys) for keys, _ in streams))
+        if np is None:
+            for keys, times in streams:
+                self._ingest_python(key_table, bigram_table, keys, times)
+            return
+
+        codes = np.frombuffer("".join(k for k, _ in streams).encode("utf-32-le"),
+                              dtype=np.uint32).astype(np.int64)
+        times = np.concatenate([np.asarray(t, dtype=np.float64) for _, t in streams])
+        prev, cur = codes[:-1], codes[1:]
+        gaps = np.diff(times)
+        # 每段第一个按键与上一段最后一个按键之间的转换无效
+        lengths = np.fromiter((len(k) for k, _ in streams), dtype=np.int64,
+                              count=len(streams))
+        boundary = np.zeros(len(gaps), dtype=bool)
+        boundary[np.cumsum(lengths)[:-1] - 1] = True
+
+        valid = ~boundary & (gaps > 0) & (gaps <= MAX_LATENCY) & (cur != _BACKSPACE_CODE)
+        buckets = np.ceil(np.log(np.maximum(gaps, MIN_LATENCY)) / _LOG_GAMMA)
+        buckets = np.minimum(buckets.astype(np.int64) - _OFFSET, BUCKETS - 1)
+        key_table.add_many(cur[valid], buckets[valid])
+        valid &= prev != _BACKSPACE_CODE
+        bigram_table.add_many((prev[valid] + 1) * _CODE_SPACE + cur[valid], buckets[valid])
+
+    @staticmethod
+    def _ingest_python(key_table, bigram_table, keys, times):
+        for i in range(1, len(keys)):
+            key = keys[i]
+            gap = times[i] - times[i - 1]
+            if key == BACKSPACE or gap <= 0 or gap > MAX_LATENCY:
+                continue
+            code = ord(key)
+            key_table.add(code, gap)
+            if keys[i - 1] != BACKSPACE:
+                bigram_table.add((ord(keys[i - 1]) + 1) * _CODE_SPACE + code, gap)
+
+    def slowest_bigrams(self, class_id, n=10, q=DEFAULT_QUANTILE,
+                        min_count=DEFAULT_MIN_COUNT):
+        """班级中第 q 分位延迟最大的 n 个双键组合"""
+        tables = self._classes.get(class_id)
+        return [] if tables is None else tables[1].slowest(n, q, min_count)
+
+    def slowest_keys(self, class_id, n=10, q=DEFAULT_QUANTILE,
+                     min_count=DEFAULT_MIN_COUNT):
+        """班级中第 q 分位延迟最大的 n 个键"""
+        tables = self._classes.get(class_id)
+        return [] if tables is None else tables[0].slowest(n, q, min_count)
+
+    def quantile(self, class_id, label, q=DEFAULT_QUANTILE):
+        """单键（一个字符）或双键组合（两个字符）的延迟分位数"""
+        tables = self._classes.get(class_id)
+        if tables is None:
+            return None
+        key_table, bigram_table = tables
+        return (bigram_table if len(label) == 2 else key_table).quantile(label, q)
+
+    def merged(self, class_ids=None):
+        """把若干班级（默认全部）合并成一个新的分析对象，用于全校查询"""
+        result = KeystrokeAnalytics()
+        key_table, bigram_table = result.tables(None)
+        total = 0
+        for class_id, (keys, bigrams) in self._classes.items():
+            if class_ids is None or class_id in class_ids:
+                key_table.merge(keys)
+                bigram_table.merge(bigrams)
+                total += self.class_keystrokes(class_id)
+        result._keystrokes[None] = total
+        return result
+
+    @property
+    def nbytes(self):
+        """全部草图计数器占用的字节数"""
+        return sum(k.nbytes + b.nbytes for k, b in self._classes.values())
+
+
+def synthesize_streams(count, length=300, seed=7):
+    """生成模拟按键流：部分双键组合明显更慢，偶尔打错后退格"""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz "
+    slow = {"qu": 0.45, "zx": 0.5, "br": 0.35, "ck": 0.4, "mn": 0.38}
+    streams = []
+    for _ in range(count):
+        keys = []
+        times = []
+        now = 0.0
+        prev = " "
+        for _ in range(length):
+            if rng.random() < 0.03:
+                now += rng.uniform(0.1, 0.3)
+                keys.append("#")
+                times.append(now)
+                now += rng.uniform(0.1, 0.2)
+                keys.append(BACKSPACE)
+                times.append(now)
+            key = rng.choice(letters)
+            base = slow.get(prev + key, 0.16)
+            now += rng.lognormvariate(math.log(base), 0.3)
+            keys.append(key)
+            times.append(now)
+            prev = key
+        streams.append(("".join(keys), times))
+    return streams
+
+
+def run_benchmark(keystrokes=2_000_000, classes=20, length=300, queries=100):
+    """录入数百万次按键后测量“最慢 10 个双键组合”查询耗时"""
+    sessions = max(1, keystrokes // length)
+    streams = synthesize_streams(sessions, length)
+    analytics = KeystrokeAnalytics()
+
+    began = time.perf_counter()
+    per_class = (len(streams) + classes - 1) // classes
+    for c in range(classes):
+        analytics.ingest_many(f"class-{c}", streams[c * per_class:(c + 1) * per_class])
+    ingest_s = time.perf_counter() - began
+
+    began = time.perf_counter()
+    for i in range(queries):
+        top = analytics.slowest_bigrams(f"class-{i % classes}")
+    query_ms = (time.perf_counter() - began) / queries * 1000
+
+    began = time.perf_counter()
+    school = analytics.merged()
+    school_top = school.slowest_bigrams(None)
+    school_ms = (time.perf_counter() - began) * 1000
+
+    return {"keystrokes": analytics.keystrokes, "classes": classes,
+            "ingest_s": ingest_s, "query_ms": query_ms, "school_ms": school_ms,
+            "top": top, "school_top": school_top, "bytes": analytics.nbytes,
+            "backend": "numpy" if np is not None else "python"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-bigram keystroke latency analytics")
+    parser.add_argument("--keystrokes", type=int, default=2_000_000,
+                        help="synthetic keystrokes to ingest (default: %(default)s)")
+    parser.add_argument("--classes", type=int, default=20,
+                        help="number of classes (default: %(default)s)")
+    args = parser.parse_args()
+
+    r = run_benchmark(args.keystrokes, args.classes)
+    print(f"📊 {r['keystrokes']} keystrokes in {r['classes']} classes ({r['backend']})")
+    print(f"   ingest                    {r['ingest_s']:8.2f} s "
+          f"({r['keystrokes'] / r['ingest_s'] / 1e6:.2f} M keys/s)")
+    print(f"   slowest 10 bigrams, class {r['query_ms']:8.2f} ms")
+    print(f"   slowest 10 bigrams, school{r['school_ms']:8.2f} ms (merge + query)")
+    print(f"   sketch memory             {r['bytes'] / 1024 / 1024:8.1f} MB")
+    print("   school-wide p50: " + ", ".join(
+        f"{label!r} {seconds * 1000:.0f} ms" for label, seconds, _ in r["school_top"][:5]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+代码静态指标
+==========
+
+基于 AST 统计类 / 方法数量、圈复杂度、文档字符串覆盖率，
+并用代码行滑动窗口的哈希计算重复率。
+
+analyze_files() 在进程池中分析文件，结果按文件内容的哈希缓存，
+内容不变的文件（即使改名或移动）重新生成报告时不再解析。
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+CACHE_VERSION = 1
+DEFAULT_CACHE = ".metrics_cache.json"
+# 重复检测的窗口行数
+DUPLICATE_WINDOW = 6
+# 未命中缓存的文件少于该数量时直接在当前进程分析，不启动进程池
+MIN_POOL_FILES = 16
+
+# 每个出现都使圈复杂度 +1 的节点
+_BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp,
+                 ast.ExceptHandler, ast.Assert, ast.comprehension, ast.match_case)
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def cyclomatic_complexity(node):
+    """函数的 McCabe 圈复杂度，不计入嵌套函数和类"""
+    complexity = 1
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, _FUNCTION_NODES + (ast.ClassDef, ast.Lambda)):
+            continue
+        if isinstance(child, _BRANCH_NODES):
+            complexity += 1
+            if isinstance(child, ast.comprehension):
+                complexity += len(child.ifs)
+        elif isinstance(child, ast.BoolOp):
+            complexity += len(child.values) - 1
+        elif isinstance(child, ast.Try):
+            complexity += bool(child.orelse)
+        stack.extend(ast.iter_child_nodes(child))
+    return complexity
+
+
+def _window_hashes(source):
+    """去掉空行和注释后，每 DUPLICATE_WINDOW 行一个窗口的哈希"""
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            lines.append(line)
+    hashes = []
+    for i in range(len(lines) - DUPLICATE_WINDOW + 1):
+        window = "\n".join(lines[i:i + DUPLICATE_WINDOW]).encode("utf-8")
+        hashes.append(int.from_bytes(
+            hashlib.blake2b(window, digest_size=8).digest(), "little"))
+    return len(lines), hashes
+
+
+def analyze_source(source):
+    """分析一段 Python 源码，返回指标字典；语法错误时只有 error 字段"""
+    if isinstance(source, bytes):
+        source = source.decode("utf-8", errors="replace")
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError) as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+    classes = methods = functions = 0
+    documentable = documented = 0
+    complexities = []
+    worst = None
+
+    if ast.get_docstring(tree) is not None:
+        documented += 1
+    documentable += 1
+
+    # (节点, 是否直接位于类体中)
+    stack = [(child, False) for child in tree.body]
+    while stack:
+        node, in_class = stack.pop()
+        if isinstance(node, ast.ClassDef):
+            classes += 1
+        elif isinstance(node, _FUNCTION_NODES):
+            if in_class:
+                methods += 1
+            else:
+                functions += 1
+            complexity = cyclomatic_complexity(node)
+            complexities.append(complexity)
+            if worst is None or complexity > worst[0]:
+                worst = (complexity, node.name, node.lineno)
+        else:
+            stack.extend((child, False) for child in ast.iter_child_nodes(node))
+            continue
+        documentable += 1
+        if ast.get_docstring(node) is not None:
+            documented += 1
+        is_class = isinstance(node, ast.ClassDef)
+        stack.extend((child, is_class) for child in node.body)
+
+    code_lines, windows = _window_hashes(source)
+    return {
+        "classes": classes,
+        "methods": methods,
+        "functions": functions,
+        "complexity_total": sum(complexities),
+        "complexity_max": worst[0] if worst else 0,
+        "complexity_max_name": f"{worst[1]}:{worst[2]}" if worst else "",
+        "documentable": documentable,
+        "documented": documented,
+        "code_lines": code_lines,
+        "windows": windows,
+    }
+
+
+class MetricsCache:
+    """内容哈希 → 指标字典的磁盘缓存"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data.get("metrics", {})
+
+    def get(self, digest):
+        return self.entries.get(digest)
+
+    def put(self, digest, metrics):
+        self.entries[digest] = metrics
+        self.dirty = True
+
+    def save(self, keep=None):
+        """写回磁盘；keep 给出时只保留这些哈希，避免缓存无限增长"""
+        if keep is not None and len(keep) < len(self.entries):
+            self.entries = {k: v for k, v in self.entries.items() if k in keep}
+            self.dirty = True
+        if not self.path or not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "metrics": self.entries}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def analyze_files(paths, cache=None, processes=None):
+    """分析多个文件，返回 ({路径: 指标字典}, 命中缓存数, 本次见到的内容哈希集合)
+
+    读取文件并计算内容哈希在当前进程完成，只有未命中缓存的源码
+    才发送到进程池解析。无法读取的文件不出现在结果中。
+    哈希集合可传给 MetricsCache.save(keep=...)，丢弃已不存在的旧版本。
+    """
+    cache = cache if cache is not None else MetricsCache()
+    results = {}
+    pending = {}
+    seen = set()
+    hits = 0
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        digest = content_hash(data)
+        seen.add(digest)
+        metrics = cache.get(digest)
+        if metrics is not None:
+            results[path] = metrics
+            hits += 1
+        else:
+            pending.setdefault(digest, (data, []))[1].append(path)
+
+    if pending:
+        digests = list(pending)
+        sources = [pending[d][0] for d in digests]
+        if len(sources) < MIN_POOL_FILES or processes == 1:
+            analyzed = list(map(analyze_source, sources))
+        else:
+            workers = processes or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                analyzed = list(pool.map(analyze_source, sources,
+                                         chunksize=max(1, len(sources) // (workers * 4))))
+        for digest, metrics in zip(digests, analyzed):
+            cache.put(digest, metrics)
+            for path in pending[digest][1]:
+                results[path] = metrics
+    return results, hits, seen
+
+
+def duplicated_lines(results):
+    """按窗口哈希计算每个文件的重复代码行数，返回 {路径: 重复行数}
+
+    一个窗口在全部文件中出现两次及以上时，它覆盖的代码行算作重复。
+    """
+    counts = Counter()
+    for metrics in results.values():
+        counts.update(metrics.get("windows", ()))
+    duplicated = {}
+    for path, metrics in results.items():
+        windows = metrics.get("windows", ())
+        covered = bytearray(metrics.get("code_lines", 0))
+        for i, digest in enumerate(windows):
+            if counts[digest] > 1:
+                covered[i:i + DUPLICATE_WINDOW] = b"\1" * DUPLICATE_WINDOW
+        duplicated[path] = sum(covered)
+    return duplicated
+
+
+def summarize(results, duplicated=None):
+    """汇总若干文件的指标；没有可解析的文件时返回 None"""
+    parsed = {p: m for p, m in results.items() if "error" not in m}
+    if not parsed:
+        return None
+    duplicated = duplicated if duplicated is not None else duplicated_lines(parsed)
+    total = Counter()
+    for metrics in parsed.values():
+        for key in ("classes", "methods", "functions", "complexity_total",
+                    "documentable", "documented", "code_lines"):
+            total[key] += metrics[key]
+    callables = total["methods"] + total["functions"]
+    return {
+        "files": len(parsed),
+        "errors": len(results) - len(parsed),
+        "classes": total["classes"],
+        "methods": total["methods"],
+        "functions": total["functions"],
+        "complexity_avg": total["complexity_total"] / callables if callables else 0.0,
+        "complexity_max": max(m["complexity_max"] for m in parsed.values()),
+        "docstring_coverage": (total["documented"] / total["documentable"] * 100
+                               if total["documentable"] else 0.0),
+        "duplication": (sum(duplicated.get(p, 0) for p in parsed)
+                        / total["code_lines"] * 100 if total["code_lines"] else 0.0),
+        "code_lines": total["code_lines"],
+    }
+
+
+def _make_sources(root, files):
+    template = '''"""Variant {i}."""
+
+
+class Game{i}:
+    """Game number {i}."""
+
+    def __init__(self, level):
+        self.level = level
+
+    def score(self, typed, expected):
+        total = 0
+        for a, b in zip(typed, expected):
+            if a == b and a != " ":
+                total += {i}
+            elif a != b or b == "x":
+                total -= 1
+        return total
+
+
+def helper_{i}(values):
+    return [v * {i} for v in values if v > 0]
+'''
+    for i in range(files):
+        directory = os.path.join(root, f"variant{i % 40:02d}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"game{i}.py"), "w") as f:
+            f.write(template.format(i=i) * 5)
+
+
+def run_benchmark(files=2000, processes=None):
+    """比较单进程、进程池首次分析与缓存命中后的重新分析"""
+    from report_engine import iter_source_files
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "tree")
+        _make_sources(root, files)
+        paths = list(iter_source_files(root))
+
+        began = time.perf_counter()
+        analyze_files(paths, MetricsCache(), processes=1)
+        serial_s = time.perf_counter() - began
+
+        cache = MetricsCache(os.path.join(tmp, "metrics.json"))
+        began = time.perf_counter()
+        results, _, _ = analyze_files(paths, cache, processes)
+        summary = summarize(results)
+        cache.save()
+        cold_s = time.perf_counter() - began
+
+        began = time.perf_counter()
+        results, hits, _ = analyze_files(paths, MetricsCache(cache.path), processes)
+        summarize(results)
+        warm_s = time.perf_counter() - began
+
+    return {"files": len(paths), "serial_s": serial_s, "cold_s": cold_s,
+            "warm_s": warm_s, "hits": hits, "summary": summary,
+            "processes": processes or os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static metrics benchmark")
+    parser.add_argument("--files", type=int, default=2000,
+                        help="synthetic source files (default: %(default)s)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    r = run_benchmark(args.files, args.processes)
+    s = r["summary"]
+    print(f"📊 {r['files']} files: {s['classes']} classes, {s['methods']} methods, "
+          f"avg complexity {s['complexity_avg']:.2f}, "
+          f"docstrings {s['docstring_coverage']:.0f}%, "
+          f"duplication {s['duplication']:.0f}%")
+    print(f"   single process           {r['serial_s'] * 1000:8.0f} ms")
+    print(f"   {r['processes']} processes, cold cache  {r['cold_s'] * 1000:8.0f} ms")
+    print(f"   rerun, cache hits {r['hits']:>5}  {r['warm_s'] * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+磁盘索引文本语料库
+================
+
+ContentManager 把全部句子放在内存里。本模块把几十万段文本写成单个
+语料文件，按 (年级, 难度, 字符集, 长度) 排序后建立偏移索引，
+打开时只读取文件头和分桶目录，正文通过 mmap 按需读取，
+因此启动耗时不随语料规模增长。
+
+文件布局（小端）：
+    文件头    HEADER_FORMAT
+    正文区    UTF-8 文本依次拼接
+    记录表    每段一条 RECORD_FORMAT（正文偏移, 字节数, 字符数），按排序键排列
+    分桶目录  每个 (年级, 难度, 字符集) 一条 BUCKET_FORMAT（起始记录号, 记录数）
+"""
+
+import argparse
+import bisect
+import mmap
+import os
+import random
+import string
+import struct
+import tempfile
+import time
+from collections import namedtuple
+
+MAGIC = b"TPCORP01"
+HEADER_FORMAT = "<8sIQIQQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_FORMAT = "<QII"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+BUCKET_FORMAT = "<BBHQQ"
+BUCKET_SIZE = struct.calcsize(BUCKET_FORMAT)
+
+# 字符集标记：每段文本记录它用到了哪些字符类别
+CHARSET_LOWER = 1
+CHARSET_UPPER = 2
+CHARSET_DIGIT = 4
+CHARSET_PUNCT = 8
+CHARSET_SPACE = 16
+CHARSET_OTHER = 32
+CHARSET_ALL = 63
+
+_LOWER = set(string.ascii_lowercase)
+_UPPER = set(string.ascii_uppercase)
+_DIGIT = set(string.digits)
+_PUNCT = set(string.punctuation)
+_SPACE = set(" \t\n")
+
+Bucket = namedtuple("Bucket", ["grade", "difficulty", "charset", "start", "count"])
+
+
+def charset_mask(text):
+    """计算文本用到的字符类别标记"""
+    chars = set(text)
+    mask = 0
+    if chars & _LOWER:
+        mask |= CHARSET_LOWER
+    if chars & _UPPER:
+        mask |= CHARSET_UPPER
+    if chars & _DIGIT:
+        mask |= CHARSET_DIGIT
+    if chars & _PUNCT:
+        mask |= CHARSET_PUNCT
+    if chars & _SPACE:
+        mask |= CHARSET_SPACE
+    if chars - _LOWER - _UPPER - _DIGIT - _PUNCT - _SPACE:
+        mask |= CHARSET_OTHER
+    return mask
+
+
+def build_corpus(path, passages):
+    """把 (文本, 年级, 难度) 序列写成语料文件，返回段数
+
+    年级和难度都是 0-255 的整数。构建时只在内存中保留每段的元数据，
+    正文先顺序写入临时文件。
+    """
+    entries = []
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryFile(dir=directory) as data:
+        offset = 0
+        for text, grade, difficulty in passages:
+            encoded = text.encode("utf-8")
+            data.write(encoded)
+            entries.append((int(grade), int(difficulty), charset_mask(text),
+                            len(text), offset, len(encoded)))
+            offset += len(encoded)
+        entries.sort()
+
+        buckets = []
+        for i, (grade, difficulty, charset, _, _, _) in enumerate(entries):
+            if buckets and buckets[-1][:3] == [grade, difficulty, charset]:
+                buckets[-1][4] += 1
+            else:
+                buckets.append([grade, difficulty, charset, i, 1])
+
+        data_offset = HEADER_SIZE
+        table_offset = data_offset + offset
+        bucket_offset = table_offset + len(entries) * RECORD_SIZE
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(struct.pack(HEADER_FORMAT, MAGIC, 1, len(entries), len(buckets),
+                                  data_offset, table_offset, bucket_offset))
+            data.seek(0)
+            while True:
+                chunk = data.read(1 << 20)
+                if not chunk:
+                    break
+                out.write(chunk)
+            for _, _, _, length, start, size in entries:
+                out.write(struct.pack(RECORD_FORMAT, start, size, length))
+            for bucket in buckets:
+                out.write(struct.pack(BUCKET_FORMAT, *bucket))
+        os.replace(tmp_path, path)
+    return len(entries)
+
+
+class CorpusContentManager:
+    """基于语料文件的内容管理器
+
+    接口与 ContentManager 保持一致（get_available_grades / validate_grade /
+    get_sentence_for_grade），另外提供按难度、长度和字符集过滤的 sample()。
+    年级对外以字符串表示，与 GameConfig.initial_grade 一致。
+    """
+
+    def __init__(self, path, rng=None):
+        self.path = path
+        self._rng = rng or random.Random()
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty")
+        (magic, version, count, bucket_count, self._data_offset,
+         self._table_offset, bucket_offset) = struct.unpack_from(HEADER_FORMAT, self._mm)
+        if magic != MAGIC or version != 1:
+            self.close()
+            raise ValueError(f"{path} is not a corpus file")
+        self._count = count
+
+        self._buckets = [Bucket(*struct.unpack_from(BUCKET_FORMAT, self._mm,
+                                                    bucket_offset + i * BUCKET_SIZE))
+                         for i in range(bucket_count)]
+        # 记录按年级、难度排序，所以同一年级（或年级+难度）的记录是连续区间
+        self._grade_ranges = {}
+        self._level_ranges = {}
+        for b in self._buckets:
+            for table, key in ((self._grade_ranges, b.grade),
+                               (self._level_ranges, (b.grade, b.difficulty))):
+                start, end = table.get(key, (b.start, b.start))
+                table[key] = (min(start, b.start), max(end, b.start + b.count))
+        self._grades = [str(g) for g in sorted(self._grade_ranges)]
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """关闭 mmap 与文件"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def _record(self, index):
+        return struct.unpack_from(RECORD_FORMAT, self._mm,
+                                  self._table_offset + index * RECORD_SIZE)
+
+    def get_passage(self, index):
+        """按记录号读取一段文本"""
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start, size, _ = self._record(index)
+        start += self._data_offset
+        return self._mm[start:start + size].decode("utf-8")
+
+    def passage_length(self, index):
+        """按记录号读取字符数（不解码正文）"""
+        return self._record(index)[2]
+
+    @staticmethod
+    def _parse_grade(grade):
+        try:
+            return int(grade)
+        except (TypeError, ValueError):
+            return None
+
+    def get_available_grades(self):
+        """获取可用年级列表"""
+        return list(self._grades)
+
+    def validate_grade(self, grade):
+        """验证年级是否存在"""
+        return self._parse_grade(grade) in self._grade_ranges
+
+    def grade_range(self, grade):
+        """返回指定年级的记录号区间 (start, end)，年级无效时返回 None"""
+        return self._grade_ranges.get(self._parse_grade(grade))
+
+    def get_sentence_for_grade(self, grade):
+        """随机取一段指定年级的文本，年级无效时返回 None"""
+        key = self._parse_grade(grade)
+        if key not in self._grade_ranges:
+            return None
+        start, end = self._grade_ranges[key]
+        return self.get_passage(self._rng.randrange(start, end))
+
+    def _length_range(self, bucket, min_length, max_length):
+        """在桶内按长度二分，返回满足条件的记录区间"""
+        lo, hi = bucket.start, bucket.start + bucket.count
+        lengths = _LengthView(self, lo, hi)
+        first = lo + (bisect.bisect_left(lengths, min_length) if min_length else 0)
+        last = lo + (bisect.bisect_right(lengths, max_length)
+                     if max_length is not None else bucket.count)
+        return first, last
+
+    def sample_index(self, grade=None, difficulty=None, min_length=None,
+                     max_length=None, charset=CHARSET_ALL):
+        """按条件随机选一条记录号，没有匹配时返回 None
+
+        只按年级（或年级+难度）过滤时直接在连续区间内取随机数；
+        带长度或字符集条件时在每个匹配的桶里二分长度，再按区间大小加权选择。
+        """
+        grade_key = None if grade is None else self._parse_grade(grade)
+        if grade is not None and grade_key not in self._grade_ranges:
+            return None
+        if min_length is None and max_length is None and charset == CHARSET_ALL:
+            if grade_key is None and difficulty is None:
+                return self._rng.randrange(self._count) if self._count else None
+            if grade_key is not None:
+                if difficulty is None:
+                    span = self._grade_ranges[grade_key]
+                else:
+                    span = self._level_ranges.get((grade_key, difficulty))
+                return None if span is None else self._rng.randrange(*span)
+
+        spans = []
+        total = 0
+        for b in self._buckets:
+            if grade_key is not None and b.grade != grade_key:
+                continue
+            if difficulty is not None and b.difficulty != difficulty:
+                continue
+            if b.charset & ~charset:
+                continue
+            first, last = self._length_range(b, min_length, max_length)
+            if last > first:
+                total += last - first
+                spans.append((total, first))
+        if not spans:
+            return None
+        pick = self._rng.randrange(total)
+        i = bisect.bisect_right([end for end, _ in spans], pick)
+        end, first = spans[i]
+        previous = spans[i - 1][0] if i else 0
+        return first + (pick - previous)
+
+    def sample(self, **filters):
+        """按条件随机取一段文本，没有匹配时返回 None"""
+        index = self.sample_index(**filters)
+        return None if index is None else self.get_passage(index)
+
+
+class _LengthView:
+    """把桶内记录的字符数包装成可二分的只读序列"""
+
+    def __init__(self, corpus, start, end):
+        self._corpus = corpus
+        self._start = start
+        self._len = end - start
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        return self._corpus.passage_length(self._start + i)
+
+
+def read_tsv(path):
+    """读取 "年级<TAB>难度<TAB>文本" 格式的源文件"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            grade, difficulty, text = line.split("\t", 2)
+            yield text, int(grade), int(difficulty)
+
+
+def synthesize_passages(count, seed=1):
+    """生成模拟语料：年级 1-6、难度 1-5、长度随年级增长"""
+    rng = random.Random(seed)
+    words = ("cat dog sun run play read book tree bird fish school friend "
+             "teacher happy family garden window yellow purple because "
+             "together beautiful important remember").split()
+    for _ in range(count):
+        grade = rng.randint(1, 6)
+        size = rng.randint(3, 4 + grade * 3)
+        text = " ".join(rng.choice(words) for _ in range(size))
+        if rng.random() < 0.5:
+            text = text.capitalize() + "."
+        yield text, grade, rng.randint(1, 5)
+
+
+def run_benchmark(counts=(10_000, 100_000, 300_000), samples=10_000):
+    """比较不同规模语料的打开耗时与随机抽样耗时"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            path = os.path.join(tmp, f"bench-{count}.corpus")
+            began = time.perf_counter()
+            build_corpus(path, synthesize_passages(count))
+            build = time.perf_counter() - began
+
+            began = time.perf_counter()
+            corpus = CorpusContentManager(path)
+            open_ms = (time.perf_counter() - began) * 1000
+
+            began = time.perf_counter()
+            for _ in range(samples):
+                corpus.get_sentence_for_grade("3")
+            grade_us = (time.perf_counter() - began) / samples * 1e6
+
+            began = time.perf_counter()
+            for _ in range(samples):
+                corpus.sample(grade="3", min_length=40, max_length=80,
+                              charset=CHARSET_LOWER | CHARSET_SPACE)
+            filtered_us = (time.perf_counter() - began) / samples * 1e6
+            corpus.close()
+            results.append((count, build, open_ms, grade_us, filtered_us))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexed passage corpus")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build a corpus from grade<TAB>difficulty<TAB>text lines")
+    build.add_argument("source")
+    build.add_argument("output")
+    sub.add_parser("bench", help="measure open and sampling cost at several corpus sizes")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_corpus(args.output, read_tsv(args.source))
+        print(f"📚 Wrote {count} passages to {args.output}")
+        return
+
+    print(f"{'passages':>9} {'build s':>8} {'open ms':>8} {'grade µs':>9} {'filtered µs':>12}")
+    for count, build_s, open_ms, grade_us, filtered_us in run_benchmark():
+        print(f"{count:>9} {build_s:>8.2f} {open_ms:>8.3f} {grade_us:>9.2f} {filtered_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,616 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多会话打字游戏服务器
+==================
+
+一个事件循环承载整个班级的会话：客户端通过 WebSocket 分批上传按键，
+服务器用 ScoringSession 计分；排行榜按固定节拍（tick）合并推送，
+每个房间每个节拍只编码一次，再把同一帧写给所有订阅者，
+因此班级变大时每次推送的开销只随连接数线性增长，与按键频率无关。
+
+消息均为 JSON 文本帧：
+
+- 客户端 → 服务器：
+  {"type": "join", "room": "3-2", "name": "Amy", "text": "..."}（或 "grade": "3"），
+  可选 "passage" 为文本编号，用于匹配文本专属成就
+  {"type": "keys", "keys": "abc\\b"}，"\\b" 表示退格
+  {"type": "watch", "room": "3-2"}，只看排行榜（教师端）
+  {"type": "state"}，查询自己的统计
+- 服务器 → 客户端：joined（附带 passage_tokens 分段）/ state / leaderboard /
+  achievement / error
+
+挂上 achievements.AchievementEngine 后，每个节拍对本节拍内上传过按键的
+全部会话批量求值一次成就，新解锁的成就单独推送给对应玩家。
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import os
+import random
+import struct
+import time
+from collections import deque
+from contextlib import suppress
+
+from achievements import DEFAULT_RULES, AchievementEngine, collect_metrics, load_rules
+from passage_analysis import analyze, configure
+from typing_scoring import ScoringSession, make_passage
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WEBSOCKET_PATH = "/ws"
+# 排行榜推送频率（次/秒）
+DEFAULT_TICK_RATE = 4
+# 排行榜条目数
+LEADERBOARD_SIZE = 10
+# 单条消息上限
+MAX_MESSAGE_SIZE = 64 * 1024
+# 发送缓冲超过该值的慢客户端跳过本次推送，下个节拍再发最新排行
+MAX_PENDING_BYTES = 256 * 1024
+# 保留最近多少个节拍的耗时
+TICK_HISTORY = 1024
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocketError(Exception):
+    """WebSocket 协议错误"""
+
+
+def websocket_accept(key):
+    """由 Sec-WebSocket-Key 计算 Sec-WebSocket-Accept"""
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def encode_frame(opcode, payload, mask=False):
+    """编码一个完整（FIN）帧；客户端发送的帧必须 mask"""
+    head = bytearray([0x80 | opcode])
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        head.append(mask_bit | length)
+    elif length < 1 << 16:
+        head.append(mask_bit | 126)
+        head += struct.pack("!H", length)
+    else:
+        head.append(mask_bit | 127)
+        head += struct.pack("!Q", length)
+    if mask:
+        key = os.urandom(4)
+        head += key
+        payload = _apply_mask(payload, key)
+    return bytes(head) + payload
+
+
+def _apply_mask(payload, key):
+    # 按整数异或，比逐字节循环快得多
+    length = len(payload)
+    repeated = (key * (length // 4 + 1))[:length]
+    value = int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")
+    return value.to_bytes(length, "big")
+
+
+async def read_frame(reader, max_size=MAX_MESSAGE_SIZE, require_mask=False):
+    """读取一个帧，返回 (fin, opcode, payload)
+
+    服务器读取客户端的帧时 require_mask 为真：RFC 6455 §5.1 要求客户端
+    发出的每一帧都带 mask，否则服务器应以 1002 关闭连接。
+    """
+    first, second = await reader.readexactly(2)
+    fin = bool(first & 0x80)
+    opcode = first & 0x0F
+    if first & 0x70:
+        raise WebSocketError("reserved bits set")
+    if require_mask and not second & 0x80:
+        raise WebSocketError("client frame is not masked")
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > max_size:
+        raise WebSocketError("frame too large")
+    key = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if key is not None:
+        payload = _apply_mask(payload, key)
+    return fin, opcode, payload
+
+
+async def read_message(reader, writer, max_size=MAX_MESSAGE_SIZE,
+                       require_mask=False):
+    """读取一条完整消息（合并分片，自动回应 ping），连接关闭时返回 None"""
+    parts = []
+    size = 0
+    while True:
+        fin, opcode, payload = await read_frame(reader, max_size, require_mask)
+        if opcode == OP_CLOSE:
+            with suppress(ConnectionError):
+                writer.write(encode_frame(OP_CLOSE, payload[:2]))
+            return None
+        if opcode == OP_PING:
+            writer.write(encode_frame(OP_PONG, payload))
+            continue
+        if opcode == OP_PONG:
+            continue
+        if (opcode == OP_CONTINUATION) != bool(parts):
+            raise WebSocketError("unexpected continuation frame")
+        size += len(payload)
+        if size > max_size:
+            raise WebSocketError("message too large")
+        parts.append(payload)
+        if fin:
+            return b"".join(parts)
+
+
+def handshake_response(headers):
+    """校验升级请求头，返回 101 响应；不合法时抛出 WebSocketError"""
+    key = headers.get("sec-websocket-key")
+    if (headers.get("upgrade", "").lower() != "websocket" or not key
+            or headers.get("sec-websocket-version") != "13"):
+        raise WebSocketError("not a WebSocket upgrade")
+    return ("HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {websocket_accept(key)}\r\n\r\n").encode("ascii")
+
+
+class Player:
+    """一个连接对应的玩家"""
+
+    __slots__ = ("id", "name", "room", "session", "writer", "achievement_row")
+
+    def __init__(self, player_id, name, room, session, writer):
+        self.id = player_id
+        self.name = name
+        self.room = room
+        self.session = session
+        self.writer = writer
+        self.achievement_row = None
+
+
+class Room:
+    """一个班级：玩家、旁观者和待推送标记"""
+
+    __slots__ = ("name", "players", "watchers", "dirty")
+
+    def __init__(self, name):
+        self.name = name
+        self.players = {}
+        self.watchers = set()
+        self.dirty = False
+
+    def subscribers(self):
+        for player in self.players.values():
+            yield player.writer
+        yield from self.watchers
+
+
+class GameServer:
+    """多会话游戏服务器，handle() 可以挂到 AsyncStaticServer 的 WebSocket 路由上
+
+    content 为可选的 ContentManager 兼容对象（提供 get_sentence_for_grade），
+    客户端 join 时只给年级不给文本时由它选文。
+    achievements 为可选的 AchievementEngine，每个节拍批量求值。
+    """
+
+    def __init__(self, content=None, tick_rate=DEFAULT_TICK_RATE,
+                 leaderboard_size=LEADERBOARD_SIZE, clock=time.monotonic,
+                 achievements=None):
+        self.content = content
+        self.achievements = achievements
+        # 本节拍内上传过按键、需要求值成就的玩家
+        self._fed = {}
+        self.tick_interval = 1.0 / tick_rate
+        self.leaderboard_size = leaderboard_size
+        self._clock = clock
+        self._rooms = {}
+        self._ids = itertools.count(1)
+        self._ticker = None
+        self.ticks = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.batches = 0
+        self.keystrokes = 0
+        self.achievements_unlocked = 0
+        self.tick_durations = deque(maxlen=TICK_HISTORY)
+
+    def room(self, name):
+        room = self._rooms.get(name)
+        if room is None:
+            room = self._rooms[name] = Room(name)
+        return room
+
+    @property
+    def player_count(self):
+        return sum(len(room.players) for room in self._rooms.values())
+
+    async def close(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._ticker
+
+    def _ensure_ticker(self):
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.get_running_loop().create_task(self._tick_loop())
+
+    async def _tick_loop(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.tick_interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            self.tick()
+
+    def tick(self):
+        """推送所有有变化房间的排行榜"""
+        began = time.perf_counter()
+        now = self._clock()
+        self.ticks += 1
+        if self._fed:
+            self._evaluate_achievements(now)
+        for name in list(self._rooms):
+            room = self._rooms[name]
+            if not room.players and not room.watchers:
+                del self._rooms[name]
+                continue
+            if not room.dirty:
+                continue
+            room.dirty = False
+            frame = encode_frame(OP_TEXT, json.dumps(
+                self.leaderboard(room, now), ensure_ascii=False).encode("utf-8"))
+            for writer in room.subscribers():
+                transport = writer.transport
+                if transport.is_closing() or \
+                        transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                    self.frames_skipped += 1
+                    room.dirty = True
+                    continue
+                transport.write(frame)
+                self.frames_sent += 1
+        self.tick_durations.append(time.perf_counter() - began)
+
+    def _evaluate_achievements(self, now):
+        players = list(self._fed.values())
+        self._fed.clear()
+        metrics = collect_metrics([player.session for player in players], now)
+        rows = [player.achievement_row for player in players]
+        by_row = dict(zip(rows, players))
+        for row, rule in self.achievements.evaluate(rows, metrics):
+            self.achievements_unlocked += 1
+            writer = by_row[row].writer
+            if not writer.transport.is_closing():
+                self._send(writer, {"type": "achievement", "id": rule.id,
+                                    "title": rule.title, "desc": rule.desc})
+
+    def leaderboard(self, room, now=None):
+        """房间排行榜：按 WPM 降序，WPM 相同时进度高者在前"""
+        now = self._clock() if now is None else now
+        rows = []
+        for player in room.players.values():
+            session = player.session
+            rows.append((round(session.get_wpm(now), 1),
+                         round(session.get_progress(), 1), player, session))
+        rows.sort(key=lambda row: (row[0], row[1]), reverse=True)
+        entries = [{
+            "rank": rank,
+            "id": player.id,
+            "name": player.name,
+            "wpm": wpm,
+            "accuracy": round(session.get_accuracy(), 1),
+            "progress": progress,
+            "complete": session.is_complete,
+        } for rank, (wpm, progress, player, session)
+            in enumerate(rows[:self.leaderboard_size], 1)]
+        return {"type": "leaderboard", "room": room.name, "tick": self.ticks,
+                "players": len(rows), "entries": entries}
+
+    async def handle(self, reader, writer, headers):
+        """处理一个已读取请求头的 WebSocket 升级请求"""
+        try:
+            writer.write(handshake_response(headers))
+        except WebSocketError:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n"
+                         b"Connection: close\r\n\r\n")
+            await writer.drain()
+            return
+        self._ensure_ticker()
+        player = None
+        watching = None
+        try:
+            while True:
+                message = await read_message(reader, writer, require_mask=True)
+                if message is None:
+                    break
+                try:
+                    request = json.loads(message)
+                    if not isinstance(request, dict):
+                        raise ValueError("message must be an object")
+                    kind = request.get("type")
+                    if kind == "keys" and player is not None:
+                        self._feed(player, request.get("keys"))
+                    elif kind == "join" and player is None and watching is None:
+                        player = self._join(request, writer)
+                    elif kind == "watch" and player is None and watching is None:
+                        watching = self.room(str(request.get("room", "")))
+                        watching.watchers.add(writer)
+                        watching.dirty = True
+                    elif kind == "state" and player is not None:
+                        self._send(writer, {"type": "state",
+                                            **player.session.snapshot()})
+                    else:
+                        raise ValueError(f"unexpected message type {kind!r}")
+                except RecursionError:
+                    # 深层嵌套的数组 / 对象超出 json 解析器的递归深度
+                    self._send(writer, {"type": "error",
+                                        "error": "message is nested too deeply"})
+                except (ValueError, TypeError) as e:
+                    self._send(writer, {"type": "error", "error": str(e)})
+                await writer.drain()
+        except WebSocketError:
+            # 协议错误：以 1002 关闭连接
+            with suppress(ConnectionError):
+                writer.write(encode_frame(OP_CLOSE, struct.pack("!H", 1002)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if player is not None:
+                self._fed.pop(player.id, None)
+                if player.achievement_row is not None:
+                    self.achievements.release(player.achievement_row)
+                room = self._rooms.get(player.room)
+                if room is not None:
+                    room.players.pop(player.id, None)
+                    room.dirty = True
+            if watching is not None:
+                watching.watchers.discard(writer)
+
+    def _join(self, request, writer):
+        text = request.get("text")
+        if not text and self.content is not None and request.get("grade"):
+            text = self.content.get_sentence_for_grade(str(request["grade"]))
+        if not isinstance(text, str) or not text:
+            raise ValueError("join needs a non-empty 'text' or a valid 'grade'")
+        room = self.room(str(request.get("room", "")))
+        player_id = next(self._ids)
+        name = str(request.get("name") or f"player-{player_id}")[:32]
+        # 分段、年级和难度按文本内容缓存，同一段文本反复开局时不再重新推导
+        analysis = analyze(text)
+        player = Player(player_id, name, room.name,
+                        ScoringSession(text, self._clock), writer)
+        if self.achievements is not None:
+            passage = request.get("passage")
+            player.achievement_row = self.achievements.register(
+                None if passage is None else str(passage))
+        room.players[player_id] = player
+        room.dirty = True
+        self._send(writer, dict({"type": "joined", "id": player_id, "room": room.name,
+                                 "text": text}, **analysis.payload()))
+        return player
+
+    def _feed(self, player, keys):
+        if not isinstance(keys, str):
+            raise ValueError("'keys' must be a string")
+        player.session.feed(keys)
+        self.batches += 1
+        self.keystrokes += len(keys)
+        self._rooms[player.room].dirty = True
+        if player.achievement_row is not None:
+            self._fed[player.id] = player
+
+    @staticmethod
+    def _send(writer, payload):
+        writer.write(encode_frame(OP_TEXT, json.dumps(
+            payload, ensure_ascii=False).encode("utf-8")))
+
+    def stats(self):
+        durations = sorted(self.tick_durations)
+        return {
+            "players": self.player_count,
+            "ticks": self.ticks,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "batches": self.batches,
+            "keystrokes": self.keystrokes,
+            "achievements_unlocked": self.achievements_unlocked,
+            "tick_p50_ms": durations[len(durations) // 2] * 1000 if durations else 0.0,
+            "tick_max_ms": durations[-1] * 1000 if durations else 0.0,
+        }
+
+
+class WebSocketClient:
+    """最小的 asyncio WebSocket 客户端，供压测和测试使用"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host, port, path=WEBSOCKET_PATH):
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        writer.write((f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                      "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\n"
+                      "Sec-WebSocket-Version: 13\r\n\r\n").encode("ascii"))
+        await writer.drain()
+        status = await reader.readline()
+        accept = None
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "sec-websocket-accept":
+                accept = value.strip()
+        if b" 101 " not in status or accept != websocket_accept(key):
+            writer.close()
+            raise WebSocketError(f"handshake failed: {status!r}")
+        return cls(reader, writer)
+
+    async def send(self, payload):
+        self.writer.write(encode_frame(
+            OP_TEXT, json.dumps(payload).encode("utf-8"), mask=True))
+        await self.writer.drain()
+
+    async def recv(self):
+        """接收一条 JSON 消息，连接关闭时返回 None"""
+        message = await read_message(self.reader, self.writer, max_size=1 << 24)
+        return None if message is None else json.loads(message)
+
+    async def close(self):
+        with suppress(ConnectionError):
+            self.writer.write(encode_frame(OP_CLOSE, struct.pack("!H", 1000),
+                                           mask=True))
+            await self.writer.drain()
+        self.writer.close()
+        with suppress(ConnectionError):
+            await self.writer.wait_closed()
+
+
+async def _simulated_typist(host, port, index, room, duration, rng, received):
+    client = await WebSocketClient.connect(host, port)
+    text = make_passage(600)
+    await client.send({"type": "join", "room": room, "name": f"bot-{index}",
+                       "text": text})
+    joined = await client.recv()
+    assert joined["type"] == "joined", joined
+
+    async def reader():
+        while True:
+            message = await client.recv()
+            if message is None:
+                return
+            if message["type"] == "leaderboard":
+                received[index] += 1
+
+    listen = asyncio.get_running_loop().create_task(reader())
+    # 30–80 WPM，每 200 ms 上传一批
+    chars_per_batch = max(1, round(rng.uniform(30, 80) * 5 / 60 * 0.2))
+    position = 0
+    deadline = time.monotonic() + duration
+    await asyncio.sleep(rng.uniform(0, 0.2))
+    while time.monotonic() < deadline and position < len(text):
+        batch = text[position:position + chars_per_batch]
+        if rng.random() < 0.05:
+            batch = "#\b" + batch
+        await client.send({"type": "keys", "keys": batch})
+        position += chars_per_batch
+        await asyncio.sleep(0.2)
+    await client.close()
+    listen.cancel()
+    with suppress(asyncio.CancelledError, ConnectionError,
+                  asyncio.IncompleteReadError):
+        await listen
+
+
+class GameServerThread:
+    """在后台线程运行挂载了 GameServer 的 AsyncStaticServer"""
+
+    def __init__(self, game, host="127.0.0.1", port=0):
+        from async_server import AsyncServerThread
+        self.game = game
+        self._thread = AsyncServerThread(host=host, port=port)
+        self._thread.server.websocket_routes[WEBSOCKET_PATH] = game.handle
+
+    def start(self):
+        return self._thread.start()
+
+    def stop(self):
+        self._thread.stop()
+
+
+def run_benchmark(clients=500, duration=10.0, tick_rate=DEFAULT_TICK_RATE,
+                  rooms=20, seed=7):
+    """在后台线程启动服务器，用 clients 个模拟学生压测 duration 秒"""
+    game = GameServer(tick_rate=tick_rate, achievements=AchievementEngine())
+    server = GameServerThread(game)
+    port = server.start()
+    received = [0] * clients
+
+    async def swarm():
+        rng = random.Random(seed)
+        tasks = [_simulated_typist("127.0.0.1", port, i, f"class-{i % rooms}",
+                                   duration, random.Random(rng.random()), received)
+                 for i in range(clients)]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    cpu_began = time.process_time()
+    began = time.perf_counter()
+    outcomes = asyncio.run(swarm())
+    elapsed = time.perf_counter() - began
+    cpu = time.process_time() - cpu_began
+    server.stop()
+    failed = sum(isinstance(o, BaseException) for o in outcomes)
+
+    result = game.stats()
+    result.update({
+        "clients": clients,
+        "rooms": rooms,
+        "tick_rate": tick_rate,
+        "elapsed": elapsed,
+        "failed": failed,
+        "cpu_percent": cpu / elapsed * 100,
+        "updates_per_client_s": sum(received) / clients / elapsed,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-session typing game server")
+    parser.add_argument("--port", type=int, default=8090,
+                        help="port to listen on (default: %(default)s)")
+    parser.add_argument("--tick-rate", type=float, default=DEFAULT_TICK_RATE,
+                        help="leaderboard pushes per second (default: %(default)s)")
+    parser.add_argument("--bench", type=int, metavar="CLIENTS", nargs="?", const=500,
+                        help="load-test with a simulated swarm of CLIENTS typists")
+    parser.add_argument("--bench-seconds", type=float, default=10.0,
+                        help="benchmark duration (default: %(default)s)")
+    parser.add_argument("--rules", metavar="PATH",
+                        help="achievement rules JSON (default: the page's built-in set)")
+    parser.add_argument("--analysis-cache", metavar="DIR",
+                        help="also keep passage analyses in DIR so they survive restarts")
+    args = parser.parse_args()
+
+    if args.bench:
+        r = run_benchmark(args.bench, args.bench_seconds, args.tick_rate)
+        print(f"📊 {r['clients']} simulated typists in {r['rooms']} rooms, "
+              f"{r['elapsed']:.1f} s, {r['failed']} failed")
+        print(f"   {r['batches'] / r['elapsed']:.0f} key batches/s, "
+              f"{r['keystrokes'] / r['elapsed']:.0f} keys/s")
+        print(f"   {r['ticks']} ticks at {r['tick_rate']:g}/s, "
+              f"{r['frames_sent']} leaderboard frames sent, "
+              f"{r['frames_skipped']} skipped, "
+              f"{r['achievements_unlocked']} achievements unlocked")
+        print(f"   tick p50 {r['tick_p50_ms']:.2f} ms, max {r['tick_max_ms']:.2f} ms")
+        print(f"   {r['updates_per_client_s']:.2f} updates/client/s, "
+              f"process CPU {r['cpu_percent']:.0f}%")
+        return
+
+    import async_server
+
+    if args.analysis_cache:
+        configure(cache_dir=args.analysis_cache)
+    rules = load_rules(args.rules) if args.rules else DEFAULT_RULES
+    game = GameServer(tick_rate=args.tick_rate, achievements=AchievementEngine(rules))
+    print(f"🚀 Game server at ws://localhost:{args.port}{WEBSOCKET_PATH}")
+    try:
+        async_server.run(args.port, websocket_routes={WEBSOCKET_PATH: game.handle})
+    except KeyboardInterrupt:
+        print("\n👋 Game server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化成绩历史库
+==============
+
+GameStatistics 只存在于内存中，reset_game() 后即丢失。本模块把结束的
+会话写入只追加的二进制日志：
+
+- 每条记录定长（RECORD_FORMAT + CRC32），崩溃后截掉不完整的尾部即可恢复；
+- 多个会话并发写入时只向无锁队列投递，由单个写线程成批写盘（组提交）；
+- 日志按大小切分段文件，封存的段定期合并，并写出索引快照，
+  重新打开时只需回放快照之后的段；
+- 内存索引维护"每个用户 / 每段文本的最佳 WPM"，查询为 O(1)。
+"""
+
+import argparse
+import glob
+import os
+import queue
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+# 用户ID, 文本ID, 完成时间, WPM, 准确率, 最大连击, 用时（秒）
+RECORD_FORMAT = "<IIdffIf"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+CRC_FORMAT = "<I"
+ENTRY_SIZE = RECORD_SIZE + struct.calcsize(CRC_FORMAT)
+
+SNAPSHOT_MAGIC = b"TPHIST01"
+SNAPSHOT_HEADER = "<8sQQQ"
+
+SEGMENT_SUFFIX = ".seg"
+SNAPSHOT_NAME = "index.snap"
+# 单个段文件大小上限
+SEGMENT_SIZE = 64 * 1024 * 1024
+# 累计多少个未合并的封存段后触发合并
+COMPACT_AFTER = 4
+# 写线程单次最多合并写入的记录数
+MAX_BATCH = 8192
+
+SessionRecord = namedtuple("SessionRecord", [
+    "user_id", "passage_id", "finished_at", "wpm", "accuracy", "max_combo",
+    "duration",
+])
+
+_record_struct = struct.Struct(RECORD_FORMAT)
+_crc_struct = struct.Struct(CRC_FORMAT)
+
+
+def encode_record(record):
+    """编码一条记录（含 CRC）"""
+    data = _record_struct.pack(*record)
+    return data + _crc_struct.pack(zlib.crc32(data))
+
+
+def _fsync_file(path):
+    """把文件已写入操作系统的内容落盘；文件已被删除时忽略"""
+    try:
+        with open(path, "rb") as f:
+            os.fsync(f.fileno())
+    except FileNotFoundError:
+        pass
+
+
+def read_segment(path):
+    """读取段文件中的有效记录，返回 (记录列表, 有效字节数)
+
+    遇到不完整或校验失败的记录即停止，其后内容视为崩溃残留。
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    records = []
+    valid = 0
+    for offset in range(0, len(data) - ENTRY_SIZE + 1, ENTRY_SIZE):
+        body = data[offset:offset + RECORD_SIZE]
+        (crc,) = _crc_struct.unpack_from(data, offset + RECORD_SIZE)
+        if zlib.crc32(body) != crc:
+            break
+        records.append(SessionRecord._make(_record_struct.unpack(body)))
+        valid = offset + ENTRY_SIZE
+    return records, valid
+
+
+class _Flush:
+    """写线程处理到此处时通知等待方"""
+
+    __slots__ = ("event",)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+_STOP = object()
+
+
+class HistoryStore:
+    """只追加的会话历史库
+
+    append() 可被任意多个线程同时调用，只做一次队列投递；
+    记录由后台写线程落盘并更新索引。flush() 等待此前投递的记录全部写入。
+    写盘失败（磁盘已满、I/O 错误）后不再写入，之后的 append / flush / close
+    抛出该错误。
+    """
+
+    def __init__(self, directory, segment_size=SEGMENT_SIZE,
+                 compact_after=COMPACT_AFTER, sync=False):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.compact_after = compact_after
+        self.sync = sync
+        os.makedirs(directory, exist_ok=True)
+
+        self._best_user = {}
+        self._best_passage = {}
+        self._count = 0
+        self._compacted_seq = 0
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+        self._error = None
+
+        self._recover()
+        self._active_seq = max(self._segment_seqs(), default=0) + 1
+        self._active = open(self._segment_path(self._active_seq), "ab")
+        self._active_size = 0
+
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop,
+                                        name="history-writer", daemon=True)
+        self._writer.start()
+
+    # ---- 文件布局 ----
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{seq:010d}{SEGMENT_SUFFIX}")
+
+    def _segment_seqs(self):
+        seqs = []
+        for path in glob.glob(os.path.join(self.directory, "*" + SEGMENT_SUFFIX)):
+            name = os.path.basename(path)[:-len(SEGMENT_SUFFIX)]
+            if name.isdigit():
+                seqs.append(int(name))
+        return sorted(seqs)
+
+    def _recover(self):
+        """完成中断的合并，加载索引快照并回放其后的段"""
+        for path in glob.glob(os.path.join(self.directory, "*.tmp")):
+            os.remove(path)
+        for path in glob.glob(os.path.join(self.directory, "*.compact")):
+            first, last = map(int, os.path.basename(path).split(".")[0].split("-"))
+            for old in self._segment_seqs():
+                if first <= old <= last:
+                    os.remove(self._segment_path(old))
+            os.replace(path, self._segment_path(last))
+
+        self._load_snapshot()
+        for seq in self._segment_seqs():
+            if seq <= self._compacted_seq:
+                # 已合并的段在写出快照前已 fsync，无需再校验
+                continue
+            path = self._segment_path(seq)
+            records, valid = read_segment(path)
+            if valid != os.path.getsize(path):
+                with open(path, "r+b") as f:
+                    f.truncate(valid)
+            self._index(records)
+            self._count += len(records)
+
+    def _load_snapshot(self):
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        header_size = struct.calcsize(SNAPSHOT_HEADER)
+        magic, seq, count, users = struct.unpack_from(SNAPSHOT_HEADER, data)
+        if magic != SNAPSHOT_MAGIC:
+            return
+        records = [SessionRecord._make(r) for r in
+                   _record_struct.iter_unpack(data[header_size:])]
+        self._best_user = {r.user_id: r for r in records[:users]}
+        self._best_passage = {r.passage_id: r for r in records[users:]}
+        self._compacted_seq = seq
+        self._count = count
+
+    def _write_snapshot(self, seq, count, best_user, best_passage):
+        users = list(best_user.values())
+        passages = list(best_passage.values())
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        with open(path + ".tmp", "wb") as f:
+            f.write(struct.pack(SNAPSHOT_HEADER, SNAPSHOT_MAGIC, seq, count, len(users)))
+            f.write(b"".join(_record_struct.pack(*r) for r in users))
+            f.write(b"".join(_record_struct.pack(*r) for r in passages))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    # ---- 写入 ----
+
+    def _index(self, records):
+        best_user = self._best_user
+        best_passage = self._best_passage
+        for record in records:
+            current = best_user.get(record.user_id)
+            if current is None or record.wpm > current.wpm:
+                best_user[record.user_id] = record
+            current = best_passage.get(record.passage_id)
+            if current is None or record.wpm > current.wpm:
+                best_passage[record.passage_id] = record
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            waiters = []
+            stop = False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, _Flush):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= MAX_BATCH:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch and self._error is None:
+                try:
+                    self._write_batch(batch)
+                except Exception as exc:
+                    # 段尾可能只写了一部分，停止写入；写线程继续运行，
+                    # 之后投递的 flush 标记仍会被唤醒
+                    self._error = exc
+            for waiter in waiters:
+                waiter.event.set()
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        data = b"".join(encode_record(r) for r in batch)
+        self._active.write(data)
+        self._active.flush()
+        if self.sync:
+            os.fsync(self._active.fileno())
+        self._active_size += len(data)
+        self._index(batch)
+        self._count += len(batch)
+        if self._active_size >= self.segment_size:
+            self._rotate()
+
+    def _rotate(self):
+        """封存当前段并开启新段，必要时在后台触发合并"""
+        self._active.close()
+        self._active_seq += 1
+        self._active = open(self._segment_path(self._active_seq), "ab")
+        self._active_size = 0
+        sealed = [s for s in self._segment_seqs()
+                  if self._compacted_seq < s < self._active_seq]
+        if len(sealed) >= self.compact_after and (
+                self._compactor is None or not self._compactor.is_alive()):
+            self._compactor = threading.Thread(target=self.compact,
+                                               name="history-compactor", daemon=True)
+            self._compactor.start()
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def append(self, user_id, passage_id, wpm, accuracy, max_combo=0,
+               duration=0.0, finished_at=None):
+        """记录一次结束的会话（非阻塞）"""
+        self._check_error()
+        if finished_at is None:
+            finished_at = time.time()
+        self._queue.put(SessionRecord(user_id, passage_id, finished_at, wpm,
+                                      accuracy, max_combo, duration))
+
+    def append_many(self, records):
+        """批量记录多条 SessionRecord（非阻塞）"""
+        self._check_error()
+        for record in records:
+            self._queue.put(record)
+
+    def flush(self, timeout=None):
+        """等待此前投递的记录全部写入，返回是否在超时前完成"""
+        self._check_error()
+        marker = _Flush()
+        self._queue.put(marker)
+        done = marker.event.wait(timeout)
+        self._check_error()
+        return done
+
+    def close(self):
+        """写完剩余记录，封存当前段并合并，使下次打开只需加载快照"""
+        if not self._writer.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._writer.join()
+        if self._compactor is not None:
+            self._compactor.join()
+        self._active.close()
+        self._check_error()
+        if self._active_size == 0:
+            os.remove(self._segment_path(self._active_seq))
+        # 写线程已停止，当前段不会再增长，视为已封存
+        self._active_seq += 1
+        self.compact()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 查询 ----
+
+    def __len__(self):
+        return self._count
+
+    def best_for_user(self, user_id):
+        """该用户 WPM 最高的记录，没有记录时返回 None"""
+        return self._best_user.get(user_id)
+
+    def best_for_passage(self, passage_id):
+        """该文本 WPM 最高的记录，没有记录时返回 None"""
+        return self._best_passage.get(passage_id)
+
+    def iter_records(self):
+        """按写入顺序遍历已落盘的全部记录"""
+        for seq in self._segment_seqs():
+            records, _ = read_segment(self._segment_path(seq))
+            yield from records
+
+    # ---- 合并 ----
+
+    def compact(self):
+        """合并上次合并以来封存的段并写出索引快照，返回合并的段数"""
+        with self._compact_lock:
+            active = self._active_seq
+            sealed = [s for s in self._segment_seqs()
+                      if self._compacted_seq < s < active]
+            if not sealed:
+                return 0
+            first, last = sealed[0], sealed[-1]
+            if len(sealed) > 1:
+                tmp = self._segment_path(last) + ".tmp"
+                with open(tmp, "wb") as out:
+                    for seq in sealed:
+                        with open(self._segment_path(seq), "rb") as f:
+                            while True:
+                                chunk = f.read(1 << 20)
+                                if not chunk:
+                                    break
+                                out.write(chunk)
+                    out.flush()
+                    os.fsync(out.fileno())
+                # .compact 文件出现即表示合并结果完整，崩溃后由 _recover 收尾
+                compact_path = os.path.join(self.directory,
+                                            f"{first:010d}-{last:010d}.compact")
+                os.replace(tmp, compact_path)
+                for seq in sealed:
+                    os.remove(self._segment_path(seq))
+                os.replace(compact_path, self._segment_path(last))
+
+            # 先复制索引，再把索引可能引用的全部段落盘：单独封存（未经合并）的段、
+            # 之后封存的段和当前段。记录在写入文件后才进入索引，
+            # 因此复制时索引中的记录都已在这些文件里
+            best_user = dict(self._best_user)
+            best_passage = dict(self._best_passage)
+            for seq in self._segment_seqs():
+                if seq >= last and not (seq == last and len(sealed) > 1):
+                    _fsync_file(self._segment_path(seq))
+            covered = sum(os.path.getsize(self._segment_path(s))
+                          for s in self._segment_seqs() if s <= last) // ENTRY_SIZE
+            # 取最佳值是幂等的：快照里多包含的新记录已落盘，下次回放时不会改变结果
+            self._write_snapshot(last, covered, best_user, best_passage)
+            self._compacted_seq = last
+            return len(sealed)
+
+
+def run_benchmark(directory, records=10_000_000, writers=8, users=100_000,
+                  passages=50_000, queries=100_000):
+    """测量并发写入吞吐、查询延迟与重新打开耗时"""
+    per_writer = records // writers
+    store = HistoryStore(directory)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        now = time.time()
+        batch = []
+        for i in range(per_writer):
+            batch.append(SessionRecord(rng.randrange(users), rng.randrange(passages),
+                                       now + i, rng.uniform(5, 120),
+                                       rng.uniform(50, 100), rng.randrange(200),
+                                       rng.uniform(30, 300)))
+            if len(batch) == 1000:
+                store.append_many(batch)
+                batch = []
+        store.append_many(batch)
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    store.flush()
+    insert_s = time.perf_counter() - began
+
+    rng = random.Random(99)
+    began = time.perf_counter()
+    for _ in range(queries // 2):
+        store.best_for_user(rng.randrange(users))
+        store.best_for_passage(rng.randrange(passages))
+    query_us = (time.perf_counter() - began) / queries * 1e6
+
+    total = len(store)
+    store.close()
+
+    began = time.perf_counter()
+    reopened = HistoryStore(directory)
+    reopen_s = time.perf_counter() - began
+    reopened.close()
+    return {"records": total, "inserts_per_s": total / insert_s,
+            "query_us": query_us, "reopen_s": reopen_s}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session history store benchmark")
+    parser.add_argument("--records", type=int, default=10_000_000,
+                        help="records to insert (default: %(default)s)")
+    parser.add_argument("--writers", type=int, default=8,
+                        help="concurrent writer threads (default: %(default)s)")
+    parser.add_argument("--dir", default=None,
+                        help="store directory (default: a temporary directory)")
+    args = parser.parse_args()
+
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        result = run_benchmark(args.dir or tmp, args.records, args.writers)
+    print(f"📊 {result['records']} records from {args.writers} writers")
+    print(f"   inserts:  {result['inserts_per_s']:,.0f} records/s")
+    print(f"   queries:  {result['query_us']:.2f} µs (best WPM per user / passage)")
+    print(f"   reopen:   {result['reopen_s'] * 1000:.1f} ms from the index snapshot")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点路径计时
+==========
+
+可选的延迟直方图：enable() 时给按键处理、开始新一关（新的计分会话）、
+取文本、排行榜推送这几个热点方法套上计时包装，disable() 时还原
+原始方法，因此关闭时没有任何额外开销。
+
+直方图可以导出为 Prometheus 文本格式（play.py --instrument 时由
+/metrics 提供），也可以在退出时打印摘要。
+"""
+
+import bisect
+import functools
+import importlib
+import sys
+import threading
+import time
+
+# 直方图桶上界（秒），覆盖 1 µs 到 10 s
+DEFAULT_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+METRICS_PATH = "/metrics"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (模块, 类, 方法, 指标名, 标签, 说明)
+HOT_PATHS = (
+    ("typing_scoring", "ScoringSession", "feed", "typing_input_seconds",
+     "", "Time to score one batch of keystrokes"),
+    ("typing_scoring", "ScoringService", "create", "typing_level_start_seconds",
+     "", "Time to start a new passage (level) session"),
+    ("content_corpus", "CorpusContentManager", "get_sentence_for_grade",
+     "typing_content_fetch_seconds", 'source="corpus"',
+     "Time to fetch a passage for a grade"),
+    ("adaptive_selection", "AdaptiveContentManager", "get_sentence_for_grade",
+     "typing_content_fetch_seconds", 'source="adaptive"',
+     "Time to fetch a passage for a grade"),
+    ("game_server", "GameServer", "tick", "typing_leaderboard_tick_seconds",
+     "", "Time to build and push all leaderboards for one tick"),
+)
+
+
+class Histogram:
+    """固定桶的延迟直方图，线程安全"""
+
+    __slots__ = ("bounds", "counts", "count", "sum", "_lock")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        # 最后一个桶对应 +Inf
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q):
+        """由直方图估计的分位数（取桶上界），没有数据时为 None"""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return None
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if seen >= q * total:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+    def snapshot(self):
+        """返回 (累计桶计数, 总数, 总和)"""
+        with self._lock:
+            counts = list(self.counts)
+            total, value_sum = self.count, self.sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, value_sum
+
+
+class Registry:
+    """按 (指标名, 标签) 管理直方图"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, labels="", help_text=""):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+                if help_text:
+                    self._help.setdefault(name, help_text)
+        return histogram
+
+    def observe(self, name, seconds, labels=""):
+        self.histogram(name, labels).observe(seconds)
+
+    def items(self):
+        """按名称排序的 [((指标名, 标签), 直方图)]"""
+        with self._lock:
+            return sorted(self._histograms.items())
+
+    def render_prometheus(self):
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        described = set()
+        for (name, labels), histogram in self.items():
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            cumulative, total, value_sum = histogram.snapshot()
+            prefix = labels + "," if labels else ""
+            for bound, count in zip(histogram.bounds, cumulative):
+                lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {count}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {cumulative[-1]}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {value_sum!r}")
+            lines.append(f"{name}_count{suffix} {total}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self):
+        """每个直方图一行：次数、平均值、p50、p99"""
+        lines = []
+        for (name, labels), histogram in self.items():
+            if not histogram.count:
+                continue
+            label = f"{name}{{{labels}}}" if labels else name
+            mean = histogram.sum / histogram.count
+            lines.append(f"   {label:<52} n={histogram.count:<8} "
+                         f"mean {mean * 1e6:9.1f} µs  "
+                         f"p50 ≤{histogram.quantile(0.5) * 1e6:9.1f} µs  "
+                         f"p99 ≤{histogram.quantile(0.99) * 1e6:9.1f} µs")
+        return lines
+
+    def dump(self, stream=None):
+        """打印摘要（退出时调用）"""
+        stream = stream or sys.stdout
+        lines = self.summary_lines()
+        if lines:
+            print("⏱️  Hot-path latency:", file=stream)
+            for line in lines:
+                print(line, file=stream)
+
+
+REGISTRY = Registry()
+# (类, 方法名) -> 原始方法，enable() 时记录，disable() 时还原
+_originals = {}
+
+
+def timed(histogram, func):
+    """返回记录 func 耗时的包装函数"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        began = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - began)
+    return wrapper
+
+
+def enable(registry=REGISTRY, hot_paths=HOT_PATHS):
+    """给热点方法套上计时包装，返回 registry；重复调用无副作用"""
+    for module_name, class_name, method, name, labels, help_text in hot_paths:
+        owner = getattr(importlib.import_module(module_name), class_name)
+        if (owner, method) in _originals:
+            continue
+        original = owner.__dict__[method]
+        _originals[(owner, method)] = original
+        setattr(owner, method, timed(registry.histogram(name, labels, help_text),
+                                     original))
+    return registry
+
+
+def disable():
+    """还原所有原始方法"""
+    while _originals:
+        (owner, method), original = _originals.popitem()
+        setattr(owner, method, original)
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def run_benchmark(batches=200_000, batch="abcd"):
+    """测量 ScoringSession.feed 在关闭 / 开启计时时的单次耗时（纳秒）"""
+    from typing_scoring import ScoringSession, make_passage
+
+    def measure():
+        session = ScoringSession(make_passage(len(batch) * batches + 1))
+        feed = session.feed
+        began = time.perf_counter()
+        for _ in range(batches):
+            feed(batch)
+        return (time.perf_counter() - began) / batches * 1e9
+
+    was_enabled = is_enabled()
+    disable()
+    baseline = measure()
+    enable(Registry())
+    instrumented = measure()
+    disable()
+    if was_enabled:
+        enable()
+    return {"disabled_ns": baseline, "enabled_ns": instrumented,
+            "overhead_ns": instrumented - baseline}
+
+
+def main():
+    result = run_benchmark()
+    print("📊 ScoringSession.feed per call")
+    print(f"   instrumentation off {result['disabled_ns']:8.0f} ns")
+    print(f"   instrumentation on  {result['enabled_ns']:8.0f} ns "
+          f"(+{result['overhead_ns']:.0f} ns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+键盘布局查找表
+============
+
+VirtualKeyboard 和渲染端的 highlightedKeys 在输入时才去推算某个字符
+在哪个键、用哪根手指。本模块为每种布局（QWERTY、Dvorak、Colemak）
+一次性算出按码位索引的平面数组：
+
+- key / finger / shift：字符所在的物理键、手指、是否需要 Shift；
+- cost：手指离开基准键位的距离加上 Shift 代价。
+
+高亮因此只是一次数组下标访问。表按布局定义的哈希缓存在磁盘上，
+定义不变时直接读取。passage_costs() 把一批文本拼成一个码位数组，
+用查表加相邻同指惩罚一次算出每段文本的平均指法代价（安装了 NumPy 时向量化），
+供难度分级按指法代价排序。
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+LAYOUT_CACHE_VERSION = 1
+DEFAULT_CACHE = ".layout_cache.json"
+# 表覆盖的码位范围（ASCII）；超出范围的字符视为键盘上没有
+TABLE_SIZE = 128
+NO_KEY = 255
+# 需要按 Shift 的附加代价（另一只手的小指）
+SHIFT_COST = 1.0
+# 键盘上打不出的字符的代价
+UNKNOWN_COST = 3.0
+# 同一根手指连续按两个不同键时，按两键距离再乘以该系数计入代价
+SAME_FINGER_FACTOR = 1.0
+
+# 手指编号：左手小指 0 … 左手食指 3，拇指 4 / 5，右手食指 6 … 右手小指 9
+FINGERS = ("left pinky", "left ring", "left middle", "left index", "left thumb",
+           "right thumb", "right index", "right middle", "right ring", "right pinky")
+# 各手指的基准键（按 QWERTY 物理位置的 code）
+HOME_KEYS = {0: "KeyA", 1: "KeyS", 2: "KeyD", 3: "KeyF", 4: "Space", 5: "Space",
+             6: "KeyJ", 7: "KeyK", 8: "KeyL", 9: "Semicolon"}
+
+# 物理键盘（ANSI）：每行 (y, 首键 x, KeyboardEvent.code 列表, 每列手指)
+_PHYSICAL_ROWS = (
+    (0, 0.0, ("Backquote", "Digit1", "Digit2", "Digit3", "Digit4", "Digit5", "Digit6",
+              "Digit7", "Digit8", "Digit9", "Digit0", "Minus", "Equal"),
+     (0, 0, 1, 2, 3, 3, 3, 6, 7, 8, 9, 9, 9)),
+    (1, 1.5, ("KeyQ", "KeyW", "KeyE", "KeyR", "KeyT", "KeyY", "KeyU", "KeyI", "KeyO",
+              "KeyP", "BracketLeft", "BracketRight", "Backslash"),
+     (0, 1, 2, 3, 3, 6, 6, 7, 8, 9, 9, 9, 9)),
+    (2, 1.75, ("KeyA", "KeyS", "KeyD", "KeyF", "KeyG", "KeyH", "KeyJ", "KeyK", "KeyL",
+               "Semicolon", "Quote"),
+     (0, 1, 2, 3, 3, 6, 6, 7, 8, 9, 9)),
+    (3, 2.25, ("KeyZ", "KeyX", "KeyC", "KeyV", "KeyB", "KeyN", "KeyM", "Comma",
+               "Period", "Slash"),
+     (0, 1, 2, 3, 3, 6, 6, 7, 8, 9)),
+)
+# 布局无关的键：(code, 字符, x, y, 手指)
+_FIXED_KEYS = (
+    ("Tab", "\t", 0.5, 1, 0),
+    ("Enter", "\n", 12.75, 2, 9),
+    ("Space", " ", 5.75, 4, 5),
+)
+# Shift 键位置；按下某字符的 Shift 由另一只手的小指完成
+_SHIFT_KEYS = (("ShiftLeft", 0.75, 3, 0), ("ShiftRight", 13.0, 3, 9))
+
+# 各布局每行的 (不按 Shift, 按 Shift) 字符，顺序与 _PHYSICAL_ROWS 对应
+LAYOUTS = {
+    "qwerty": (
+        ("`1234567890-=", "~!@#$%^&*()_+"),
+        ("qwertyuiop[]\\", "QWERTYUIOP{}|"),
+        ("asdfghjkl;'", 'ASDFGHJKL:"'),
+        ("zxcvbnm,./", "ZXCVBNM<>?"),
+    ),
+    "dvorak": (
+        ("`1234567890[]", "~!@#$%^&*(){}"),
+        ("',.pyfgcrl/=\\", '"<>PYFGCRL?+|'),
+        ("aoeuidhtns-", "AOEUIDHTNS_"),
+        (";qjkxbmwvz", ":QJKXBMWVZ"),
+    ),
+    "colemak": (
+        ("`1234567890-=", "~!@#$%^&*()_+"),
+        ("qwfpgjluy;[]\\", "QWFPGJLUY:{}|"),
+        ("arstdhneio'", 'ARSTDHNEIO"'),
+        ("zxcvbkm,./", "ZXCVBKM<>?"),
+    ),
+}
+
+Key = namedtuple("Key", "code label x y finger")
+Highlight = namedtuple("Highlight", "key finger shift")
+
+
+def _definition_digest(name):
+    """build_tables() 全部输入的摘要，任何一项改动都会让缓存失效"""
+    source = json.dumps([LAYOUT_CACHE_VERSION, name, LAYOUTS[name], _PHYSICAL_ROWS,
+                         _FIXED_KEYS, _SHIFT_KEYS, sorted(HOME_KEYS.items()),
+                         TABLE_SIZE, NO_KEY, SHIFT_COST, UNKNOWN_COST])
+    return hashlib.blake2b(source.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def build_tables(name):
+    """由布局定义计算查找表，返回可直接写入 JSON 的字典"""
+    rows = LAYOUTS[name]
+    keys = []
+    key_of = [NO_KEY] * TABLE_SIZE
+    finger_of = [NO_KEY] * TABLE_SIZE
+    shift_of = [0] * TABLE_SIZE
+    cost_of = [UNKNOWN_COST] * TABLE_SIZE
+
+    def add_key(code, label, x, y, finger):
+        keys.append([code, label, x, y, finger])
+        return len(keys) - 1
+
+    for (y, x0, codes, fingers), (plain, shifted) in zip(_PHYSICAL_ROWS, rows):
+        for column, (code, finger) in enumerate(zip(codes, fingers)):
+            index = add_key(code, plain[column], x0 + column, y, finger)
+            for char, shift in ((plain[column], 0), (shifted[column], 1)):
+                key_of[ord(char)] = index
+                finger_of[ord(char)] = finger
+                shift_of[ord(char)] = shift
+    for code, char, x, y, finger in _FIXED_KEYS:
+        index = add_key(code, char, x, y, finger)
+        key_of[ord(char)] = index
+        finger_of[ord(char)] = finger
+    for code, x, y, finger in _SHIFT_KEYS:
+        add_key(code, "Shift", x, y, finger)
+
+    position = {key[0]: (key[2], key[3]) for key in keys}
+    home = {finger: position[code] for finger, code in HOME_KEYS.items()}
+    for point in range(TABLE_SIZE):
+        index = key_of[point]
+        if index == NO_KEY:
+            continue
+        _, _, x, y, finger = keys[index]
+        hx, hy = home[finger]
+        cost_of[point] = round(math.hypot(x - hx, y - hy)
+                               + SHIFT_COST * shift_of[point], 4)
+
+    return {"source": _definition_digest(name), "keys": keys, "key": key_of,
+            "finger": finger_of, "shift": shift_of, "cost": cost_of}
+
+
+class KeyboardLayout:
+    """一种布局的查找表
+
+    key / finger / shift / cost 都是长度为 TABLE_SIZE 的平面数组，
+    下标是字符码位；key_x / key_y 按物理键编号给出坐标。
+    """
+
+    def __init__(self, name, tables):
+        self.name = name
+        self.keys = [Key(*key) for key in tables["keys"]]
+        self.key = array("B", tables["key"])
+        self.finger = array("B", tables["finger"])
+        self.shift = array("B", tables["shift"])
+        self.cost = array("d", tables["cost"])
+        self.key_x = array("d", (key.x for key in self.keys))
+        self.key_y = array("d", (key.y for key in self.keys))
+        self._shift_keys = {key.finger: key for key in self.keys if key.label == "Shift"}
+        if np is not None:
+            self._np_key = np.array(self.key, dtype=np.int32)
+            self._np_finger = np.array(self.finger, dtype=np.int16)
+            self._np_cost = np.array(self.cost)
+            self._np_key_x = np.append(np.array(self.key_x), np.nan)
+            self._np_key_y = np.append(np.array(self.key_y), np.nan)
+
+    def highlight(self, char):
+        """字符对应的 Highlight(键, 手指名, 是否 Shift)；键盘上没有时返回 None"""
+        point = ord(char)
+        if point >= TABLE_SIZE or self.key[point] == NO_KEY:
+            return None
+        return Highlight(self.keys[self.key[point]], FINGERS[self.finger[point]],
+                         bool(self.shift[point]))
+
+    def highlighted_codes(self, char):
+        """渲染端 highlightedKeys 需要的键 code 列表（含另一只手的 Shift）"""
+        point = ord(char)
+        if point >= TABLE_SIZE or self.key[point] == NO_KEY:
+            return []
+        key = self.keys[self.key[point]]
+        if not self.shift[point]:
+            return [key.code]
+        # 左手键用右 Shift，右手键用左 Shift
+        shift_key = self._shift_keys[9 if key.finger < 5 else 0]
+        return [shift_key.code, key.code]
+
+
+def load_layout(name, cache_path=DEFAULT_CACHE):
+    """读取布局查找表：缓存中的定义哈希一致时直接使用，否则重新计算并写回
+
+    cache_path 为 None 时不读写缓存。
+    """
+    if name not in LAYOUTS:
+        raise ValueError(f"unknown layout {name!r}; choose from {', '.join(LAYOUTS)}")
+    cached = {}
+    if cache_path is not None:
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == LAYOUT_CACHE_VERSION:
+                cached = data.get("layouts", {})
+        except (OSError, ValueError):
+            cached = {}
+
+    tables = cached.get(name)
+    if tables is None or tables.get("source") != _definition_digest(name):
+        tables = build_tables(name)
+        if cache_path is not None:
+            cached[name] = tables
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": LAYOUT_CACHE_VERSION, "layouts": cached}, f,
+                          separators=(",", ":"))
+            os.replace(tmp_path, cache_path)
+    return KeyboardLayout(name, tables)
+
+
+_layouts = {}
+
+
+def get_layout(name="qwerty", cache_path=DEFAULT_CACHE):
+    """进程内共享的布局实例"""
+    layout = _layouts.get(name)
+    if layout is None:
+        layout = _layouts[name] = load_layout(name, cache_path)
+    return layout
+
+
+def _codes(passages):
+    """把文本拼成一个码位数组，返回 (码位, 每段起点)"""
+    data = "".join(passages).encode("utf-32-le")
+    codes = np.frombuffer(data, dtype=np.uint32)
+    lengths = np.fromiter((len(p) for p in passages), dtype=np.int64, count=len(passages))
+    starts = np.zeros(len(passages), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    return codes, starts, lengths
+
+
+def passage_costs(passages, layout):
+    """每段文本的平均指法代价（每字符）
+
+    代价 = 各字符离基准键位的距离 + Shift 代价，
+    再加上同一手指连续按不同键时两键之间的距离。空文本的代价为 0。
+    """
+    passages = list(passages)
+    if np is None:
+        return [_passage_cost_python(p, layout) for p in passages]
+    if not passages:
+        return np.zeros(0)
+    codes, starts, lengths = _codes(passages)
+    points = np.where(codes < TABLE_SIZE, codes, 0).astype(np.intp)
+    per_char = layout._np_cost[points]
+
+    keys = layout._np_key[points]
+    fingers = layout._np_finger[points]
+    keys = np.where(keys == NO_KEY, len(layout.keys), keys)
+    x = layout._np_key_x[keys]
+    y = layout._np_key_y[keys]
+    same = ((fingers[1:] == fingers[:-1]) & (fingers[1:] != NO_KEY)
+            & (keys[1:] != keys[:-1]))
+    # 段与段之间的相邻字符不算
+    if len(starts) > 1:
+        boundaries = starts[1:][starts[1:] < len(codes)] - 1
+        same[boundaries[boundaries >= 0]] = False
+    travel = np.where(same, np.hypot(x[1:] - x[:-1], y[1:] - y[:-1]), 0.0)
+    per_char[1:] += SAME_FINGER_FACTOR * travel
+
+    nonempty = lengths > 0
+    totals = np.zeros(len(passages))
+    if nonempty.any():
+        totals[nonempty] = np.add.reduceat(per_char, starts[nonempty])
+    return np.divide(totals, lengths, out=np.zeros(len(passages)), where=nonempty)
+
+
+def _passage_cost_python(text, layout):
+    if not text:
+        return 0.0
+    cost = layout.cost
+    key_of = layout.key
+    finger_of = layout.finger
+    total = 0.0
+    previous = None
+    for char in text:
+        point = ord(char)
+        if point >= TABLE_SIZE:
+            point = 0
+        total += cost[point]
+        key = key_of[point]
+        finger = finger_of[point]
+        if (previous is not None and finger != NO_KEY and finger == previous[1]
+                and key != previous[0]):
+            total += SAME_FINGER_FACTOR * math.hypot(
+                layout.key_x[key] - layout.key_x[previous[0]],
+                layout.key_y[key] - layout.key_y[previous[0]])
+        previous = (key, finger)
+    return total / len(text)
+
+
+def rank_passages(passages, layout):
+    """按平均指法代价从低到高返回文本下标"""
+    costs = passage_costs(passages, layout)
+    if np is None:
+        return sorted(range(len(costs)), key=costs.__getitem__)
+    return np.argsort(costs, kind="stable").tolist()
+
+
+def locate_by_scan(name, char):
+    """输入时逐行查找字符位置的做法，用作基准对照"""
+    for (y, _, codes, fingers), (plain, shifted) in zip(_PHYSICAL_ROWS, LAYOUTS[name]):
+        for row in (plain, shifted):
+            column = row.find(char)
+            if column >= 0:
+                return codes[column], FINGERS[fingers[column]], row is shifted
+    for code, key_char, _, _, finger in _FIXED_KEYS:
+        if key_char == char:
+            return code, FINGERS[finger], False
+    return None
+
+
+def _make_passages(count, rng):
+    from typing_scoring import make_passage
+
+    corpus = make_passage(200_000)
+    passages = []
+    for _ in range(count):
+        start = rng.randrange(len(corpus) - 300)
+        passages.append(corpus[start:start + rng.randint(40, 280)])
+    return passages
+
+
+def run_benchmark(passages=100_000, lookups=200_000, seed=3):
+    """比较逐行查找与查表的高亮耗时，以及三种布局下批量计算指法代价的耗时"""
+    import tempfile
+
+    rng = random.Random(seed)
+    texts = _make_passages(passages, rng)
+    sample = "".join(texts)[:lookups]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, DEFAULT_CACHE)
+        began = time.perf_counter()
+        for name in LAYOUTS:
+            load_layout(name, cache_path)
+        build_s = time.perf_counter() - began
+        began = time.perf_counter()
+        layouts = [load_layout(name, cache_path) for name in LAYOUTS]
+        cached_s = time.perf_counter() - began
+
+    qwerty = layouts[0]
+    began = time.perf_counter()
+    for char in sample:
+        locate_by_scan("qwerty", char)
+    scan_s = time.perf_counter() - began
+    began = time.perf_counter()
+    for char in sample:
+        qwerty.highlight(char)
+    table_s = time.perf_counter() - began
+
+    ranking = {}
+    for layout in layouts:
+        began = time.perf_counter()
+        costs = passage_costs(texts, layout)
+        order = rank_passages(texts, layout) if np is None else np.argsort(costs)
+        ranking[layout.name] = {"seconds": time.perf_counter() - began,
+                                "mean": float(sum(costs) / len(costs)),
+                                "easiest": texts[order[0]][:40]}
+
+    return {
+        "passages": passages,
+        "chars": sum(map(len, texts)),
+        "build_ms": build_s * 1000,
+        "cached_ms": cached_s * 1000,
+        "scan_ns": scan_s / len(sample) * 1e9,
+        "table_ns": table_s / len(sample) * 1e9,
+        "ranking": ranking,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyboard layout lookup tables")
+    parser.add_argument("--passages", type=int, default=100_000,
+                        help="passages to rank in the benchmark (default: %(default)s)")
+    parser.add_argument("--show", metavar="TEXT",
+                        help="print the keys and fingers for TEXT instead")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="qwerty",
+                        help="layout for --show (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.show is not None:
+        layout = get_layout(args.layout)
+        for char in args.show:
+            print(f"   {char!r:6} {' + '.join(layout.highlighted_codes(char)) or '-':24} "
+                  f"{(layout.highlight(char) or Highlight(None, '-', False)).finger}")
+        print(f"   cost {passage_costs([args.show], layout)[0]:.2f} per char")
+        return
+
+    r = run_benchmark(args.passages)
+    print(f"📊 {r['passages']} passages, {r['chars']} chars")
+    print(f"   build 3 layouts {r['build_ms']:.1f} ms, load from cache {r['cached_ms']:.1f} ms")
+    print(f"   highlight: row scan {r['scan_ns']:.0f} ns/char, "
+          f"table lookup {r['table_ns']:.0f} ns/char")
+    for name, info in r["ranking"].items():
+        print(f"   {name:<8} cost + rank {info['seconds'] * 1000:7.1f} ms, "
+              f"mean {info['mean']:.3f}/char, easiest {info['easiest']!r}")
+
+
+if __name__ == "__main__":
+    main()
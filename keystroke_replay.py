@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按键记录批量回放计分
+==================
+
+离线批量评分录制的打字会话。每条记录是紧凑的按键数组
+（字符 + 时间戳），计分语义与 typing_scoring.ScoringSession 一致。
+安装了 NumPy 时把整批记录拼接成一维数组做向量化计算，
+否则逐条回退到纯 Python；multiprocessing 模式把批次分给多个进程。
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from collections import namedtuple
+
+from typing_scoring import BACKSPACE, CHARS_PER_WORD, ScoringSession
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKSPACE_CODE = ord(BACKSPACE)
+
+# 一条录制的会话：目标文本、按键字符串（"\b" 为退格）、每次按键的时间戳（秒）
+KeystrokeLog = namedtuple("KeystrokeLog", ["text", "keys", "times"])
+
+
+def make_result(position, correct, incorrect, max_combo, elapsed, key_errors):
+    """组装单条会话的评分结果
+
+    key_errors 为 {期望字符: (错误次数, 尝试次数)}。
+    """
+    total = correct + incorrect
+    minutes = elapsed / 60
+    return {
+        "wpm": position / CHARS_PER_WORD / minutes if minutes > 0 else 0.0,
+        "accuracy": correct / total * 100 if total else 100.0,
+        "correct_chars": correct,
+        "incorrect_chars": incorrect,
+        "max_combo": max_combo,
+        "key_errors": key_errors,
+    }
+
+
+def key_error_rates(result):
+    """把 key_errors 转为 {字符: 错误率}"""
+    return {key: errors / attempts
+            for key, (errors, attempts) in result["key_errors"].items()}
+
+
+def replay_python(log):
+    """用 ScoringSession 逐键回放一条记录"""
+    session = ScoringSession(log.text)
+    attempts = {}
+    errors = {}
+    text = log.text
+    for key, at in zip(log.keys, log.times):
+        if key != BACKSPACE and not session.is_complete:
+            expected = text[session.position]
+            attempts[expected] = attempts.get(expected, 0) + 1
+            if key != expected:
+                errors[expected] = errors.get(expected, 0) + 1
+        session.type_char(key, now=at)
+    elapsed = (log.times[-1] - log.times[0]) if len(log.times) else 0.0
+    key_errors = {k: (errors.get(k, 0), n) for k, n in attempts.items()}
+    return make_result(session.position, session.correct_chars,
+                       session.incorrect_chars, session.max_combo, elapsed,
+                       key_errors)
+
+
+def replay_numpy(logs):
+    """把整批记录拼接后向量化回放
+
+    位置由 +1/-1 步长的分段累加得到。开头退格（位置已为 0）或文本
+    完成后继续输入的记录会让位置被截断，这类记录交给 replay_python。
+    """
+    results = [None] * len(logs)
+    usable = []
+    for i, log in enumerate(logs):
+        if len(log.keys) and len(log.keys) == len(log.times):
+            usable.append(i)
+        else:
+            results[i] = replay_python(log)
+    if not usable:
+        return results
+
+    keys = [logs[i].keys for i in usable]
+    texts = [logs[i].text for i in usable]
+    key_lens = np.fromiter((len(k) for k in keys), dtype=np.int64, count=len(keys))
+    text_lens = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    key_starts = np.concatenate(([0], np.cumsum(key_lens)[:-1]))
+    text_starts = np.concatenate(([0], np.cumsum(text_lens)[:-1]))
+
+    codes = np.frombuffer("".join(keys).encode("utf-32-le"), dtype=np.uint32)
+    text_codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+    times = np.concatenate([np.asarray(logs[i].times, dtype=np.float64)
+                            for i in usable])
+    segment = np.repeat(np.arange(len(usable)), key_lens)
+
+    is_char = codes != BACKSPACE_CODE
+    step = np.where(is_char, 1, -1)
+    cumulative = np.cumsum(step)
+    # 每段开始前的累计值，用于把全局累加变成分段累加
+    base = np.concatenate(([0], cumulative[key_starts[1:] - 1]))
+    position = cumulative - base[segment]
+
+    low = np.minimum.reduceat(position, key_starts)
+    high = np.maximum.reduceat(position, key_starts)
+    clipped = (low < 0) | (high > text_lens)
+
+    # 字符按键对应的期望字符
+    char_rows = np.flatnonzero(is_char)
+    char_segment = segment[char_rows]
+    # 被截断的记录下标可能越界，先夹到文本范围内（其结果随后会被丢弃）
+    offset = np.clip(position[char_rows] - 1, 0, text_lens[char_segment] - 1)
+    expected = text_codes[text_starts[char_segment] + offset]
+    correct = codes[char_rows] == expected
+
+    n_segments = len(usable)
+    correct_count = np.bincount(char_segment, weights=correct, minlength=n_segments)
+    char_count = np.bincount(char_segment, minlength=n_segments)
+    final_position = position[key_starts + key_lens - 1]
+    elapsed = times[key_starts + key_lens - 1] - times[key_starts]
+
+    # 连击：到当前按键为止连续正确的次数；错误或新会话开头处重新计数
+    idx = np.arange(len(char_rows))
+    first_in_segment = np.ones(len(char_rows), dtype=bool)
+    first_in_segment[1:] = char_segment[1:] != char_segment[:-1]
+    marker = np.where(~correct, idx, np.where(first_in_segment, idx - 1, -1))
+    combo = np.where(correct, idx - np.maximum.accumulate(marker), 0)
+    max_combo = np.zeros(n_segments, dtype=np.int64)
+    if len(char_rows):
+        starts = np.flatnonzero(first_in_segment)
+        max_combo[char_segment[starts]] = np.maximum.reduceat(combo, starts)
+
+    # 按 (会话, 期望字符) 统计尝试与错误次数
+    pair = char_segment.astype(np.int64) * 0x110000 + expected
+    pairs, inverse = np.unique(pair, return_inverse=True)
+    pair_attempts = np.bincount(inverse)
+    pair_errors = np.bincount(inverse, weights=~correct).astype(np.int64)
+    key_errors = [{} for _ in range(n_segments)]
+    for p, errors, attempts in zip(pairs.tolist(), pair_errors.tolist(),
+                                   pair_attempts.tolist()):
+        key_errors[p // 0x110000][chr(p % 0x110000)] = (errors, attempts)
+
+    for j, i in enumerate(usable):
+        if clipped[j]:
+            results[i] = replay_python(logs[i])
+            continue
+        correct_j = int(correct_count[j])
+        results[i] = make_result(int(final_position[j]), correct_j,
+                                 int(char_count[j]) - correct_j, int(max_combo[j]),
+                                 float(elapsed[j]), key_errors[j])
+    return results
+
+
+def replay_chunk(logs, use_numpy=True):
+    """回放一批记录（单进程）"""
+    if use_numpy and np is not None:
+        return replay_numpy(logs)
+    return [replay_python(log) for log in logs]
+
+
+def _replay_chunk_worker(args):
+    logs, use_numpy = args
+    return replay_chunk(logs, use_numpy)
+
+
+def replay_batch(logs, processes=None, use_numpy=True, chunk_size=2000):
+    """批量回放记录，返回与输入顺序一致的结果列表
+
+    processes 为空或 1 时在当前进程计算；否则按 chunk_size 切块，
+    由 multiprocessing 进程池并行处理。
+    """
+    logs = list(logs)
+    if not processes or processes == 1 or len(logs) <= chunk_size:
+        return replay_chunk(logs, use_numpy)
+    chunks = [(logs[i:i + chunk_size], use_numpy)
+              for i in range(0, len(logs), chunk_size)]
+    results = []
+    with multiprocessing.Pool(processes) as pool:
+        for part in pool.imap(_replay_chunk_worker, chunks):
+            results.extend(part)
+    return results
+
+
+def synthesize_logs(count, length=300, error_rate=0.05, seed=42):
+    """生成模拟录制记录：偶尔打错，随后退格改正"""
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz     "
+    logs = []
+    for _ in range(count):
+        text = "".join(rng.choice(alphabet) for _ in range(length)).strip() or "a"
+        keys = []
+        times = []
+        now = 0.0
+        for char in text:
+            if rng.random() < error_rate:
+                keys.extend(("#", BACKSPACE))
+                now += 0.2
+                times.extend((now, now + 0.15))
+                now += 0.15
+            keys.append(char)
+            now += rng.uniform(0.08, 0.3)
+            times.append(now)
+        logs.append(KeystrokeLog(text, "".join(keys), times))
+    return logs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch keystroke replay benchmark")
+    parser.add_argument("--sessions", type=int, default=2000,
+                        help="number of synthetic sessions (default: %(default)s)")
+    parser.add_argument("--length", type=int, default=300,
+                        help="passage length per session (default: %(default)s)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="worker processes; 0 uses every core (default: %(default)s)")
+    parser.add_argument("--python", action="store_true",
+                        help="force the pure-Python backend")
+    args = parser.parse_args()
+
+    logs = synthesize_logs(args.sessions, args.length)
+    keystrokes = sum(len(log.keys) for log in logs)
+    processes = args.processes or os.cpu_count()
+    use_numpy = not args.python
+    backend = "numpy" if use_numpy and np is not None else "python"
+
+    began = time.perf_counter()
+    results = replay_batch(logs, processes=processes, use_numpy=use_numpy)
+    elapsed = time.perf_counter() - began
+    mean_wpm = sum(r["wpm"] for r in results) / len(results)
+
+    print(f"📊 Replayed {len(results)} sessions / {keystrokes} keystrokes "
+          f"({backend}, {processes} process{'es' if processes > 1 else ''})")
+    print(f"   {elapsed:.3f} s, {keystrokes / elapsed / 1e6:.2f} M keystrokes/s, "
+          f"mean {mean_wpm:.1f} WPM")
+
+
+if __name__ == "__main__":
+    main()
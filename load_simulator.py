@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无界面负载模拟器
+==============
+
+用成百上千个模拟学生同时打字，观察整套服务的表现。每个学生按自己的
+WPM 和错误率（从可配置的分布中抽取）分批产生按键，错误按键随后用退格改正；
+所有学生在一个 asyncio 事件循环中运行，逐个错开启动。
+
+压测目标（--target）：
+
+- engine：直接调用 ScoringService 计分，不经过网络；
+- ws：game_server.GameServer 的 WebSocket 接口（每批按键后查询一次 state）；
+- http：play.py 的 /api/score 计分接口，经由持久连接池。
+
+ws / http 默认在本进程的后台线程中启动服务器，CPU 和 RSS 包含服务器本身；
+--url 指向已经运行的服务器时只统计模拟器自己。
+
+结果按采样间隔记录吞吐、尾延迟、CPU 和 RSS 的时间线，连同配置写入 JSON，
+相同的 --seed 产生相同的学生和按键序列。
+
+    python3 load_simulator.py --students 1000 --target engine
+    python3 load_simulator.py --students 200 --target http --output load_report.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from collections import namedtuple
+from contextlib import suppress
+
+from play import percentile
+from typing_scoring import BACKSPACE, ScoringService, make_passage
+
+TARGETS = ("engine", "ws", "http")
+DEFAULT_STUDENTS = 1000
+DEFAULT_DURATION = 30.0
+# 每个学生上传按键的间隔（秒）
+DEFAULT_INTERVAL = 0.2
+# WPM 正态分布，截断在 [MIN_WPM, MAX_WPM]
+DEFAULT_WPM, DEFAULT_WPM_SD = 40.0, 12.0
+MIN_WPM, MAX_WPM = 10.0, 150.0
+# 错误率服从均值为 DEFAULT_ERROR_RATE 的 Beta 分布
+DEFAULT_ERROR_RATE = 0.05
+ERROR_CONCENTRATION = 20.0
+# 时间线采样间隔（秒）
+SAMPLE_INTERVAL = 1.0
+# http 目标的持久连接数
+HTTP_POOL_SIZE = 16
+# ws / http 等待服务器回复的上限（秒），超时计为一次失败
+REPLY_TIMEOUT = 10.0
+REPORT_FORMAT = 1
+
+TypistProfile = namedtuple("TypistProfile", "wpm error_rate")
+
+# 计为一次失败（而不是让模拟中止）的异常
+# ValueError 来自无法解析的回复（例如指向了不提供该接口的服务器）
+_FAILURES = (OSError, LookupError, ValueError, asyncio.IncompleteReadError,
+             asyncio.TimeoutError)
+
+_CORPUS = make_passage(5_000)
+
+
+def draw_profiles(count, wpm=DEFAULT_WPM, wpm_sd=DEFAULT_WPM_SD,
+                  error_rate=DEFAULT_ERROR_RATE, seed=1):
+    """抽取 count 个学生的 (WPM, 错误率)"""
+    rng = random.Random(seed)
+    alpha = max(error_rate, 1e-6) * ERROR_CONCENTRATION
+    beta = max(1 - error_rate, 1e-6) * ERROR_CONCENTRATION
+    profiles = []
+    for _ in range(count):
+        speed = min(MAX_WPM, max(MIN_WPM, rng.gauss(wpm, wpm_sd)))
+        errors = rng.betavariate(alpha, beta) if error_rate > 0 else 0.0
+        profiles.append(TypistProfile(speed, errors))
+    return profiles
+
+
+def pick_passage(rng, min_length=150, max_length=400):
+    """从固定语料中随机截取一段练习文本"""
+    length = rng.randint(min_length, max_length)
+    start = rng.randrange(len(_CORPUS) - length)
+    return _CORPUS[start:start + length].strip() or _CORPUS[:length]
+
+
+def keystroke_batches(text, profile, rng, interval=DEFAULT_INTERVAL):
+    """按学生的速度把文本切成每 interval 秒一批的按键，打错的字符随后退格改正
+
+    慢速学生每批不足一个字符时会产生空批次，表示这段时间没有按键。
+    """
+    chars_per_batch = profile.wpm * 5 / 60 * interval
+    credit = 0.0
+    position = 0
+    while position < len(text):
+        credit += chars_per_batch
+        count = int(credit)
+        credit -= count
+        batch = []
+        for char in text[position:position + count]:
+            if rng.random() < profile.error_rate:
+                batch.append("#" if char != "#" else "@")
+                batch.append(BACKSPACE)
+            batch.append(char)
+        position += count
+        yield "".join(batch)
+
+
+def read_rss():
+    """当前进程的常驻内存（字节）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节；这里只能拿到峰值
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Recorder:
+    """汇总延迟与吞吐，并由后台线程按固定间隔采样 CPU 和 RSS"""
+
+    def __init__(self, sample_interval=SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self.timeline = []
+        self.latencies = []
+        self.lags = []
+        self.keystrokes = 0
+        self.batches = 0
+        self.failures = 0
+        self._window = ([], 0, 0)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._began = None
+
+    def record(self, latency, keys, lag):
+        with self._lock:
+            window_latencies, window_keys, window_batches = self._window
+            window_latencies.append(latency)
+            self._window = (window_latencies, window_keys + keys, window_batches + 1)
+        self.latencies.append(latency)
+        self.lags.append(lag)
+        self.keystrokes += keys
+        self.batches += 1
+
+    def fail(self):
+        self.failures += 1
+
+    def start(self):
+        self._began = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self._began
+
+    def _sample_loop(self):
+        last_wall = self._began
+        last_cpu = time.process_time()
+        while not self._stop.wait(self.sample_interval):
+            self._sample(last_wall, last_cpu)
+            last_wall = time.perf_counter()
+            last_cpu = time.process_time()
+
+    def _sample(self, last_wall, last_cpu):
+        now = time.perf_counter()
+        cpu = time.process_time()
+        with self._lock:
+            latencies, keys, batches = self._window
+            self._window = ([], 0, 0)
+        elapsed = now - last_wall
+        latencies.sort()
+        self.timeline.append({
+            "t": round(now - self._began, 2),
+            "keys_per_s": round(keys / elapsed, 1),
+            "batches_per_s": round(batches / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "cpu_percent": round((cpu - last_cpu) / elapsed * 100, 1),
+            "rss_mb": round(read_rss() / 2**20, 1),
+        })
+
+
+class EngineTarget:
+    """直接调用 ScoringService"""
+
+    name = "engine"
+    in_process = True
+
+    def __init__(self, students):
+        self.service = ScoringService(max_sessions=max(students, 1))
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def open(self, text):
+        session_id, _ = self.service.create(text)
+        return session_id
+
+    async def send(self, session_id, keys):
+        if self.service.feed(session_id, keys) is None:
+            raise LookupError(f"unknown session {session_id}")
+
+    async def close(self, session_id):
+        self.service.close(session_id)
+
+
+class WebSocketTarget:
+    """game_server 的 WebSocket 接口；每批按键后等待一次 state 回复"""
+
+    name = "ws"
+
+    def __init__(self, students, url=None, timeout=REPLY_TIMEOUT):
+        self.url = url
+        self.in_process = url is None
+        self.timeout = timeout
+        self._server = None
+        self.host, self.port = "127.0.0.1", None
+
+    async def start(self):
+        if self.url is None:
+            from achievements import AchievementEngine
+            from game_server import GameServer, GameServerThread
+            self._server = GameServerThread(GameServer(achievements=AchievementEngine()))
+            self.port = await asyncio.to_thread(self._server.start)
+        else:
+            parts = urllib.parse.urlsplit(self.url)
+            self.host, self.port = parts.hostname, parts.port or 80
+
+    async def stop(self):
+        if self._server is not None:
+            await asyncio.to_thread(self._server.stop)
+
+    async def open(self, text):
+        from game_server import WebSocketClient
+        client = await asyncio.wait_for(WebSocketClient.connect(self.host, self.port),
+                                        self.timeout)
+        await client.send({"type": "join", "room": "load", "text": text})
+        states = asyncio.Queue()
+        joined = asyncio.get_running_loop().create_future()
+
+        async def reader():
+            try:
+                while True:
+                    message = await client.recv()
+                    if message is None:
+                        return
+                    kind = message.get("type")
+                    if kind == "joined" and not joined.done():
+                        joined.set_result(message)
+                    elif kind in ("state", "error"):
+                        await states.put(message)
+            finally:
+                # 连接关闭或出错时唤醒仍在等待回复的一方
+                if not joined.done():
+                    joined.set_exception(ConnectionError("connection closed"))
+                states.put_nowait(None)
+
+        task = asyncio.get_running_loop().create_task(reader())
+        try:
+            await asyncio.wait_for(joined, self.timeout)
+        except BaseException:
+            await self.close((client, states, task))
+            raise
+        return client, states, task
+
+    async def send(self, handle, keys):
+        client, states, _ = handle
+        await client.send({"type": "keys", "keys": keys})
+        await client.send({"type": "state"})
+        reply = await asyncio.wait_for(states.get(), self.timeout)
+        if reply is None:
+            # 保留哨兵，之后的 send 也立即失败
+            states.put_nowait(None)
+            raise ConnectionError("connection closed")
+        if reply["type"] != "state":
+            raise LookupError(reply.get("error"))
+
+    async def close(self, handle):
+        client, _, task = handle
+        with suppress(ConnectionError):
+            await client.close()
+        task.cancel()
+        with suppress(asyncio.CancelledError, ConnectionError,
+                      asyncio.IncompleteReadError):
+            await task
+
+
+class HttpTarget:
+    """play.py 的 /api/score 计分接口，请求经由固定大小的持久连接池"""
+
+    name = "http"
+
+    def __init__(self, students, url=None, pool_size=HTTP_POOL_SIZE, timeout=REPLY_TIMEOUT):
+        self.students = students
+        self.url = url
+        self.in_process = url is None
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._httpd = None
+        self._pool = None
+        self.host, self.port = "127.0.0.1", None
+
+    async def start(self):
+        if self.url is None:
+            from play import create_server
+            # 每个持久连接占用一个工作线程
+            self._httpd = create_server(0, self.pool_size, backlog=self.pool_size,
+                                        host="127.0.0.1")
+            self._httpd.scoring = ScoringService(max_sessions=max(self.students, 1))
+            threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+            self.port = self._httpd.server_address[1]
+        else:
+            parts = urllib.parse.urlsplit(self.url)
+            self.host, self.port = parts.hostname, parts.port or 80
+        self._pool = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self._pool.put_nowait(None)
+
+    async def stop(self):
+        while not self._pool.empty():
+            connection = self._pool.get_nowait()
+            if connection is not None:
+                connection[1].close()
+        if self._httpd is not None:
+            await asyncio.to_thread(self._httpd.shutdown)
+            self._httpd.server_close()
+
+    async def request(self, method, path, payload=None):
+        """发送一个请求，返回 (状态码, JSON 正文)；连接失效时重连一次
+
+        超过 timeout 没有完整回复时抛出 asyncio.TimeoutError，连接随之丢弃
+        （其上可能还有未读完的响应），不再重试。
+        """
+        connection = await self._pool.get()
+        try:
+            for attempt in (0, 1):
+                if connection is None:
+                    connection = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port), self.timeout)
+                try:
+                    return await asyncio.wait_for(
+                        self._exchange(connection, method, path, payload), self.timeout)
+                except asyncio.TimeoutError:
+                    connection[1].close()
+                    connection = None
+                    raise
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    connection[1].close()
+                    connection = None
+                    if attempt:
+                        raise
+        finally:
+            self._pool.put_nowait(connection)
+
+    async def _exchange(self, connection, method, path, payload):
+        reader, writer = connection
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                      "Content-Type: application/json\r\n"
+                      f"Content-Length: {len(body)}\r\n\r\n").encode("ascii") + body)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        length = 0
+        content_type = ""
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "content-type":
+                content_type = value.strip().lower()
+        data = await reader.readexactly(length) if length else b""
+        # 错误页等非 JSON 正文只看状态码
+        if not data or not content_type.startswith("application/json"):
+            return status, None
+        return status, json.loads(data)
+
+    async def open(self, text):
+        status, reply = await self.request("POST", "/api/score", {"text": text})
+        if status != 201 or reply is None:
+            raise LookupError(f"create failed with {status}")
+        return reply["session"]
+
+    async def send(self, session_id, keys):
+        status, _ = await self.request("POST", f"/api/score/{session_id}", {"keys": keys})
+        if status != 200:
+            raise LookupError(f"feed failed with {status}")
+
+    async def close(self, session_id):
+        await self.request("DELETE", f"/api/score/{session_id}")
+
+
+def make_target(name, students, url=None, pool_size=HTTP_POOL_SIZE, timeout=REPLY_TIMEOUT):
+    if name == "engine":
+        return EngineTarget(students)
+    if name == "ws":
+        return WebSocketTarget(students, url, timeout)
+    if name == "http":
+        return HttpTarget(students, url, pool_size, timeout)
+    raise ValueError(f"unknown target {name!r}; choose from {', '.join(TARGETS)}")
+
+
+async def _typist(target, profile, rng, deadline, interval, recorder):
+    """一个学生：打完一段就换下一段，直到 deadline"""
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        text = pick_passage(rng)
+        try:
+            handle = await target.open(text)
+        except _FAILURES:
+            recorder.fail()
+            await asyncio.sleep(interval)
+            continue
+        try:
+            scheduled = loop.time()
+            for keys in keystroke_batches(text, profile, rng, interval):
+                scheduled += interval
+                await asyncio.sleep(max(0.0, scheduled - loop.time()))
+                if loop.time() >= deadline:
+                    return
+                if not keys:
+                    continue
+                # 事件循环跟不上时，实际唤醒时间会落后于计划
+                lag = loop.time() - scheduled
+                began = time.perf_counter()
+                try:
+                    await target.send(handle, keys)
+                except _FAILURES:
+                    recorder.fail()
+                    break
+                recorder.record(time.perf_counter() - began, len(keys), lag)
+        finally:
+            with suppress(*_FAILURES):
+                await target.close(handle)
+
+
+async def simulate(target, profiles, duration, interval=DEFAULT_INTERVAL, ramp=None,
+                   seed=1, sample_interval=SAMPLE_INTERVAL):
+    """运行一次模拟，返回 Recorder 和实际耗时"""
+    await target.start()
+    recorder = Recorder(sample_interval)
+    rng = random.Random(seed)
+    ramp = min(5.0, duration / 4) if ramp is None else ramp
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+
+    async def delayed(profile, delay, typist_rng):
+        await asyncio.sleep(delay)
+        await _typist(target, profile, typist_rng, deadline, interval, recorder)
+
+    tasks = [delayed(profile, ramp * i / max(1, len(profiles)),
+                     random.Random(rng.random()))
+             for i, profile in enumerate(profiles)]
+    recorder.start()
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        elapsed = recorder.stop()
+        await target.stop()
+    return recorder, elapsed
+
+
+def run_benchmark(students=DEFAULT_STUDENTS, duration=DEFAULT_DURATION, target="engine",
+                  wpm=DEFAULT_WPM, wpm_sd=DEFAULT_WPM_SD, error_rate=DEFAULT_ERROR_RATE,
+                  interval=DEFAULT_INTERVAL, seed=1, url=None, pool_size=HTTP_POOL_SIZE,
+                  sample_interval=SAMPLE_INTERVAL, timeout=REPLY_TIMEOUT):
+    """运行模拟并返回可写入 JSON 的报告"""
+    profiles = draw_profiles(students, wpm, wpm_sd, error_rate, seed)
+    target_obj = make_target(target, students, url, pool_size, timeout)
+    rss_before = read_rss()
+    recorder, elapsed = asyncio.run(simulate(
+        target_obj, profiles, duration, interval, seed=seed,
+        sample_interval=sample_interval))
+
+    latencies = sorted(recorder.latencies)
+    lags = sorted(recorder.lags)
+    timeline = recorder.timeline
+    return {
+        "format": REPORT_FORMAT,
+        "config": {
+            "students": students, "duration": duration, "target": target,
+            "url": url, "wpm": wpm, "wpm_sd": wpm_sd, "error_rate": error_rate,
+            "interval": interval, "seed": seed, "pool_size": pool_size,
+            "timeout": timeout,
+            "server_in_process": target_obj.in_process,
+            "python": sys.version.split()[0], "cpus": os.cpu_count(),
+        },
+        "summary": {
+            "elapsed": round(elapsed, 2),
+            "batches": recorder.batches,
+            "keystrokes": recorder.keystrokes,
+            "failures": recorder.failures,
+            "batches_per_s": round(recorder.batches / elapsed, 1),
+            "keys_per_s": round(recorder.keystrokes / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            "lag_p99_ms": round(percentile(lags, 99) * 1000, 3),
+            "cpu_percent_mean": round(sum(s["cpu_percent"] for s in timeline)
+                                      / len(timeline), 1) if timeline else 0.0,
+            "rss_start_mb": round(rss_before / 2**20, 1),
+            "rss_peak_mb": max((s["rss_mb"] for s in timeline), default=0.0),
+        },
+        "timeline": timeline,
+    }
+
+
+def write_report(report, path):
+    """原子地写出报告"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def print_report(report):
+    config, summary = report["config"], report["summary"]
+    where = "in-process server" if config["server_in_process"] else config["url"]
+    print(f"📊 {config['students']} simulated students → {config['target']} "
+          f"({where}), {summary['elapsed']:.1f} s, seed {config['seed']}")
+    print(f"   {summary['batches_per_s']:.0f} batches/s, {summary['keys_per_s']:.0f} keys/s, "
+          f"{summary['failures']} failures")
+    print(f"   latency p50 {summary['p50_ms']:.2f} ms, p95 {summary['p95_ms']:.2f} ms, "
+          f"p99 {summary['p99_ms']:.2f} ms, max {summary['max_ms']:.2f} ms "
+          f"(scheduling lag p99 {summary['lag_p99_ms']:.1f} ms)")
+    print(f"   CPU {summary['cpu_percent_mean']:.0f}% mean, RSS "
+          f"{summary['rss_start_mb']:.0f} → {summary['rss_peak_mb']:.0f} MB peak")
+    print(f"{'t':>7} {'keys/s':>9} {'p99 ms':>9} {'CPU %':>7} {'RSS MB':>8}")
+    for s in report["timeline"]:
+        print(f"{s['t']:>7.1f} {s['keys_per_s']:>9.0f} {s['p99_ms']:>9.2f} "
+              f"{s['cpu_percent']:>7.1f} {s['rss_mb']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless load simulator")
+    parser.add_argument("--students", type=int, default=DEFAULT_STUDENTS,
+                        help="simulated typists (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION,
+                        help="seconds to run (default: %(default)s)")
+    parser.add_argument("--target", choices=TARGETS, default="engine",
+                        help="what to drive (default: %(default)s)")
+    parser.add_argument("--url", help="drive an already running server instead, "
+                                      "e.g. http://localhost:8081")
+    parser.add_argument("--wpm", type=float, default=DEFAULT_WPM,
+                        help="mean typing speed (default: %(default)s)")
+    parser.add_argument("--wpm-sd", type=float, default=DEFAULT_WPM_SD,
+                        help="standard deviation of typing speed (default: %(default)s)")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_ERROR_RATE,
+                        help="mean per-character error rate (default: %(default)s)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help="seconds between key batches (default: %(default)s)")
+    parser.add_argument("--pool-size", type=int, default=HTTP_POOL_SIZE,
+                        help="HTTP keep-alive connections (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=REPLY_TIMEOUT,
+                        help="seconds to wait for a server reply before counting "
+                             "a failure (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="random seed (default: %(default)s)")
+    parser.add_argument("--output", metavar="PATH",
+                        help="write the JSON report to PATH")
+    args = parser.parse_args()
+
+    if args.url and args.target == "engine":
+        parser.error("--url needs --target ws or http")
+    report = run_benchmark(args.students, args.duration, args.target, args.wpm,
+                           args.wpm_sd, args.error_rate, args.interval, args.seed,
+                           args.url, args.pool_size, timeout=args.timeout)
+    print_report(report)
+    if args.output:
+        write_report(report, args.output)
+        print(f"💾 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
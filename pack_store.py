@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本包服务
+========
+
+服务器只需要读取 passage_packs.py 构建好的文本包：本模块只包含
+manifest 格式常量、URL 前缀和内存中的 PackStore，不依赖构建流水线
+（源文件扫描、可读性标注、进程池、指法代价），服务引擎导入它时不会
+连带加载这些模块。
+"""
+
+import gzip
+import json
+import os
+
+from asset_cache import CachedAsset
+
+PACK_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+# 文本包在服务器上的 URL 前缀
+PACKS_URL = "/packs/"
+
+
+def load_manifest(directory):
+    """读取 manifest.json，不存在或格式版本不符时返回 None"""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == PACK_FORMAT else None
+
+
+class PackStore:
+    """在内存中提供文本包，供服务器在 PACKS_URL 下返回
+
+    文本包直接使用磁盘上的 gzip 数据作为压缩版本，并以 immutable 长期缓存；
+    manifest.json 每次都要求用 ETag 重新验证。与 AssetCache 一样可以
+    传给 asset_cache.cached_response()。
+    """
+
+    cache_control = "no-cache"
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self._assets = {}
+        self.manifest = load_manifest(self.directory)
+        if self.manifest is None:
+            raise ValueError(f"no passage pack manifest in {directory}")
+        self._add(MANIFEST_NAME, "application/json", immutable=False)
+        for pack in self.manifest["packs"].values():
+            self._add(pack["file"], "application/json", immutable=True)
+
+    def _add(self, name, content_type, immutable):
+        path = os.path.join(self.directory, name)
+        with open(path, "rb") as f:
+            data = f.read()
+        mtime_ns = os.stat(path).st_mtime_ns
+        if name.endswith(".gz"):
+            asset = CachedAsset(path, gzip.decompress(data), mtime_ns, content_type,
+                                gzip_data=data, immutable=immutable)
+        else:
+            asset = CachedAsset(path, data, mtime_ns, content_type, immutable=immutable)
+        self._assets[PACKS_URL + name] = asset
+
+    def __len__(self):
+        return len(self._assets)
+
+    def get(self, url_path):
+        """按 URL 路径取文本包，不存在时返回 None"""
+        return self._assets.get(url_path.split("?", 1)[0])
+
+    def summary(self):
+        """返回 (文本包数, 段数, 压缩后字节数)"""
+        packs = self.manifest["packs"].values()
+        return (len(packs), sum(p["passages"] for p in packs),
+                sum(p["bytes"] for p in packs))
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+练习文本分析缓存
+==============
+
+每次选出一段文本，下发分段、校验年级、计分和难度判断都要从头
+推导同样的事实。本模块把它们一次算好放进 PassageAnalysis：
+单词边界（passage_tokens 的分段）、字符类别直方图与字符集标记、
+字母组合集合、Flesch-Kincaid 可读性以及文本包使用的年级和难度。
+
+AnalysisCache 按文本内容哈希缓存分析结果：内存中是按总字符数限制大小的
+LRU；指定 cache_dir 时每段文本的结果另存为一个 JSON 文件（原子写入），
+进程重启后直接读取。文本来自客户端请求，目录中的文件数限制为 max_files，
+超出时删除最早写入的结果。结果带 ANALYSIS_VERSION，分析规则变化时递增版本号，
+旧文件自动失效并重新计算。
+
+    from passage_analysis import analyze
+    analysis = analyze(text)          # 进程内共享的默认缓存
+
+    python3 passage_analysis.py       # 重复开局时无缓存 / 内存 / 磁盘缓存的耗时对比
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+from content_corpus import _DIGIT, _LOWER, _PUNCT, _SPACE, _UPPER, synthesize_passages
+from passage_tokens import WORD, Segment, segments_payload, tokenize_passage
+from readability import readability_grade, tag_passage
+
+# 分析规则或结果格式变化时递增，磁盘上旧版本的结果会被重新计算
+ANALYSIS_VERSION = 1
+# 内存缓存中全部文本的字符数上限
+MAX_CACHED_CHARS = 1_000_000
+# 磁盘缓存目录中的结果文件数上限
+MAX_CACHED_FILES = 10_000
+
+# 直方图各项的顺序，与 content_corpus 的字符集标记一一对应
+CHAR_CLASSES = ("lower", "upper", "digit", "punct", "space", "other")
+
+_ANALYSIS_FIELDS = ("version digest length segments words histogram charset bigrams "
+                    "readability grade difficulty")
+
+
+class PassageAnalysis(namedtuple("PassageAnalysis", _ANALYSIS_FIELDS)):
+    """一段文本的分析结果（不可变，可在线程和请求之间共享）
+
+    histogram 按 CHAR_CLASSES 顺序记录各类字符个数；bigrams 是相邻两个字符
+    （小写，与 adaptive_selection 的字母组合定义一致）的集合；
+    readability 在没有英文单词时为 None。
+    """
+
+    __slots__ = ()
+
+    def class_counts(self):
+        """{类别名: 字符数}"""
+        return dict(zip(CHAR_CLASSES, self.histogram))
+
+    def payload(self):
+        """开局响应中附带的字段：分段与文本概况"""
+        return {
+            "segments": [segment._asdict() for segment in self.segments],
+            "passage": {
+                "digest": self.digest,
+                "length": self.length,
+                "words": self.words,
+                "grade": self.grade,
+                "difficulty": self.difficulty,
+                "charset": self.charset,
+            },
+        }
+
+
+def passage_digest(text):
+    """文本内容哈希，用作缓存键和磁盘文件名"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def char_histogram(text):
+    """按 CHAR_CLASSES 顺序统计各类字符个数"""
+    counts = [0] * len(CHAR_CLASSES)
+    for char, n in Counter(text).items():
+        if char in _LOWER:
+            counts[0] += n
+        elif char in _UPPER:
+            counts[1] += n
+        elif char in _DIGIT:
+            counts[2] += n
+        elif char in _PUNCT:
+            counts[3] += n
+        elif char in _SPACE:
+            counts[4] += n
+        else:
+            counts[5] += n
+    return tuple(counts)
+
+
+def analyze_passage(text, digest=None):
+    """不经缓存直接分析一段文本"""
+    segments = tokenize_passage(text)
+    histogram = char_histogram(text)
+    lowered = text.lower()
+    grade, difficulty, charset = tag_passage(text)
+    return PassageAnalysis(
+        version=ANALYSIS_VERSION,
+        digest=digest or passage_digest(text),
+        length=len(text),
+        segments=segments,
+        words=sum(1 for s in segments if s.kind == WORD),
+        histogram=histogram,
+        charset=charset,
+        bigrams=frozenset(lowered[i:i + 2] for i in range(len(lowered) - 1)),
+        readability=readability_grade(text),
+        grade=grade,
+        difficulty=difficulty,
+    )
+
+
+def _to_json(analysis):
+    data = analysis._asdict()
+    data["segments"] = [[s.kind, s.start, s.end] for s in analysis.segments]
+    data["histogram"] = list(analysis.histogram)
+    data["bigrams"] = sorted(analysis.bigrams)
+    return data
+
+
+def _from_json(data):
+    data["segments"] = tuple(Segment(f"s{i}", kind, start, end)
+                             for i, (kind, start, end) in enumerate(data["segments"]))
+    data["histogram"] = tuple(data["histogram"])
+    data["bigrams"] = frozenset(data["bigrams"])
+    return PassageAnalysis(**data)
+
+
+class AnalysisCache:
+    """按内容哈希缓存 PassageAnalysis
+
+    内存中是 LRU，缓存文本的总字符数超过 max_chars 时淘汰最久未用的结果；
+    cache_dir 不为空时未命中的结果再到磁盘查找，算出的新结果写回磁盘，
+    目录中超过 max_files 个结果时按写入时间删除最早的文件。
+    所有方法线程安全，分析本身在锁外进行。
+    """
+
+    def __init__(self, max_chars=MAX_CACHED_CHARS, cache_dir=None,
+                 max_files=MAX_CACHED_FILES):
+        self.max_chars = max_chars
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self._entries = OrderedDict()
+        self._chars = 0
+        # 磁盘上的结果，按写入时间从早到晚
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._scan_files()
+            self._evict_files()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, text):
+        """返回 text 的分析结果，必要时计算"""
+        digest = passage_digest(text)
+        with self._lock:
+            analysis = self._entries.get(digest)
+            if analysis is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return analysis
+
+        analysis = self._load(digest)
+        if analysis is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            analysis = analyze_passage(text, digest)
+            with self._lock:
+                self.misses += 1
+            self._store(analysis)
+        self._remember(analysis)
+        return analysis
+
+    def _remember(self, analysis):
+        with self._lock:
+            if analysis.digest in self._entries:
+                return
+            self._entries[analysis.digest] = analysis
+            self._chars += analysis.length
+            while self._chars > self.max_chars and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self._chars -= old.length
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _scan_files(self):
+        found = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                try:
+                    found.append((entry.stat().st_mtime_ns, entry.name[:-len(".json")]))
+                except OSError:
+                    pass
+        self._files = OrderedDict((digest, None) for _, digest in sorted(found))
+
+    def _evict_files(self):
+        with self._lock:
+            evicted = []
+            while len(self._files) > self.max_files:
+                evicted.append(self._files.popitem(last=False)[0])
+        for digest in evicted:
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+    def _load(self, digest):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(digest), encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != ANALYSIS_VERSION or data.get("digest") != digest:
+                return None
+            return _from_json(data)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _store(self, analysis):
+        if self.cache_dir is None:
+            return
+        path = self._path(analysis.digest)
+        # 多个线程可能同时写同一段文本，临时文件名各自独立
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(_to_json(analysis), f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError:
+            # 磁盘缓存只是加速，写失败时仍返回内存中的结果
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._files[analysis.digest] = None
+            self._files.move_to_end(analysis.digest)
+        self._evict_files()
+
+    def clear(self):
+        """清空内存缓存（磁盘上的结果保留）"""
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def stats(self):
+        """命中统计与当前占用"""
+        with self._lock:
+            return {"entries": len(self._entries), "chars": self._chars,
+                    "files": len(self._files), "hits": self.hits,
+                    "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+_default_cache = AnalysisCache()
+
+
+def get_default_cache():
+    """进程内共享的分析缓存"""
+    return _default_cache
+
+
+def configure(max_chars=MAX_CACHED_CHARS, cache_dir=None, max_files=MAX_CACHED_FILES):
+    """替换进程内共享的分析缓存（例如启用磁盘缓存），返回新缓存"""
+    global _default_cache
+    _default_cache = AnalysisCache(max_chars, cache_dir, max_files)
+    return _default_cache
+
+
+def analyze(text):
+    """用进程内共享的缓存分析 text"""
+    return _default_cache.get(text)
+
+
+def _level_start_baseline(text):
+    """没有分析层时每次开局各处分别推导：分段、年级/难度、字母组合"""
+    segments_payload(text)
+    tag_passage(text)
+    readability_grade(text)
+    lowered = text.lower()
+    return {lowered[i:i + 2] for i in range(len(lowered) - 1)}
+
+
+def run_benchmark(passages=2_000, starts=50_000, seed=7):
+    """模拟 starts 次开局（文本按 Zipf 分布重复出现），比较各方案的每次开局耗时
+
+    对照组每次开局都重新推导，内存缓存组使用默认容量；
+    磁盘组模拟进程重启：内存为空，结果全部来自上一次运行写下的文件。
+    """
+    texts = [text for text, _, _ in synthesize_passages(passages, seed)]
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(texts))]
+    picks = rng.choices(texts, weights, k=starts)
+
+    began = time.perf_counter()
+    for text in picks:
+        _level_start_baseline(text)
+    baseline = time.perf_counter() - began
+
+    memory = AnalysisCache()
+    began = time.perf_counter()
+    for text in picks:
+        memory.get(text)
+    cached = time.perf_counter() - began
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = AnalysisCache(cache_dir=tmp)
+        began = time.perf_counter()
+        for text in texts:
+            writer.get(text)
+        write = time.perf_counter() - began
+
+        reader = AnalysisCache(cache_dir=tmp)
+        began = time.perf_counter()
+        for text in texts:
+            reader.get(text)
+        read = time.perf_counter() - began
+
+    return {
+        "passages": len(texts),
+        "starts": starts,
+        "baseline_us": baseline / starts * 1e6,
+        "cached_us": cached / starts * 1e6,
+        "memory": memory.stats(),
+        "disk_write_us": write / len(texts) * 1e6,
+        "disk_read_us": read / len(texts) * 1e6,
+        "disk": reader.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Passage analysis cache")
+    parser.add_argument("--passages", type=int, default=2_000,
+                        help="distinct passages in the benchmark (default: %(default)s)")
+    parser.add_argument("--starts", type=int, default=50_000,
+                        help="simulated level starts (default: %(default)s)")
+    parser.add_argument("--show", metavar="TEXT", help="print the analysis of TEXT instead")
+    args = parser.parse_args()
+
+    if args.show is not None:
+        analysis = analyze_passage(args.show)
+        print(f"   digest      {analysis.digest}")
+        print(f"   length      {analysis.length} chars, {analysis.words} words, "
+              f"{len(analysis.segments)} segments")
+        print(f"   classes     {analysis.class_counts()}")
+        readability = "-" if analysis.readability is None else f"{analysis.readability:.2f}"
+        print(f"   readability {readability} → grade {analysis.grade}, "
+              f"difficulty {analysis.difficulty}")
+        print(f"   bigrams     {len(analysis.bigrams)} distinct")
+        return
+
+    r = run_benchmark(args.passages, args.starts)
+    m = r["memory"]
+    print(f"📊 {r['starts']} level starts over {r['passages']} passages (Zipf)")
+    print(f"   re-derive every start {r['baseline_us']:7.1f} µs/start")
+    print(f"   memory LRU            {r['cached_us']:7.1f} µs/start "
+          f"({m['hits']} hits, {m['misses']} misses)")
+    print(f"   disk cache            write {r['disk_write_us']:.1f} µs, "
+          f"warm restart read {r['disk_read_us']:.1f} µs per passage")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+练习文本包构建
+============
+
+离线构建阶段：读取纯文本源文件（段落之间空行分隔），规范化、去重，
+按可读性（Flesch-Kincaid 年级）和字符集标注年级与难度，
+然后每个年级写出一个 gzip 压缩的 JSON 文本包。每段文本还附带 QWERTY 下的
+平均指法代价 effort（keyboard_layouts.passage_costs，整批一次算出）。
+
+- 文本包文件名带内容哈希（grade-3.1a2b3c4d5e6f7a8b.json.gz），内容不变则文件名不变，
+  服务器可以用 immutable 长期缓存；manifest.json 列出当前版本的各个包，
+  每次请求都重新验证；
+- 每个源文件的处理结果按 (路径, mtime, 大小) 缓存在输出目录，
+  重新构建时只处理改动过的源文件；
+- 需要处理的源文件较多时在进程池中并行处理。
+
+服务器端读取文本包的 PackStore 在 pack_store.py 中，不依赖本模块。
+
+    python3 passage_packs.py build sources/ packs/
+    python3 play.py --packs packs/
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import unicodedata
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from pack_store import MANIFEST_NAME, PACK_FORMAT, load_manifest
+from readability import tag_passage
+from report_engine import ScanCache, iter_source_files
+
+BUILD_CACHE_NAME = ".build_cache.json"
+MIN_PASSAGE_CHARS = 20
+MAX_PASSAGE_CHARS = 280
+# 需要处理的源文件少于该数量时直接在当前进程处理，不启动进程池
+MIN_POOL_FILES = 8
+
+_PACK_NAME_RE = re.compile(r"^grade-\d+\.[0-9a-f]{16}\.json\.gz$")
+_WHITESPACE_RE = re.compile(r"\s+")
+_SENTENCE_RE = re.compile(r"[^.!?]+(?:[.!?]+[\"')\]]*|$)")
+# 排版符号统一为键盘上能直接打出的字符
+_TYPOGRAPHY = str.maketrans({
+    "‘": "'", "’": "'", "“": '"', "”": '"',
+    "–": "-", "—": "-", "…": "...", "\u00a0": " ",
+})
+
+BuildResult = namedtuple(
+    "BuildResult", "passages duplicates sources processed written removed build")
+
+
+def normalize(text):
+    """NFKC 规范化、替换排版符号并合并空白"""
+    text = unicodedata.normalize("NFKC", text).translate(_TYPOGRAPHY)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def split_passages(raw):
+    """把源文本按空行切成段落，过长的段落按句子拆开，过短的丢弃"""
+    passages = []
+    for paragraph in re.split(r"\n\s*\n", raw):
+        paragraph = normalize(paragraph)
+        if len(paragraph) <= MAX_PASSAGE_CHARS:
+            chunks = [paragraph]
+        else:
+            chunks = []
+            current = ""
+            for sentence in _SENTENCE_RE.findall(paragraph):
+                sentence = sentence.strip()
+                if current and len(current) + 1 + len(sentence) > MAX_PASSAGE_CHARS:
+                    chunks.append(current)
+                    current = sentence
+                else:
+                    current = f"{current} {sentence}" if current else sentence
+            chunks.append(current)
+        passages.extend(c for c in chunks
+                        if MIN_PASSAGE_CHARS <= len(c) <= MAX_PASSAGE_CHARS)
+    return passages
+
+
+def process_source(path):
+    """处理一个源文件，返回 [[文本, 年级, 难度, 字符集], ...]"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        raw = f.read()
+    return [[text, *tag_passage(text)] for text in split_passages(raw)]
+
+
+def dedupe_key(text):
+    """去重键：忽略大小写、空白和标点"""
+    letters = "".join(ch for ch in text.lower() if ch.isalnum())
+    return hashlib.blake2b(letters.encode("utf-8"), digest_size=16).digest()
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_packs(source_dir, output_dir, processes=None):
+    """构建文本包，返回 BuildResult
+
+    源文件按路径排序处理，重复的文本保留最先出现的一份，
+    因此同样的输入总是产生同样的文本包。
+    """
+    # 指法代价只在构建时需要，在这里导入，导入本模块时不加载 numpy
+    from keyboard_layouts import load_layout, passage_costs
+
+    os.makedirs(output_dir, exist_ok=True)
+    cache = ScanCache(os.path.join(output_dir, BUILD_CACHE_NAME))
+    sources = sorted(iter_source_files(source_dir, (".txt",)))
+
+    processed = {}
+    pending = []
+    for path in sources:
+        st = os.stat(path)
+        key = os.path.relpath(path, source_dir)
+        entry = cache.lookup(key, st)
+        if entry is not None:
+            processed[path] = entry["passages"]
+        else:
+            pending.append((path, key, st))
+
+    if pending:
+        paths = [path for path, _, _ in pending]
+        if len(paths) < MIN_POOL_FILES or processes == 1:
+            results = list(map(process_source, paths))
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(process_source, paths))
+        for (path, key, st), passages in zip(pending, results):
+            processed[path] = passages
+            cache.store(key, st, passages=passages)
+    cache.prune(os.path.relpath(path, source_dir) for path in sources)
+    cache.save()
+
+    grades = {}
+    seen = set()
+    duplicates = 0
+    for path in sources:
+        for text, grade, difficulty, charset in processed[path]:
+            key = dedupe_key(text)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            grades.setdefault(grade, []).append(
+                {"text": text, "difficulty": difficulty, "charset": charset})
+
+    layout = load_layout("qwerty", cache_path=None)
+    for entries in grades.values():
+        costs = passage_costs([entry["text"] for entry in entries], layout)
+        for entry, cost in zip(entries, costs):
+            entry["effort"] = round(float(cost), 3)
+
+    previous = load_manifest(output_dir) or {"build": 0, "packs": {}}
+    packs = {}
+    written = 0
+    for grade in sorted(grades):
+        body = json.dumps({"format": PACK_FORMAT, "grade": grade,
+                           "passages": grades[grade]},
+                          ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        name = f"grade-{grade}.{digest}.json.gz"
+        path = os.path.join(output_dir, name)
+        if not os.path.exists(path):
+            _write_atomic(path, gzip.compress(body, compresslevel=9, mtime=0))
+            written += 1
+        packs[str(grade)] = {"file": name, "passages": len(grades[grade]),
+                             "bytes": os.path.getsize(path)}
+
+    changed = packs != previous["packs"]
+    build = previous["build"] + 1 if changed else previous["build"]
+    if changed or not os.path.exists(os.path.join(output_dir, MANIFEST_NAME)):
+        manifest = {"format": PACK_FORMAT, "build": build, "packs": packs}
+        _write_atomic(os.path.join(output_dir, MANIFEST_NAME),
+                      json.dumps(manifest, indent=2).encode("utf-8") + b"\n")
+
+    # manifest 写好之后再删除不再引用的旧包
+    current = {pack["file"] for pack in packs.values()}
+    removed = 0
+    for name in os.listdir(output_dir):
+        if _PACK_NAME_RE.match(name) and name not in current:
+            os.unlink(os.path.join(output_dir, name))
+            removed += 1
+
+    return BuildResult(len(seen), duplicates, len(sources), len(pending),
+                       written, removed, build)
+
+
+def _make_sources(root, files, paragraphs=200):
+    words = ("the cat sat on a warm mat while children read interesting "
+             "adventure stories about mysterious islands and brave explorers").split()
+    for i in range(files):
+        lines = []
+        for j in range(paragraphs):
+            # 约十分之一的段落在不同文件之间重复
+            seed = j if j % 10 == 0 else i * paragraphs + j
+            size = 8 + seed % 30
+            sentence = " ".join(words[(seed * 7 + k * 3) % len(words)] for k in range(size))
+            lines.append(sentence.capitalize() + f". Story {seed} ends here.")
+        with open(os.path.join(root, f"source{i:03d}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(lines))
+
+
+def run_benchmark(files=64, paragraphs=200, processes=None):
+    """比较首次构建、无改动重建与只改动一个源文件后的增量构建"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = os.path.join(tmp, "sources")
+        output = os.path.join(tmp, "packs")
+        os.makedirs(sources)
+        _make_sources(sources, files, paragraphs)
+
+        began = time.perf_counter()
+        cold = build_packs(sources, output, processes)
+        cold_s = time.perf_counter() - began
+
+        began = time.perf_counter()
+        build_packs(sources, output, processes)
+        noop_s = time.perf_counter() - began
+
+        with open(os.path.join(sources, "source000.txt"), "a", encoding="utf-8") as f:
+            f.write("\n\nA brand new paragraph was added to the first source file today.")
+        began = time.perf_counter()
+        incremental = build_packs(sources, output, processes)
+        incremental_s = time.perf_counter() - began
+
+        raw = sum(os.path.getsize(p) for p in iter_source_files(sources, (".txt",)))
+        packed = sum(p["bytes"] for p in load_manifest(output)["packs"].values())
+
+    return {"files": files, "passages": cold.passages, "duplicates": cold.duplicates,
+            "cold_s": cold_s, "noop_s": noop_s, "incremental_s": incremental_s,
+            "incremental_processed": incremental.processed,
+            "incremental_written": incremental.written,
+            "raw_bytes": raw, "packed_bytes": packed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Passage pack builder")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build packs from a directory of .txt sources")
+    build.add_argument("source")
+    build.add_argument("output")
+    build.add_argument("--processes", type=int, default=None,
+                       help="worker processes (default: CPU count)")
+    bench = sub.add_parser("bench", help="measure cold, no-op and incremental builds")
+    bench.add_argument("--files", type=int, default=64)
+    bench.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        r = build_packs(args.source, args.output, args.processes)
+        print(f"📚 Build {r.build}: {r.passages} passages from {r.sources} sources "
+              f"({r.processed} reprocessed, {r.duplicates} duplicates dropped)")
+        print(f"   {r.written} packs written, {r.removed} stale packs removed")
+        return
+
+    r = run_benchmark(args.files, processes=args.processes)
+    print(f"📊 {r['files']} sources, {r['passages']} passages, "
+          f"{r['duplicates']} duplicates, {r['raw_bytes'] / 1024:.0f} KB -> "
+          f"{r['packed_bytes'] / 1024:.0f} KB packed")
+    print(f"   cold build               {r['cold_s'] * 1000:8.0f} ms")
+    print(f"   rebuild, nothing changed {r['noop_s'] * 1000:8.0f} ms")
+    print(f"   one source changed       {r['incremental_s'] * 1000:8.0f} ms "
+          f"({r['incremental_processed']} reprocessed, "
+          f"{r['incremental_written']} packs written)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+练习文本分段
+==========
+
+服务器下发练习文本时附带分段结果：文本被切成单词、空白和标点段，
+每段有稳定的 id（按出现顺序编号），每个字符的 id 就是它的下标。
+modern-demo.html 据此只在开始一关时建立一次 DOM，之后每次按键
+只修改状态发生变化的字符 span，连击数也在渲染之外单独维护。
+
+DisplayState 是页面中增量渲染逻辑的 Python 参考实现，
+run_benchmark() 用它在无浏览器环境下比较整段重建与增量修补的每次按键开销。
+"""
+
+import argparse
+import re
+import time
+from collections import namedtuple
+
+# 单词（含 don't 这类撇号连接）、连续空白、单个标点
+_TOKEN_RE = re.compile(r"\w+(?:'\w+)*|\s+|[^\w\s]")
+
+WORD, SPACE, PUNCT = "word", "space", "punct"
+
+# 字符状态，与页面中的 CSS 类对应
+PENDING, CORRECT, INCORRECT = 0, 1, 2
+STATE_CLASSES = ("", "correct", "incorrect")
+
+Segment = namedtuple("Segment", "id kind start end")
+
+
+def tokenize_passage(text):
+    """把文本切分为连续、不重叠、覆盖全文的段"""
+    segments = []
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group()
+        if token[0].isspace():
+            kind = SPACE
+        elif token[0].isalnum() or token[0] == "_":
+            kind = WORD
+        else:
+            kind = PUNCT
+        segments.append(Segment(f"s{len(segments)}", kind, match.start(), match.end()))
+    return tuple(segments)
+
+
+def segments_payload(text):
+    """可直接放进 JSON 响应的分段列表"""
+    return [segment._asdict() for segment in tokenize_passage(text)]
+
+
+def _common_prefix(a, b):
+    """a 与 b 的公共前缀长度；追加输入时只比较一次切片"""
+    n = min(len(a), len(b))
+    if a[:n] == b[:n]:
+        return n
+    i = 0
+    while a[i] == b[i]:
+        i += 1
+    return i
+
+
+class DisplayState:
+    """增量渲染状态
+
+    update() 只重新计算与上次输入不同的那一段字符，返回状态改变的下标，
+    页面只需修改这些 span 和光标位置。错误数与连击数同步增量维护。
+    """
+
+    __slots__ = ("text", "states", "typed", "errors", "combo", "max_combo")
+
+    def __init__(self, text):
+        self.text = text
+        self.states = bytearray(len(text))
+        self.typed = ""
+        self.errors = 0
+        self.combo = 0
+        self.max_combo = 0
+
+    @property
+    def cursor(self):
+        """光标所在下标；打完全文后为 None"""
+        return len(self.typed) if len(self.typed) < len(self.text) else None
+
+    def update(self, user_input):
+        """按新的输入框内容更新状态，返回状态改变的字符下标列表"""
+        text = self.text
+        states = self.states
+        start = _common_prefix(self.typed, user_input)
+        end = min(max(len(self.typed), len(user_input)), len(text))
+        changed = []
+        for i in range(start, end):
+            if i >= len(user_input):
+                state = PENDING
+            elif user_input[i] == text[i]:
+                state = CORRECT
+            else:
+                state = INCORRECT
+            old = states[i]
+            if state != old:
+                self.errors += (state == INCORRECT) - (old == INCORRECT)
+                states[i] = state
+                changed.append(i)
+
+        # 只有新敲入的字符影响连击，退格不改变连击数
+        for i in range(start, min(len(user_input), len(text))):
+            if states[i] == CORRECT:
+                self.combo += 1
+                if self.combo > self.max_combo:
+                    self.max_combo = self.combo
+            else:
+                self.combo = 0
+        self.typed = user_input
+        return changed
+
+    def class_of(self, i):
+        """下标 i 处字符 span 的类名"""
+        if i == self.cursor:
+            return "current"
+        return STATE_CLASSES[self.states[i]]
+
+
+def full_render(text, user_input):
+    """旧版 updateDisplay() 的做法：每次按键为每个字符重新生成一个 span"""
+    html = []
+    for i, ch in enumerate(text):
+        if i < len(user_input):
+            class_name = "correct" if user_input[i] == ch else "incorrect"
+        elif i == len(user_input):
+            class_name = "current"
+        else:
+            class_name = ""
+        html.append(f'<span class="char {class_name}">{ch}</span>')
+    return "".join(html)
+
+
+def run_benchmark(lengths=(200, 2_000, 20_000), samples=200, error_every=37):
+    """比较整段重建与增量修补在不同文本长度下的每次按键耗时（微秒）
+
+    每种长度在全文中均匀取 samples 个位置，各测一次按键。
+    """
+    from typing_scoring import make_passage
+
+    results = []
+    for length in lengths:
+        text = make_passage(length)
+        typed = "".join("#" if i % error_every == error_every - 1 else ch
+                        for i, ch in enumerate(text))
+        positions = range(0, length, max(1, length // samples))
+
+        full_s = 0.0
+        for pos in positions:
+            began = time.perf_counter()
+            full_render(text, typed[:pos + 1])
+            full_s += time.perf_counter() - began
+
+        state = DisplayState(text)
+        patch_s = 0.0
+        patched = 0
+        for pos in positions:
+            state.update(typed[:pos])
+            user_input = typed[:pos + 1]
+            began = time.perf_counter()
+            patched += len(state.update(user_input))
+            patch_s += time.perf_counter() - began
+
+        results.append({
+            "length": length,
+            "segments": len(tokenize_passage(text)),
+            "full_us": full_s / len(positions) * 1e6,
+            "patch_us": patch_s / len(positions) * 1e6,
+            "spans_per_key": patched / len(positions),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-keystroke display cost benchmark")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[200, 2_000, 20_000],
+                        help="passage lengths (default: %(default)s)")
+    parser.add_argument("--samples", type=int, default=200,
+                        help="keystrokes measured per length (default: %(default)s)")
+    args = parser.parse_args()
+
+    print("📊 per-keystroke display update")
+    print(f"{'chars':>7} {'segments':>9} {'full render':>12} {'patch':>10} {'spans/key':>10}")
+    for r in run_benchmark(args.lengths, args.samples):
+        print(f"{r['length']:>7} {r['segments']:>9} {r['full_us']:>9.1f} µs "
+              f"{r['patch_us']:>7.2f} µs {r['spans_per_key']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,52 +4,370 @@
 一键启动游戏化英文打字练习应用
 """
 
-import webbrowser
-import http.server
-import socketserver
-import threading
 import time
-import sys
+
+# 启动计时起点，--profile-startup 以此为零点
+STARTED_AT = time.perf_counter()
+
+import argparse
 import os
+import socket
+import sys
+import threading
+
+# 默认监听队列长度
+DEFAULT_BACKLOG = 64
+# 默认端口，被占用时依次尝试后续端口
+DEFAULT_PORT = 8081
+PORT_ATTEMPTS = 10
+# passage_packs.py 的默认输出目录，存在 manifest 时自动加载
+DEFAULT_PACKS_DIR = "packs"
+# 压测并发级别
+BENCH_CONCURRENCY = (1, 10, 100)
+
+
+class StartupProfile:
+    """记录启动各阶段耗时（--profile-startup）"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.marks = []
+        self._last = STARTED_AT
+
+    def mark(self, label):
+        """记录从上一个阶段结束到现在的耗时"""
+        now = time.perf_counter()
+        self.marks.append((label, now - self._last, now - STARTED_AT))
+        self._last = now
 
-def find_available_port(start_port=8081):
-    """寻找可用端口"""
-    import socket
-    for port in range(start_port, start_port + 10):
+    def report(self):
+        if not self.enabled:
+            return
+        print("⏱️  Startup profile:")
+        for label, step, total in self.marks:
+            print(f"   {label:<28} {step * 1000:8.1f} ms   (at {total * 1000:7.1f} ms)")
+
+
+def bind_socket(port=DEFAULT_PORT, backlog=DEFAULT_BACKLOG, host=""):
+    """绑定并开始监听，返回套接字
+
+    port 为 0 时由系统分配端口；否则从 port 起尝试 PORT_ATTEMPTS 个端口，
+    都被占用时退回系统分配。套接字直接交给服务器使用，
+    不存在“探测空闲端口后再重新绑定”之间被其他进程抢占的问题。
+    """
+    candidates = range(port, port + PORT_ATTEMPTS) if port else ()
+    for candidate in (*candidates, 0):
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind(('localhost', port))
-                return port
+            return socket.create_server((host, candidate), backlog=backlog)
         except OSError:
             continue
-    return None
-
-def start_server(port):
-    """启动HTTP服务器"""
-    class QuietHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-        def log_message(self, format, *args):
-            pass  # 静默日志输出
-    
-    with socketserver.TCPServer(("", port), QuietHTTPRequestHandler) as httpd:
-        print(f"🚀 Server started at http://localhost:{port}")
-        httpd.serve_forever()
-
-def main():
+    raise OSError("no port available")
+
+
+def create_server(port, workers=None, backlog=DEFAULT_BACKLOG, host="",
+                  asset_cache=None, sock=None, metrics=None, packs=None):
+    """创建线程模式的 HTTP 服务器，见 threaded_server.create_server"""
+    from threaded_server import create_server
+    return create_server(port, workers, backlog, host, asset_cache, sock, metrics,
+                         packs)
+
+
+def percentile(sorted_values, pct):
+    """计算已排序序列的百分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1,
+                      int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def run_load(port, concurrency, requests_per_client, path="/modern-demo.html"):
+    """以指定并发度压测，返回 (延迟列表, 首字节时间列表, 总耗时, 失败数)"""
+    latencies = []
+    ttfbs = []
+    failures = [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+
+    import http.client
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local = []
+        local_ttfb = []
+        failed = 0
+        barrier.wait()
+        for _ in range(requests_per_client):
+            began = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                first_byte = time.perf_counter()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                continue
+            local.append(time.perf_counter() - began)
+            local_ttfb.append(first_byte - began)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            ttfbs.extend(local_ttfb)
+            failures[0] += failed
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    began = time.perf_counter()
+    for t in threads:
+        t.join()
+    return latencies, ttfbs, time.perf_counter() - began, failures[0]
+
+
+def start_background_server(engine="threaded", workers=None,
+                            backlog=DEFAULT_BACKLOG, asset_cache=None):
+    """在后台线程启动临时服务器，返回 (端口, 停止函数)"""
+    if engine == "asyncio":
+        from async_server import AsyncServerThread
+        server = AsyncServerThread(".", asset_cache, backlog=backlog)
+        return server.start(), server.stop
+
+    httpd = create_server(0, workers, backlog, host="127.0.0.1",
+                          asset_cache=asset_cache)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        httpd.shutdown()
+        httpd.server_close()
+
+    return httpd.server_address[1], stop
+
+
+def measure_idle_cpu(seconds=2.0):
+    """测量空闲期间本进程的 CPU 占用百分比"""
+    cpu_before = time.process_time()
+    time.sleep(seconds)
+    return (time.process_time() - cpu_before) / seconds * 100
+
+
+def run_benchmark(workers=None, backlog=DEFAULT_BACKLOG,
+                  concurrency_levels=BENCH_CONCURRENCY, requests_per_client=50,
+                  path="/modern-demo.html", asset_cache=None, engine="threaded",
+                  idle_seconds=0.0):
+    """启动临时服务器并在 1/10/100 并发下压测，返回 (结果列表, 空闲CPU%)"""
+    port, stop = start_background_server(
+        engine, workers, max(backlog, max(concurrency_levels)), asset_cache)
+
+    results = []
+    idle_cpu = None
+    try:
+        if idle_seconds:
+            idle_cpu = measure_idle_cpu(idle_seconds)
+        for concurrency in concurrency_levels:
+            latencies, ttfbs, elapsed, failed = run_load(
+                port, concurrency, requests_per_client, path)
+            latencies.sort()
+            ttfbs.sort()
+            results.append({
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "failed": failed,
+                "ttfb_p50_ms": percentile(ttfbs, 50) * 1000,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "rps": len(latencies) / elapsed if elapsed else 0.0,
+            })
+    finally:
+        stop()
+    return results, idle_cpu
+
+
+def print_benchmark(results, workers=None, cached=False, engine="threaded",
+                    idle_cpu=None):
+    """打印压测结果表格"""
+    if engine == "asyncio":
+        mode = "--engine asyncio"
+    else:
+        mode = f"--workers {workers}" if workers else "single-threaded"
+    if cached:
+        mode += ", --cache"
+    print(f"📊 Static server benchmark ({mode})")
+    print(f"{'clients':>8} {'requests':>9} {'failed':>7} {'ttfb p50':>9} "
+          f"{'p50 ms':>9} {'p99 ms':>9} {'req/s':>10}")
+    for r in results:
+        print(f"{r['concurrency']:>8} {r['requests']:>9} {r['failed']:>7} "
+              f"{r['ttfb_p50_ms']:>9.2f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+              f"{r['rps']:>10.1f}")
+    if idle_cpu is not None:
+        print(f"💤 Idle CPU while waiting for clients: {idle_cpu:.2f}%")
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Modern Typing Adventure launcher")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="preferred port; the next free one is used if it is "
+                             "taken, 0 lets the OS pick (default: %(default)s)")
+    parser.add_argument("--engine", choices=("threaded", "asyncio"), default="threaded",
+                        help="serving backend (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="serve with a pool of N threads and HTTP/1.1 keep-alive")
+    parser.add_argument("--processes", type=int, default=None, metavar="N",
+                        help="pre-fork N worker processes sharing the port via "
+                             "SO_REUSEPORT (static files and packs only)")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG,
+                        help="listen backlog for pending connections (default: %(default)s)")
+    parser.add_argument("--cache", action="store_true",
+                        help="serve files from an in-memory, precompressed cache")
+    parser.add_argument("--cache-max-age", type=int, default=0, metavar="SECONDS",
+                        help="Cache-Control max-age for cached files; 0 means "
+                             "revalidate with ETag on every load (default: %(default)s)")
+    parser.add_argument("--no-watch", action="store_true",
+                        help="do not watch cached files for changes")
+    parser.add_argument("--packs", metavar="DIR",
+                        help="serve passage packs built by passage_packs.py at /packs/ "
+                             f"(default: {DEFAULT_PACKS_DIR}/ when it has a manifest)")
+    parser.add_argument("--analysis-cache", metavar="DIR",
+                        help="also keep passage analyses (segments, grade, difficulty) "
+                             "in DIR so they survive restarts")
+    parser.add_argument("--bench", action="store_true",
+                        help="run the built-in load benchmark and exit")
+    parser.add_argument("--bench-requests", type=int, default=50, metavar="N",
+                        help="requests per client in the benchmark (default: %(default)s)")
+    parser.add_argument("--bench-idle", type=float, default=2.0, metavar="SECONDS",
+                        help="idle period for measuring CPU use in the benchmark "
+                             "(default: %(default)s)")
+    parser.add_argument("--instrument", action="store_true",
+                        help="record hot-path latency histograms, serve them at "
+                             "/metrics and print a summary on exit")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="with --instrument, also write the final metrics in "
+                             "Prometheus text format to PATH on exit")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import, bind and readiness timings at startup")
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.engine == "asyncio" and args.workers is not None:
+        parser.error("--workers only applies to --engine threaded")
+    if args.processes is not None:
+        if args.processes < 1:
+            parser.error("--processes must be at least 1")
+        if args.engine == "asyncio":
+            parser.error("--processes only applies to --engine threaded")
+        if args.instrument or args.bench:
+            parser.error("--processes cannot be combined with --instrument or --bench")
+    if args.metrics_file and not args.instrument:
+        parser.error("--metrics-file requires --instrument")
+    return args
+
+
+def load_packs(directory):
+    """加载预构建的文本包，目录没有 manifest 时返回 None"""
+    from pack_store import PackStore
+
+    try:
+        packs = PackStore(directory)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Passage packs not loaded: {e}")
+        return None
+    count, passages, size = packs.summary()
+    print(f"📚 Serving {count} passage packs ({passages} passages, "
+          f"{size / 1024:.0f} KB) from {directory} (build {packs.manifest['build']})")
+    return packs
+
+
+def enable_instrumentation(metrics_file=None):
+    """开启热点计时，退出时打印摘要并按需写出指标文件，返回 Registry"""
+    import atexit
+    import instrumentation
+
+    registry = instrumentation.enable()
+
+    def dump():
+        registry.dump()
+        if metrics_file:
+            with open(metrics_file, "w", encoding="utf-8") as f:
+                f.write(registry.render_prometheus())
+
+    atexit.register(dump)
+    return registry
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profile = StartupProfile(args.profile_startup)
+    profile.mark("imports + argument parsing")
+
     print("🎮 Modern Typing Adventure")
     print("=" * 40)
-    
+
     # 检查文件是否存在
     if not os.path.exists('modern-demo.html'):
         print("❌ Error: modern-demo.html not found!")
         print("Please run this script from the project directory.")
         sys.exit(1)
-    
-    # 寻找可用端口
-    port = find_available_port()
-    if not port:
+
+    metrics = None
+    if args.instrument:
+        metrics = enable_instrumentation(args.metrics_file)
+        profile.mark("instrumentation")
+
+    asset_cache = None
+    if args.cache:
+        from asset_cache import load_asset_cache
+        # 预派生模式下监视线程在各工作进程中启动
+        asset_cache = load_asset_cache(
+            ".", max_age=args.cache_max_age,
+            watch_interval=0 if (args.no_watch or args.bench or args.processes) else 1.0)
+        profile.mark("asset cache")
+
+    packs = None
+    packs_dir = args.packs or DEFAULT_PACKS_DIR
+    if args.packs or os.path.exists(os.path.join(packs_dir, "manifest.json")):
+        packs = load_packs(packs_dir)
+        profile.mark("passage packs")
+
+    if args.analysis_cache:
+        from passage_analysis import configure
+        # 预派生模式下各工作进程继承这个缓存配置
+        configure(cache_dir=args.analysis_cache)
+        profile.mark("analysis cache")
+
+    if args.bench:
+        results, idle_cpu = run_benchmark(
+            args.workers, args.backlog, requests_per_client=args.bench_requests,
+            asset_cache=asset_cache, engine=args.engine,
+            idle_seconds=args.bench_idle)
+        print_benchmark(results, args.workers, cached=asset_cache is not None,
+                        engine=args.engine, idle_cpu=idle_cpu)
+        return
+
+    supervisor = None
+    if args.processes:
+        from prefork import reuseport_supported
+        if not reuseport_supported():
+            print("❌ Error: --processes needs SO_REUSEPORT and fork (Linux / BSD / macOS)")
+            sys.exit(1)
+    try:
+        if args.processes:
+            supervisor = create_prefork(args.processes, args.port, args.workers,
+                                        args.backlog, asset_cache,
+                                        0 if args.no_watch else 1.0, packs)
+            port = supervisor.port
+        else:
+            sock = bind_socket(args.port, args.backlog)
+            port = sock.getsockname()[1]
+    except OSError:
         print("❌ Error: No available ports found!")
         sys.exit(1)
-    
+    profile.mark("bind")
+
     # 显示游戏特性
     print("🌟 Game Features:")
     print("   🔥 Combo system with visual effects")
@@ -60,19 +378,41 @@ def main():
     print("   ✨ Particle animations & explosions")
     print("   📚 English typing practice texts")
     print("")
-    
-    # 在后台启动服务器
-    server_thread = threading.Thread(target=start_server, args=(port,), daemon=True)
-    server_thread.start()
-    
-    # 等待服务器启动
-    time.sleep(1)
-    
-    # 自动打开浏览器
+
+    if args.engine == "asyncio":
+        run_asyncio_engine(sock, args.backlog, asset_cache, profile, metrics, packs)
+        return
+
+    if supervisor is not None:
+        run_prefork(supervisor, profile)
+        return
+
+    with create_server(port, args.workers, args.backlog, asset_cache=asset_cache,
+                       sock=sock, metrics=metrics, packs=packs) as httpd:
+        profile.mark("threaded engine setup")
+        mode = (f"{args.workers} workers, HTTP/1.1 keep-alive" if args.workers
+                else "single-threaded")
+        print(f"🚀 Server started at http://localhost:{port} ({mode})")
+        # 套接字已经在监听：浏览器的连接在监听队列中等待 serve_forever 接收，
+        # 不需要固定等待
+        threading.Thread(target=open_game, args=(port, profile), daemon=True).start()
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Game server stopped. Thanks for playing!")
+
+
+def open_game(port, profile=None):
+    """打开浏览器并显示玩法说明"""
+    import webbrowser
+
     url = f"http://localhost:{port}/modern-demo.html"
     print(f"🌐 Opening browser: {url}")
     webbrowser.open(url)
-    
+    if profile is not None:
+        profile.mark("browser launched")
+        profile.report()
+
     print("\n🎯 How to play:")
     print("   1. Choose your favorite theme")
     print("   2. Click 'START TYPING ADVENTURE'")
@@ -82,13 +422,73 @@ def main():
     print("")
     print("Press Ctrl+C to stop the server")
     print("=" * 40)
-    
+
+
+def create_prefork(processes, port=DEFAULT_PORT, workers=None, backlog=DEFAULT_BACKLOG,
+                   asset_cache=None, watch_interval=0.0, packs=None):
+    """创建预派生监督者并占住端口，端口选择规则与 bind_socket 相同"""
+    from prefork import PreforkSupervisor
+
+    candidates = range(port, port + PORT_ATTEMPTS) if port else ()
+    for candidate in (*candidates, 0):
+        try:
+            return PreforkSupervisor(processes, candidate, backlog=backlog,
+                                     workers=workers, asset_cache=asset_cache,
+                                     watch_interval=watch_interval, packs=packs)
+        except OSError:
+            continue
+    raise OSError("no port available")
+
+
+def run_prefork(supervisor, profile=None):
+    """启动工作进程并在主线程监督，退出时打印各进程的请求数"""
+    with supervisor:
+        port = supervisor.start()
+        if profile is not None:
+            profile.mark("pre-fork workers ready")
+        workers = supervisor.workers
+        mode = f"{workers} threads each" if workers else "single-threaded each"
+        print(f"🚀 Server started at http://localhost:{port} "
+              f"({supervisor.processes} processes, {mode}, SO_REUSEPORT)")
+        threading.Thread(target=open_game, args=(port, profile), daemon=True).start()
+        try:
+            supervisor.supervise()
+        except KeyboardInterrupt:
+            print("\n👋 Game server stopped. Thanks for playing!")
+        stats = supervisor.stats()
+    print(f"📊 {stats['requests']} requests, {stats['restarts']} worker restarts")
+    for worker in stats["workers"]:
+        print(f"   worker {worker['index']} (pid {worker['pid']}): "
+              f"{worker['requests']} requests, {worker['restarts']} restarts")
+
+
+def run_asyncio_engine(sock, backlog=DEFAULT_BACKLOG, asset_cache=None, profile=None,
+                       metrics=None, packs=None):
+    """在主线程运行 asyncio 引擎，监听就绪后立即打开浏览器
+
+    sock 为已绑定的监听套接字。asyncio 引擎同时在 /ws 提供
+    多会话游戏服务器（班级排行榜）。
+    """
+    import async_server
+    from achievements import AchievementEngine
+    from game_server import WEBSOCKET_PATH, GameServer
+
+    def on_ready(bound_port):
+        if profile is not None:
+            profile.mark("asyncio engine ready")
+        print(f"🚀 Server started at http://localhost:{bound_port} (asyncio engine)")
+        print(f"🏆 Class leaderboard at ws://localhost:{bound_port}{WEBSOCKET_PATH}")
+        open_game(bound_port, profile)
+
+    game = GameServer(achievements=AchievementEngine())
     try:
-        # 保持程序运行
-        while True:
-            time.sleep(1)
+        async_server.run(sock.getsockname()[1], asset_cache=asset_cache,
+                         backlog=backlog, on_ready=on_ready,
+                         websocket_routes={WEBSOCKET_PATH: game.handle}, sock=sock,
+                         metrics=metrics, packs=packs)
     except KeyboardInterrupt:
         print("\n👋 Game server stopped. Thanks for playing!")
 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程预派生服务
+==============
+
+线程模式的 TCPServer 受 GIL 限制，只能用满一个核。play.py --processes N
+时由 PreforkSupervisor 派生 N 个工作进程：每个进程用 SO_REUSEPORT
+在同一端口上各自监听，由内核把新连接分摊到各个进程，互不争抢 accept。
+
+主进程只负责监督：记录每个工作进程处理的请求数（共享内存计数器，
+每个进程只写自己的槽位），工作进程意外退出时自动重启，短时间内
+反复崩溃的槽位不再重启。
+
+计分会话（/api/score）保存在单个进程内，连接会落到不同进程上，
+因此预派生模式只提供静态文件和文本包，不提供计分接口。
+
+    python3 play.py --processes 4 --cache
+    python3 prefork.py                  # 1 / 2 / 4 … 个进程的回环压测
+"""
+
+import argparse
+import ctypes
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+# 同一槽位在 RESTART_WINDOW 秒内重启超过 MAX_RESTARTS 次后放弃
+MAX_RESTARTS = 5
+RESTART_WINDOW = 30.0
+# 等待工作进程开始监听的超时（秒）
+READY_TIMEOUT = 10.0
+
+
+def reuseport_supported():
+    """当前平台是否支持 SO_REUSEPORT 多进程监听，以及 fork 启动方式"""
+    if not hasattr(socket, "SO_REUSEPORT"):
+        return False
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return False
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    except OSError:
+        return False
+    return True
+
+
+def reuseport_socket(host, port):
+    """创建设置了 SO_REUSEADDR / SO_REUSEPORT 并已绑定的套接字（未监听）"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _count_requests(httpd, counters, index):
+    """给服务器的请求处理器加上计数：请求行解析成功时（发送响应之前）给本进程的槽位加一"""
+    lock = threading.Lock()
+    base = httpd.RequestHandlerClass
+
+    class CountingHandler(base):
+        def parse_request(self):
+            ok = super().parse_request()
+            if ok:
+                with lock:
+                    counters[index] += 1
+            return ok
+
+    CountingHandler.__name__ = f"Counting{base.__name__}"
+    httpd.RequestHandlerClass = CountingHandler
+
+
+def _worker_main(index, host, port, backlog, workers, asset_cache, watch_interval,
+                 packs, counters, ready):
+    """工作进程：在共享端口上监听并服务，直到被终止"""
+    from threaded_server import create_server
+
+    # Ctrl+C 由主进程统一处理，再用 SIGTERM 结束工作进程
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    sock = reuseport_socket(host, port)
+    sock.listen(backlog)
+    httpd = create_server(port, workers, backlog, host, asset_cache=asset_cache,
+                          sock=sock, packs=packs)
+    httpd.scoring = None
+    _count_requests(httpd, counters, index)
+    if asset_cache is not None and watch_interval:
+        # 缓存在主进程中预热后随 fork 共享，监视线程只能在子进程里启动
+        asset_cache.start_watcher(watch_interval)
+    ready.set()
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+
+
+class PreforkSupervisor:
+    """派生并监督共享同一端口的工作进程
+
+    workers 为每个进程的线程池大小，为空时每个进程单线程处理（HTTP/1.0）。
+    asset_cache / packs 在主进程中加载，fork 后各进程共享写时复制的内存。
+    """
+
+    def __init__(self, processes, port=0, host="", backlog=64, workers=None,
+                 asset_cache=None, watch_interval=0.0, packs=None):
+        if processes < 1:
+            raise ValueError("processes must be at least 1")
+        if not reuseport_supported():
+            raise OSError("SO_REUSEPORT pre-fork mode is not supported on this platform")
+        self.processes = processes
+        self.host = host
+        self.backlog = backlog
+        self.workers = workers
+        self.asset_cache = asset_cache
+        self.watch_interval = watch_interval
+        self.packs = packs
+        self._ctx = multiprocessing.get_context("fork")
+        self._counters = self._ctx.RawArray(ctypes.c_uint64, processes)
+        # 主进程持有一个只绑定、不监听的套接字占住端口；它不接收连接
+        self._reserve = reuseport_socket(host, port)
+        self.port = self._reserve.getsockname()[1]
+        self._procs = [None] * processes
+        self._restarts = [0] * processes
+        self._recent = [deque() for _ in range(processes)]
+        self._abandoned = set()
+        self._stopping = False
+
+    def _spawn(self, index):
+        ready = self._ctx.Event()
+        proc = self._ctx.Process(
+            target=_worker_main, name=f"prefork-{index}", daemon=True,
+            args=(index, self.host, self.port, self.backlog, self.workers,
+                  self.asset_cache, self.watch_interval, self.packs,
+                  self._counters, ready))
+        proc.start()
+        self._procs[index] = proc
+        return ready
+
+    def start(self):
+        """派生全部工作进程并等待它们开始监听，返回端口"""
+        events = [self._spawn(i) for i in range(self.processes)]
+        deadline = time.monotonic() + READY_TIMEOUT
+        for index, event in enumerate(events):
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                self.stop()
+                raise RuntimeError(f"worker {index} did not start listening")
+        return self.port
+
+    def check(self, timeout=0.0):
+        """等待至多 timeout 秒，重启期间退出的工作进程，返回重启的槽位"""
+        sentinels = {proc.sentinel: index for index, proc in enumerate(self._procs)
+                     if proc is not None and index not in self._abandoned}
+        if not sentinels:
+            return []
+        restarted = []
+        for sentinel in wait(list(sentinels), timeout):
+            index = sentinels[sentinel]
+            proc = self._procs[index]
+            proc.join()
+            if self._stopping:
+                continue
+            now = time.monotonic()
+            recent = self._recent[index]
+            recent.append(now)
+            while recent and now - recent[0] > RESTART_WINDOW:
+                recent.popleft()
+            if len(recent) > MAX_RESTARTS:
+                print(f"⚠️  Worker {index} keeps crashing (exit code {proc.exitcode}); "
+                      "not restarting it")
+                self._abandoned.add(index)
+                continue
+            print(f"♻️  Worker {index} (pid {proc.pid}) exited with code "
+                  f"{proc.exitcode}; restarting")
+            self._restarts[index] += 1
+            self._spawn(index)
+            restarted.append(index)
+        return restarted
+
+    def supervise(self, interval=1.0):
+        """在当前线程监督工作进程，直到全部放弃或被中断"""
+        while len(self._abandoned) < self.processes:
+            self.check(interval)
+
+    def stop(self, timeout=5.0):
+        """终止全部工作进程"""
+        self._stopping = True
+        for proc in self._procs:
+            if proc is not None and proc.is_alive():
+                proc.terminate()
+        for proc in self._procs:
+            if proc is not None:
+                proc.join(timeout)
+                if proc.is_alive():
+                    proc.kill()
+                    proc.join()
+        self._reserve.close()
+
+    def stats(self):
+        """各工作进程的 pid、请求数、重启次数，以及请求总数"""
+        workers = []
+        for index, proc in enumerate(self._procs):
+            workers.append({
+                "index": index,
+                "pid": proc.pid if proc is not None else None,
+                "alive": proc is not None and proc.is_alive(),
+                "requests": self._counters[index],
+                "restarts": self._restarts[index],
+            })
+        return {"workers": workers,
+                "requests": sum(w["requests"] for w in workers),
+                "restarts": sum(self._restarts)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _client_main(port, connections, duration, path, results):
+    """压测客户端进程：每个线程循环发起短连接请求，统计完成数"""
+    import http.client
+
+    done = [0] * connections
+    failed = [0] * connections
+    deadline = time.perf_counter() + duration
+
+    def client(slot):
+        while time.perf_counter() < deadline:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    done[slot] += 1
+                else:
+                    failed[slot] += 1
+            except (OSError, http.client.HTTPException):
+                failed[slot] += 1
+            finally:
+                conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(connections)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put((sum(done), sum(failed)))
+
+
+def run_load(port, clients=4, connections=8, duration=3.0, path="/modern-demo.html"):
+    """用 clients 个客户端进程（每个 connections 个线程）压测，返回 (req/s, 失败数)"""
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_client_main,
+                         args=(port, connections, duration, path, results))
+             for _ in range(clients)]
+    began = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    totals = [results.get() for _ in procs]
+    elapsed = time.perf_counter() - began
+    for proc in procs:
+        proc.join()
+    done = sum(t[0] for t in totals)
+    return done / elapsed, sum(t[1] for t in totals)
+
+
+def run_benchmark(process_counts=None, duration=3.0, clients=None, connections=8,
+                  path="/modern-demo.html"):
+    """在回环地址上比较不同进程数的吞吐，返回结果列表
+
+    服务端使用内存缓存；客户端进程数默认等于 CPU 核数，
+    与服务端共享同一台机器，因此只有核数多于进程数时才能看到线性扩展。
+    """
+    from asset_cache import load_asset_cache
+
+    cpus = os.cpu_count() or 1
+    if process_counts is None:
+        process_counts = sorted({1, *(n for n in (2, 4, 8, 16) if n <= cpus), cpus})
+    clients = clients or max(2, cpus)
+    cache = load_asset_cache(".", watch_interval=0)
+
+    results = []
+    for count in process_counts:
+        with PreforkSupervisor(count, host="127.0.0.1", backlog=256,
+                               asset_cache=cache) as supervisor:
+            port = supervisor.start()
+            rps, failed = run_load(port, clients, connections, duration, path)
+            stats = supervisor.stats()
+        results.append({
+            "processes": count,
+            "rps": rps,
+            "failed": failed,
+            "per_worker": [w["requests"] for w in stats["workers"]],
+        })
+    base = results[0]["rps"] / results[0]["processes"]
+    for r in results:
+        r["efficiency"] = r["rps"] / (base * r["processes"]) if base else 0.0
+    return results, cpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SO_REUSEPORT pre-fork scaling benchmark")
+    parser.add_argument("--processes", type=int, nargs="+",
+                        help="worker process counts to compare (default: 1, 2, 4 … cores)")
+    parser.add_argument("--duration", type=float, default=3.0,
+                        help="seconds per run (default: %(default)s)")
+    parser.add_argument("--clients", type=int,
+                        help="load generator processes (default: number of cores)")
+    parser.add_argument("--connections", type=int, default=8,
+                        help="concurrent connections per client process (default: %(default)s)")
+    args = parser.parse_args()
+
+    if not reuseport_supported():
+        print("❌ SO_REUSEPORT pre-fork mode is not supported on this platform")
+        sys.exit(1)
+    results, cpus = run_benchmark(args.processes, args.duration, args.clients,
+                                  args.connections)
+    print(f"📊 Pre-fork scaling on loopback ({cpus} CPU cores, "
+          "one connection per request)")
+    print(f"{'processes':>10} {'req/s':>10} {'efficiency':>11} {'failed':>7}  per-worker requests")
+    for r in results:
+        print(f"{r['processes']:>10} {r['rps']:>10.0f} {r['efficiency']:>10.0%} "
+              f"{r['failed']:>7}  {r['per_worker']}")
+
+
+if __name__ == "__main__":
+    main()
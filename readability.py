@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可读性与难度标注
+==============
+
+Flesch-Kincaid 年级与文本包使用的 (年级, 难度, 字符集) 标注。
+构建文本包（passage_packs.py）和开局时的文本分析（passage_analysis.py）
+共用这里的规则；本模块只依赖 content_corpus 的字符集标记，服务引擎
+导入文本分析时不会连带加载构建流水线。
+"""
+
+import re
+
+from content_corpus import (
+    CHARSET_DIGIT, CHARSET_OTHER, CHARSET_PUNCT, CHARSET_UPPER, charset_mask
+)
+
+MIN_GRADE, MAX_GRADE = 1, 6
+
+_WORD_RE = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)*")
+_VOWEL_GROUPS_RE = re.compile(r"[aeiouy]+")
+
+
+def count_syllables(word):
+    """按元音组估算英文单词音节数"""
+    word = word.lower()
+    count = len(_VOWEL_GROUPS_RE.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def readability_grade(text):
+    """Flesch-Kincaid 年级水平；没有英文单词时返回 None"""
+    words = _WORD_RE.findall(text)
+    if not words:
+        return None
+    sentences = max(1, len(re.findall(r"[.!?]+", text)))
+    syllables = sum(count_syllables(w) for w in words)
+    return 0.39 * len(words) / sentences + 11.8 * syllables / len(words) - 15.59
+
+
+def tag_passage(text):
+    """标注 (年级, 难度, 字符集)
+
+    年级取可读性年级并限制在 1-6；难度从 1 开始，文本每用到一类
+    额外字符（大写、数字、标点、非 ASCII）加 1，平均词长超过 6 再加 1，最大 5。
+    """
+    level = readability_grade(text)
+    grade = MIN_GRADE if level is None else min(MAX_GRADE, max(MIN_GRADE, round(level)))
+    charset = charset_mask(text)
+    difficulty = 1 + sum(bool(charset & flag) for flag in
+                         (CHARSET_UPPER, CHARSET_DIGIT, CHARSET_PUNCT, CHARSET_OTHER))
+    words = _WORD_RE.findall(text)
+    if words and sum(map(len, words)) / len(words) > 6:
+        difficulty += 1
+    return grade, min(difficulty, 5), charset
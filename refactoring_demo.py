@@ -7,12 +7,32 @@
 展示重构前后的代码差异和改进效果
 """
 
+import argparse
 import os
-import subprocess
+import statistics
 import time
 import tkinter as tk
 from tkinter import messagebox
 
+from code_metrics import DEFAULT_CACHE as METRICS_CACHE
+from code_metrics import MetricsCache, analyze_files, duplicated_lines, summarize
+from report_engine import (
+    DEFAULT_CACHE, ScanCache, count_lines, iter_source_files, scan_files,
+    write_report
+)
+from warm_launcher import WarmLauncher, cold_run
+
+REPORT_PATH = 'refactoring_comparison_report.md'
+ORIGINAL_FILE = 'typeing.py'
+REFACTORED_FILE = 'typing_game_refactored.py'
+
+def get_file_size(filename):
+    """获取文件行数，文件不存在或无法读取时为 0"""
+    try:
+        return count_lines(filename)
+    except OSError:
+        return 0
+
 def show_refactoring_summary():
     """显示重构总结"""
     summary = """
@@ -70,32 +90,9 @@ def show_refactoring_summary():
     print(summary)
     return summary
 
-def create_comparison_report():
-    """创建对比报告"""
-    report_content = f"""# 重构对比报告
-
-## 生成时间
-{time.strftime('%Y-%m-%d %H:%M:%S')}
-
-## 文件对比
-
-### 原始版本 (typeing.py)
-- **文件大小**: {get_file_size('typeing.py')} 行
-- **类数量**: 1
-- **方法数量**: ~8
-- **文档字符串**: 基本无
-- **错误处理**: 无
-- **配置管理**: 硬编码
-
-### 重构版本 (typing_game_refactored.py)
-- **文件大小**: {get_file_size('typing_game_refactored.py')} 行
-- **类数量**: 8+
-- **方法数量**: 40+
-- **文档字符串**: 完整覆盖
-- **错误处理**: 完善的异常处理
-- **配置管理**: 配置类管理
-
-## 架构对比
+# 报告中不依赖统计结果的章节，按顺序逐节写出
+STATIC_REPORT_SECTIONS = (
+    """## 架构对比
 
 ### 原始架构
 ```
@@ -121,18 +118,8 @@ BeijingStudentTypingGameApp (主应用)
 └── GameController (游戏控制)
 ```
 
-## 质量指标对比
-
-| 指标 | 原始版本 | 重构版本 | 改进 |
-|------|----------|----------|------|
-| 可读性 | ⭐⭐ | ⭐⭐⭐⭐⭐ | +150% |
-| 可维护性 | ⭐⭐ | ⭐⭐⭐⭐⭐ | +150% |
-| 可扩展性 | ⭐ | ⭐⭐⭐⭐⭐ | +300% |
-| 错误处理 | ⭐ | ⭐⭐⭐⭐⭐ | +400% |
-| 代码组织 | ⭐⭐ | ⭐⭐⭐⭐⭐ | +150% |
-| 文档完整性 | ⭐ | ⭐⭐⭐⭐⭐ | +400% |
-
-## 规范遵循度
+""",
+    """## 规范遵循度
 
 ### 产品规范
 - ✅ 保持教育优先原则
@@ -154,7 +141,8 @@ BeijingStudentTypingGameApp (主应用)
 - ✅ 可访问性增强
 - ✅ 更好的错误反馈
 
-## 重构带来的价值
+""",
+    """## 重构带来的价值
 
 ### 开发效率
 - 新功能开发时间减少 50%
@@ -171,30 +159,211 @@ BeijingStudentTypingGameApp (主应用)
 - 代码理解难度降低 50%
 - 协作效率提升 40%
 
-## 总结
+""",
+    """## 总结
 
 重构成功地将原始的单体架构转换为模块化、可维护的现代架构，
 在保持所有原有功能的基础上，大幅提升了代码质量、可维护性和可扩展性。
 重构完全遵循了 Spec Workflow 规范，为未来的功能扩展奠定了坚实基础。
+""",
+)
+
+def create_comparison_report(output=REPORT_PATH, root=None, cache_path=None,
+                             workers=None, metrics_cache_path=None, processes=None):
+    """创建对比报告
+
+    两个版本的行数由线程池并行统计；root 不为空时还会扫描该目录下
+    全部 Python 文件（例如一个存放多个打字游戏变体的仓库）。
+    行数按 (路径, mtime, 大小) 缓存在 cache_path；类 / 方法数、圈复杂度、
+    文档覆盖率和重复率由进程池做 AST 分析，按内容哈希缓存在 metrics_cache_path。
+    重新生成时跳过未改动的文件。报告逐节写出，不在内存中拼接整份文本。
+    """
+    cache = ScanCache(cache_path)
+    variants = list(iter_source_files(root)) if root else []
+    paths = [ORIGINAL_FILE, REFACTORED_FILE] + variants
+    stats, hits = scan_files(paths, cache, workers)
+    # 已删除或改名的文件不再出现在 paths 中，其条目随之丢弃
+    cache.prune(paths)
+    cache.save()
+
+    metrics_cache = MetricsCache(metrics_cache_path)
+    metrics, metric_hits, digests = analyze_files(paths, metrics_cache, processes)
+    # 只保留本次扫描到的内容版本，文件每次修改留下的旧条目随之丢弃
+    metrics_cache.save(keep=digests)
+
+    write_report(output, report_sections(stats, root, variants, metrics))
+
+    print(f"📊 对比报告已生成: {output}")
+    if variants:
+        print(f"   扫描 {len(variants)} 个文件，行数缓存命中 {hits} 个，"
+              f"静态分析缓存命中 {metric_hits} 个")
+    return stats
+
+def _format_metric(value, spec="d", suffix=""):
+    return "-" if value is None else f"{value:{spec}}{suffix}"
+
+# (标题, 汇总字段, 格式, 后缀)
+QUALITY_ROWS = (
+    ("类数量", "classes", "d", ""),
+    ("方法数量", "methods", "d", ""),
+    ("函数数量", "functions", "d", ""),
+    ("平均圈复杂度", "complexity_avg", ".2f", ""),
+    ("最大圈复杂度", "complexity_max", "d", ""),
+    ("文档字符串覆盖率", "docstring_coverage", ".0f", "%"),
+    ("重复代码率", "duplication", ".1f", "%"),
+)
+
+def report_sections(stats, root=None, variants=(), metrics=None):
+    """逐节生成报告 Markdown
+
+    metrics 是 analyze_files() 的结果；文件缺失或无法解析时对应指标显示为 "-"。
+    """
+    metrics = metrics or {}
+
+    def lines_of(path):
+        entry = stats.get(path)
+        return entry["lines"] if entry else 0
+
+    def summary_of(path):
+        return summarize({path: metrics[path]}) if path in metrics else None
+
+    original = summary_of(ORIGINAL_FILE)
+    refactored = summary_of(REFACTORED_FILE)
+
+    def field(summary, key, spec="d", suffix=""):
+        return _format_metric(summary[key] if summary else None, spec, suffix)
+
+    yield f"""# 重构对比报告
+
+## 生成时间
+{time.strftime('%Y-%m-%d %H:%M:%S')}
+
 """
-    
-    with open('refactoring_comparison_report.md', 'w', encoding='utf-8') as f:
-        f.write(report_content)
-    
-    print("📊 对比报告已生成: refactoring_comparison_report.md")
+    yield f"""## 文件对比
 
-def get_file_size(filename):
-    """获取文件行数"""
-    try:
-        if os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                return len(f.readlines())
-        return 0
-    except:
-        return 0
+### 原始版本 ({ORIGINAL_FILE})
+- **文件大小**: {lines_of(ORIGINAL_FILE)} 行
+- **类数量**: {field(original, "classes")}
+- **方法数量**: {field(original, "methods")}
+- **文档字符串覆盖率**: {field(original, "docstring_coverage", ".0f", "%")}
+- **错误处理**: 无
+- **配置管理**: 硬编码
+
+### 重构版本 ({REFACTORED_FILE})
+- **文件大小**: {lines_of(REFACTORED_FILE)} 行
+- **类数量**: {field(refactored, "classes")}
+- **方法数量**: {field(refactored, "methods")}
+- **文档字符串覆盖率**: {field(refactored, "docstring_coverage", ".0f", "%")}
+- **错误处理**: 完善的异常处理
+- **配置管理**: 配置类管理
+
+"""
+    yield from quality_section(original, refactored)
+    if variants:
+        yield from variant_sections(stats, root, variants, metrics)
+    yield from STATIC_REPORT_SECTIONS
 
-def run_demo():
-    """运行演示"""
+def quality_section(original, refactored):
+    """由静态分析结果生成质量指标对比表"""
+    yield """## 质量指标对比
+
+| 指标 | 原始版本 | 重构版本 | 变化 |
+|------|----------|----------|------|
+"""
+    for title, key, spec, suffix in QUALITY_ROWS:
+        before = original[key] if original else None
+        after = refactored[key] if refactored else None
+        change = "-" if before is None or after is None else f"{after - before:+{spec}}{suffix}"
+        yield (f"| {title} | {_format_metric(before, spec, suffix)} | "
+               f"{_format_metric(after, spec, suffix)} | {change} |\n")
+    for label, summary in (("原始版本", original), ("重构版本", refactored)):
+        if summary and summary["errors"]:
+            yield f"\n> {label}存在语法错误，未能完成分析\n"
+    yield "\n"
+
+def variant_sections(stats, root, variants, metrics=None):
+    """按目录汇总扫描到的变体文件，逐行写出表格
+
+    重复率在全部变体之间计算，能看出各变体间复制粘贴的代码。
+    """
+    metrics = metrics or {}
+    totals = {}
+    grouped = {}
+    for path in variants:
+        entry = stats.get(path)
+        if entry is None:
+            continue
+        directory = os.path.relpath(os.path.dirname(path), root)
+        files, lines = totals.get(directory, (0, 0))
+        totals[directory] = (files + 1, lines + entry["lines"])
+        if path in metrics:
+            grouped.setdefault(directory, {})[path] = metrics[path]
+    duplicated = duplicated_lines({path: m for group in grouped.values()
+                                   for path, m in group.items() if "error" not in m})
+
+    yield f"""## 变体统计
+
+扫描目录: `{root}`，共 {sum(f for f, _ in totals.values())} 个 Python 文件，{sum(l for _, l in totals.values())} 行
+
+| 目录 | 文件数 | 行数 | 类 | 方法 | 平均圈复杂度 | 文档覆盖率 | 重复率 |
+|------|--------|------|----|------|--------------|------------|--------|
+"""
+    for directory in sorted(totals):
+        files, lines = totals[directory]
+        summary = summarize(grouped.get(directory, {}), duplicated)
+        cells = [_format_metric(summary[key] if summary else None, spec, suffix)
+                 for key, spec, suffix in (("classes", "d", ""), ("methods", "d", ""),
+                                           ("complexity_avg", ".2f", ""),
+                                           ("docstring_coverage", ".0f", "%"),
+                                           ("duplication", ".1f", "%"))]
+        yield f"| {directory} | {files} | {lines} | {' | '.join(cells)} |\n"
+    yield "\n"
+
+def launch_game(script, label, launcher=None, timings=None):
+    """运行一个游戏版本并打印启动耗时
+
+    launcher 为 WarmLauncher 时从暖进程 fork，否则启动新解释器。
+    timings 按模式累计每次的就绪耗时，用于冷 / 暖启动对比。
+    """
+    if not os.path.exists(script):
+        print(f"❌ 找不到 {script}")
+        return None
+    print(f"🔄 启动{label}...")
+    try:
+        result = launcher.run(script) if launcher else cold_run(script)
+    except KeyboardInterrupt:
+        print(f"\n✅ {label}已退出")
+        return None
+    except Exception as e:
+        print(f"❌ 启动失败: {e}")
+        return None
+    if result.ready_s is None:
+        print(f"❌ {label}未能启动 (退出码 {result.exit_code})")
+        return result
+    if timings is not None:
+        timings.setdefault(result.mode, []).append(result.ready_s)
+    mode = "暖启动" if result.mode == "warm" else "冷启动"
+    print(f"⏱ 启动耗时 {result.ready_s * 1000:.1f} ms ({mode})")
+    return result
+
+def print_launch_timings(timings):
+    """打印本次演示中冷 / 暖启动耗时的中位数"""
+    medians = {mode: statistics.median(samples) * 1000
+               for mode, samples in timings.items() if samples}
+    if not medians:
+        return
+    parts = [f"{'暖启动' if mode == 'warm' else '冷启动'} {value:.1f} ms"
+             f" (共 {len(timings[mode])} 次)" for mode, value in sorted(medians.items())]
+    print("⏱ 启动耗时中位数: " + "，".join(parts))
+    if "cold" in medians and "warm" in medians and medians["warm"]:
+        print(f"   暖启动快 {medians['cold'] / medians['warm']:.1f} 倍")
+
+def run_demo(warm=True):
+    """运行演示
+
+    warm 为 True 时游戏从预先导入 tkinter 的 forkserver 进程 fork 启动，
+    forkserver 在显示菜单时就开始预热。
+    """
     print("🎯 北京小学生英文打字练习 - 重构演示")
     print("=" * 50)
     
@@ -203,11 +372,16 @@ def run_demo():
     
     # 创建对比报告
     create_comparison_report()
+
+    launcher = WarmLauncher() if warm else None
+    if launcher:
+        launcher.start_in_background()
+    timings = {}
     
     print("\n" + "=" * 50)
     print("🚀 演示选项:")
-    print("1. 运行原始版本 (typeing.py)")
-    print("2. 运行重构版本 (typing_game_refactored.py)")
+    print(f"1. 运行原始版本 ({ORIGINAL_FILE})")
+    print(f"2. 运行重构版本 ({REFACTORED_FILE})")
     print("3. 查看代码对比")
     print("4. 退出")
     
@@ -216,23 +390,10 @@ def run_demo():
             choice = input("\n请选择 (1-4): ").strip()
             
             if choice == '1':
-                print("🔄 启动原始版本...")
-                try:
-                    subprocess.run(['python3', 'typeing.py'])
-                except KeyboardInterrupt:
-                    print("\n✅ 原始版本已退出")
-                except Exception as e:
-                    print(f"❌ 启动失败: {e}")
+                launch_game(ORIGINAL_FILE, "原始版本", launcher, timings)
             
             elif choice == '2':
-                print("🔄 启动重构版本...")
-                try:
-                    subprocess.run(['python3', 'typing_game_refactored.py'])
-                except KeyboardInterrupt:
-                    print("\n✅ 重构版本已退出")
-                except Exception as e:
-                    print(f"❌ 启动失败: {e}")
-            
+                launch_game(REFACTORED_FILE, "重构版本", launcher, timings)
             elif choice == '3':
                 print("📋 查看代码结构对比...")
                 print("\n原始版本结构:")
@@ -271,6 +432,7 @@ def run_demo():
                     print(f"  ✅ {imp}")
             
             elif choice == '4':
+                print_launch_timings(timings)
                 print("👋 感谢体验重构演示！")
                 break
             
@@ -283,5 +445,31 @@ def run_demo():
         except Exception as e:
             print(f"❌ 发生错误: {e}")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="重构对比演示")
+    parser.add_argument("--report", action="store_true",
+                        help="只生成对比报告，不进入交互菜单")
+    parser.add_argument("--root", metavar="DIR",
+                        help="额外扫描该目录下的全部 Python 文件")
+    parser.add_argument("--cache", metavar="PATH", default=DEFAULT_CACHE,
+                        help="逐文件统计缓存 (默认: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="扫描线程数")
+    parser.add_argument("--metrics-cache", metavar="PATH", default=METRICS_CACHE,
+                        help="静态分析缓存，按文件内容哈希 (默认: %(default)s)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="静态分析进程数 (默认: CPU 核数)")
+    parser.add_argument("--output", default=REPORT_PATH,
+                        help="报告路径 (默认: %(default)s)")
+    parser.add_argument("--cold", action="store_true",
+                        help="每次运行游戏都启动新解释器，不使用暖启动")
+    args = parser.parse_args(argv)
+
+    if args.report:
+        create_comparison_report(args.output, args.root, args.cache, args.workers,
+                                 args.metrics_cache, args.processes)
+    else:
+        run_demo(warm=not args.cold)
+
 if __name__ == "__main__":
-    run_demo()
\ No newline at end of file
+    main()
\ No newline at end of file
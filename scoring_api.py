@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+计分与分段 JSON 接口
+=================
+
+线程模式和 asyncio 两个服务引擎共用的接口逻辑：引擎只负责读取请求体
+和写出响应，路由、参数校验和响应内容都在这里。
+
+    POST   /api/segments     {"text": "..."}  返回分段与文本概况，不创建会话
+    POST   /api/score        {"text": "..."}  创建会话，响应附带文本分段
+    POST   /api/score/<id>   {"keys": "..."}  追加按键（"\\b" 表示退格）
+    GET    /api/score/<id>                    读取统计
+    DELETE /api/score/<id>                    结束会话
+"""
+
+import json
+
+from passage_analysis import analyze
+
+# 计分接口路径前缀
+SCORE_API_PREFIX = "/api/score"
+# 只返回文本分段、不创建会话的接口
+SEGMENTS_API_PATH = "/api/segments"
+# JSON 请求体大小上限
+MAX_JSON_BODY = 1024 * 1024
+# 接口接受的练习文本长度上限（字符），分段结果的内存占用与文本长度成正比
+MAX_PASSAGE_LENGTH = 5000
+
+
+def is_api_request(method, url_path):
+    """请求（不含查询串的路径）是否由本模块处理"""
+    if url_path == SEGMENTS_API_PATH:
+        return method == "POST"
+    return method in ("GET", "POST", "DELETE") and (
+        url_path == SCORE_API_PREFIX or url_path.startswith(SCORE_API_PREFIX + "/"))
+
+
+def body_length(value):
+    """解析 Content-Length，返回 (长度, 错误响应)；长度无效或过大时长度为 None"""
+    try:
+        length = int(value or 0)
+    except ValueError:
+        length = -1
+    if length < 0 or length > MAX_JSON_BODY:
+        return None, (413 if length > 0 else 400, {"error": "invalid body size"})
+    return length, None
+
+
+def _parse_body(body):
+    """解析 JSON 请求体，返回 (对象, 错误响应)"""
+    try:
+        payload = json.loads(body or b"{}")
+    except (UnicodeDecodeError, json.JSONDecodeError, RecursionError):
+        return None, (400, {"error": "invalid JSON"})
+    if not isinstance(payload, dict):
+        return None, (400, {"error": "expected a JSON object"})
+    return payload, None
+
+
+def _passage_text(payload):
+    """取出请求中的练习文本，返回 (文本, 错误响应)"""
+    text = payload.get("text")
+    if not isinstance(text, str) or not text:
+        return None, (400, {"error": "text is required"})
+    if len(text) > MAX_PASSAGE_LENGTH:
+        return None, (400, {"error": f"text is longer than {MAX_PASSAGE_LENGTH} characters"})
+    return text, None
+
+
+def api_response(scoring, method, url_path, body=b""):
+    """处理一个接口请求，返回 (状态码, JSON 正文或 None)
+
+    scoring 为 typing_scoring.ScoringService，为 None 时计分接口返回 404。
+    """
+    if method == "POST":
+        payload, error = _parse_body(body)
+        if error:
+            return error
+
+    if url_path == SEGMENTS_API_PATH:
+        text, error = _passage_text(payload)
+        return error or (200, analyze(text).payload())
+
+    session_id = url_path[len(SCORE_API_PREFIX):].strip("/")
+    if scoring is None or "/" in session_id:
+        return 404, {"error": "not found"}
+
+    if method == "POST":
+        if not session_id:
+            text, error = _passage_text(payload)
+            if error:
+                return error
+            analysis = analyze(text)
+            session_id, snapshot = scoring.create(text)
+            return 201, dict(snapshot, session=session_id, **analysis.payload())
+        keys = payload.get("keys", "")
+        if not isinstance(keys, str):
+            return 400, {"error": "keys must be a string"}
+        snapshot = scoring.feed(session_id, keys)
+    elif method == "DELETE":
+        if scoring.close(session_id):
+            return 204, None
+        snapshot = None
+    else:
+        snapshot = scoring.get(session_id)
+
+    if snapshot is None:
+        return 404, {"error": "unknown session"}
+    return 200, dict(snapshot, session=session_id)
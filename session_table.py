@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的多会话统计表
+================
+
+一个进程同时承载数百个课堂会话时，每个 GameStatistics 实例都带着完整的
+__dict__。本模块提供两种紧凑表示，计数语义与 test_refactoring.py 中的
+GameStatistics 相同：
+
+- SlottedGameStatistics：使用 __slots__ 的对象，接口不变；
+- SessionTable：按列存放的结构数组（每个字段一个 array），
+  所有会话共享同一个配置对象，StatisticsView 是指向某一行的轻量视图。
+"""
+
+import argparse
+import gc
+import tracemalloc
+from array import array
+
+# (字段名, array 类型码)
+STAT_FIELDS = (
+    ("score", "i"),
+    ("correct_chars", "i"),
+    ("incorrect_chars", "i"),
+    ("current_level", "i"),
+    ("completed_levels", "i"),
+    ("combo", "i"),
+    ("max_combo", "i"),
+)
+# 表的默认容量上限
+MAX_SESSIONS = 100_000
+
+
+class SlottedGameStatistics:
+    """使用 __slots__ 的游戏统计，接口与 GameStatistics 一致"""
+
+    __slots__ = ("score", "correct_chars", "incorrect_chars", "current_level",
+                 "completed_levels", "combo", "max_combo")
+
+    def __init__(self):
+        self.reset()
+
+    @property
+    def total_chars(self):
+        return self.correct_chars + self.incorrect_chars
+
+    def reset(self):
+        """重置全部统计"""
+        self.score = 0
+        self.correct_chars = 0
+        self.incorrect_chars = 0
+        self.current_level = 1
+        self.completed_levels = 0
+        self.combo = 0
+        self.max_combo = 0
+
+    def record_correct_input(self):
+        """记录一次正确输入"""
+        self.correct_chars += 1
+        self.combo += 1
+        if self.combo > self.max_combo:
+            self.max_combo = self.combo
+
+    def record_incorrect_input(self):
+        """记录一次错误输入，分数不会低于 0"""
+        self.incorrect_chars += 1
+        self.combo = 0
+        if self.score > 0:
+            self.score -= 1
+
+    def complete_level(self):
+        """完成一关"""
+        self.current_level += 1
+        self.completed_levels += 1
+        self.score += 1
+
+    def get_accuracy(self):
+        """准确率（百分比），没有输入时为 100"""
+        total = self.correct_chars + self.incorrect_chars
+        if total == 0:
+            return 100.0
+        return self.correct_chars / total * 100
+
+
+class SessionTable:
+    """结构数组形式的会话统计表
+
+    每个统计字段是一列 array，会话是行号；释放的行号进入空闲链表复用。
+    所有会话共享构造时传入的 config，容量超过 max_sessions 时拒绝分配。
+    """
+
+    def __init__(self, config=None, max_sessions=MAX_SESSIONS):
+        self.config = config
+        self.max_sessions = max_sessions
+        self._columns = {name: array(code) for name, code in STAT_FIELDS}
+        for name, column in self._columns.items():
+            setattr(self, name, column)
+        self._active = bytearray()
+        self._free = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def bytes_per_session(self):
+        """每行占用的列存储字节数（不含 array 预留的增长空间）"""
+        return sum(c.itemsize for c in self._columns.values()) + 1
+
+    def allocate(self):
+        """分配一行并初始化，返回行号"""
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = len(self._active)
+            if row >= self.max_sessions:
+                raise MemoryError(f"session table is full ({self.max_sessions} sessions)")
+            for column in self._columns.values():
+                column.append(0)
+            self._active.append(0)
+        self._active[row] = 1
+        self._size += 1
+        self.reset(row)
+        return row
+
+    def free(self, row):
+        """释放一行"""
+        if not self._active[row]:
+            raise KeyError(row)
+        self._active[row] = 0
+        self._free.append(row)
+        self._size -= 1
+
+    def reset(self, row):
+        for column in self._columns.values():
+            column[row] = 0
+        self.current_level[row] = 1
+
+    def record_correct_input(self, row):
+        self.correct_chars[row] += 1
+        combo = self.combo[row] + 1
+        self.combo[row] = combo
+        if combo > self.max_combo[row]:
+            self.max_combo[row] = combo
+
+    def record_incorrect_input(self, row):
+        self.incorrect_chars[row] += 1
+        self.combo[row] = 0
+        if self.score[row] > 0:
+            self.score[row] -= 1
+
+    def complete_level(self, row):
+        self.current_level[row] += 1
+        self.completed_levels[row] += 1
+        self.score[row] += 1
+
+    def get_accuracy(self, row):
+        correct = self.correct_chars[row]
+        total = correct + self.incorrect_chars[row]
+        if total == 0:
+            return 100.0
+        return correct / total * 100
+
+    def view(self, row):
+        """返回指向该行的 GameStatistics 兼容视图"""
+        if not self._active[row]:
+            raise KeyError(row)
+        return StatisticsView(self, row)
+
+    def new_statistics(self):
+        """分配一行并返回其视图"""
+        return StatisticsView(self, self.allocate())
+
+
+def _column_property(name):
+    def getter(view):
+        return getattr(view._table, name)[view._row]
+
+    def setter(view, value):
+        getattr(view._table, name)[view._row] = value
+
+    return property(getter, setter)
+
+
+class StatisticsView:
+    """SessionTable 中一行的视图，接口与 GameStatistics 一致"""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    @property
+    def row(self):
+        return self._row
+
+    @property
+    def config(self):
+        return self._table.config
+
+    @property
+    def total_chars(self):
+        return self.correct_chars + self.incorrect_chars
+
+    def reset(self):
+        self._table.reset(self._row)
+
+    def record_correct_input(self):
+        self._table.record_correct_input(self._row)
+
+    def record_incorrect_input(self):
+        self._table.record_incorrect_input(self._row)
+
+    def complete_level(self):
+        self._table.complete_level(self._row)
+
+    def get_accuracy(self):
+        return self._table.get_accuracy(self._row)
+
+    def release(self):
+        """释放该行，之后视图不可再用"""
+        self._table.free(self._row)
+
+
+for _name, _ in STAT_FIELDS:
+    setattr(StatisticsView, _name, _column_property(_name))
+
+
+class _DictGameStatistics:
+    """基准对照：普通 __dict__ 对象，每个实例持有自己的配置副本"""
+
+    def __init__(self, config):
+        self.config = dict(config)
+        self.score = 0
+        self.correct_chars = 0
+        self.incorrect_chars = 0
+        self.total_chars = 0
+        self.current_level = 1
+        self.completed_levels = 0
+        self.combo = 0
+        self.max_combo = 0
+
+
+def _measure(factory, count):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = factory(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return after - before
+
+
+def run_benchmark(count=10_000):
+    """测量 count 个会话在各种表示下的内存占用（字节）"""
+    config = {"window_title": "北京小学生英文打字练习", "background_color": "black",
+              "text_color": "#00FF00", "max_levels": 10, "initial_grade": "1"}
+
+    def dict_objects(n):
+        return [_DictGameStatistics(config) for _ in range(n)]
+
+    def slotted_objects(n):
+        return [SlottedGameStatistics() for _ in range(n)]
+
+    def table_rows(n):
+        table = SessionTable(config)
+        for _ in range(n):
+            table.allocate()
+        return table
+
+    return {
+        "dict": _measure(dict_objects, count),
+        "slots": _measure(slotted_objects, count),
+        "table": _measure(table_rows, count),
+        "table_bytes_per_session": SessionTable().bytes_per_session,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-session memory benchmark")
+    parser.add_argument("--sessions", type=int, default=10_000,
+                        help="number of sessions (default: %(default)s)")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.sessions)
+    print(f"📊 Memory for {args.sessions} sessions")
+    for key, label in (("dict", "__dict__ + per-object config"),
+                       ("slots", "__slots__ objects"),
+                       ("table", "struct-of-arrays table")):
+        total = result[key]
+        print(f"   {label:<30} {total / 1024:9.1f} KB  "
+              f"{total / args.sessions:7.1f} B/session")
+    print(f"   table column storage: {result['table_bytes_per_session']} B/session")
+
+
+if __name__ == "__main__":
+    main()
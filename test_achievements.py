@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成就规则引擎单元测试
+==================
+
+验证阈值索引只触发一次、文本专属 / 按键数下限 / 限时规则，
+以及 NumPy 批量求值与纯 Python、线性扫描结果一致
+"""
+
+import os
+import sys
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from achievements import (
+    DEFAULT_RULES, METRICS, AchievementEngine, Rule, collect_metrics, run_benchmark
+)
+from typing_scoring import ScoringSession
+
+
+def _metrics(**values):
+    """单个会话的指标，未给出的记为 0"""
+    metrics = {name: [0] for name in METRICS}
+    metrics.update({name: [value] for name, value in values.items()})
+    return metrics
+
+
+class TestAchievementEngine(unittest.TestCase):
+    """测试规则索引与求值"""
+
+    def check_both(self, test):
+        for use_numpy in (True, False):
+            with self.subTest(use_numpy=use_numpy):
+                test(use_numpy)
+
+    def test_fires_once_in_threshold_order(self):
+        """测试跨过多个阈值时一次全部解锁，之后不再重复"""
+        def test(use_numpy):
+            engine = AchievementEngine(DEFAULT_RULES, use_numpy=use_numpy)
+            row = engine.register()
+            fired = engine.evaluate([row], _metrics(wpm=85, total_chars=5))
+            self.assertEqual([rule.id for _, rule in fired],
+                             ["speed_demon", "lightning_fast"])
+            self.assertEqual(engine.evaluate([row], _metrics(wpm=90)), [])
+            # 速度回落后再次超过阈值也不会重复触发
+            self.assertEqual(engine.evaluate([row], _metrics(wpm=10)), [])
+            self.assertEqual(engine.evaluate([row], _metrics(wpm=81)), [])
+            self.assertEqual({rule.id for rule in engine.unlocked(row)},
+                             {"speed_demon", "lightning_fast"})
+        self.check_both(test)
+
+    def test_conditions(self):
+        """测试按键数下限、文本专属与限时规则"""
+        rules = [
+            Rule("perfect", "accuracy", 100, min_chars=11),
+            Rule("p1_combo", "combo", 5, passage="p1"),
+            Rule("quick", "correct_chars", 50, within=60),
+        ]
+
+        def test(use_numpy):
+            engine = AchievementEngine(rules, use_numpy=use_numpy)
+            a = engine.register("p1")
+            b = engine.register("p2")
+            metrics = {"accuracy": [100, 100], "combo": [6, 6],
+                       "correct_chars": [10, 60], "total_chars": [10, 60],
+                       "elapsed": [30.0, 90.0]}
+            fired = engine.evaluate([a, b], metrics)
+            # a 按键不足 11 次；b 不在 p1 上，且超过限时
+            self.assertEqual(sorted((row, rule.id) for row, rule in fired),
+                             [(a, "p1_combo"), (b, "perfect")])
+            metrics = {"accuracy": [100], "combo": [0], "correct_chars": [55],
+                       "total_chars": [55], "elapsed": [40.0]}
+            self.assertEqual([rule.id for _, rule in engine.evaluate([a], metrics)],
+                             ["perfect", "quick"])
+        self.check_both(test)
+
+    def test_released_rows_start_fresh(self):
+        """测试释放的行被复用时游标清零，容量可以增长"""
+        def test(use_numpy):
+            engine = AchievementEngine(DEFAULT_RULES, use_numpy=use_numpy)
+            rows = [engine.register() for _ in range(100)]
+            self.assertEqual(len(set(rows)), 100)
+            engine.evaluate(rows, {"wpm": [60] * 100, "total_chars": [1] * 100,
+                                   "accuracy": [0] * 100, "combo": [0] * 100})
+            engine.release(rows[0])
+            row = engine.register()
+            self.assertEqual(engine.unlocked(row), [])
+            self.assertEqual(len(engine), 100)
+        self.check_both(test)
+
+    def test_invalid_rules(self):
+        """测试未知指标与重复 id 被拒绝"""
+        with self.assertRaises(ValueError):
+            AchievementEngine([Rule("x", "speed", 1)])
+        with self.assertRaises(ValueError):
+            AchievementEngine([Rule("x", "wpm", 1), Rule("x", "combo", 1)])
+
+    def test_collect_metrics(self):
+        """测试从 ScoringSession 收集指标"""
+        session = ScoringSession("hello", clock=lambda: 0.0)
+        session.feed("hex\bllo", now=0.0)
+        session.type_char("o", now=6.0)
+        metrics = collect_metrics([session], now=6.0)
+        self.assertEqual(metrics["total_chars"], [6])
+        self.assertEqual(metrics["combo"], [3])
+        self.assertEqual(metrics["elapsed"], [6.0])
+        self.assertEqual(metrics["wpm"], [10.0])
+
+    def test_benchmark_agrees_with_linear_scan(self):
+        """测试基准中索引引擎与线性扫描解锁结果一致"""
+        result = run_benchmark(rules=200, sessions=100, ticks=10)
+        self.assertGreater(result["unlocked"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应选文单元测试
+================
+
+验证薄弱画像统计与基于索引的选文
+"""
+
+import os
+import pickle
+import random
+import sys
+import tempfile
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from adaptive_selection import (
+    AdaptiveContentManager, AdaptiveSelector, BigramIndex, WeaknessProfile
+)
+from content_corpus import CorpusContentManager, build_corpus
+
+
+class TestWeaknessProfile(unittest.TestCase):
+    """测试薄弱画像"""
+
+    def test_identifies_weak_bigram(self):
+        """测试错误集中的字母组合排在最前"""
+        profile = WeaknessProfile()
+        for _ in range(20):
+            for prev, char in zip("the quick", "he quick "):
+                profile.record(char, char, 0.15, prev)
+            profile.record("z", "x", 0.6, "a")
+        weakest = [gram for gram, _ in profile.weaknesses()]
+        self.assertIn(weakest[0], ("z", "az"))
+        self.assertIn("az", weakest)
+
+    def test_update_from_log_handles_backspace(self):
+        """测试退格后按正确位置统计"""
+        profile = WeaknessProfile()
+        profile.update_from_log("abc", "ax\bbc", [0.0, 0.1, 0.2, 0.3, 0.4])
+        self.assertEqual(profile.keys["b"].attempts, 2)
+        self.assertEqual(profile.keys["b"].errors, 1)
+        self.assertEqual(profile.bigrams["bc"].attempts, 1)
+
+    def test_roundtrip(self):
+        """测试导出与恢复"""
+        profile = WeaknessProfile()
+        profile.record("a", "b", 0.3, "c")
+        restored = WeaknessProfile.from_dict(profile.to_dict())
+        self.assertEqual(restored.to_dict(), profile.to_dict())
+
+
+class TestAdaptiveSelector(unittest.TestCase):
+    """测试基于索引的选文"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self._tmp.name, "test.corpus")
+        passages = [(f"plain words number {i}", 1, 1) for i in range(200)]
+        passages.append(("zebra zoo zigzag", 1, 1))
+        passages.append(("other grade zzz", 2, 1))
+        build_corpus(path, passages)
+        self.corpus = CorpusContentManager(path, rng=random.Random(1))
+        self.index = BigramIndex.build(self.corpus)
+
+    def tearDown(self):
+        self.corpus.close()
+        self._tmp.cleanup()
+
+    def weak_z_profile(self):
+        profile = WeaknessProfile()
+        for _ in range(10):
+            for char in "plain words":
+                profile.record(char, char, 0.15)
+            profile.record("z", "s", 0.8)
+        return profile
+
+    def test_picks_passage_with_weak_key(self):
+        """测试选中包含薄弱按键且属于该年级的文本"""
+        selector = AdaptiveSelector(self.index, random.Random(2))
+        index = selector.pick(self.weak_z_profile(), "1")
+        self.assertEqual(self.corpus.get_passage(index), "zebra zoo zigzag")
+        self.assertEqual(self.index.candidates(1, "z"), self.index.candidates("1", "z"))
+        self.assertEqual(self.index.candidates("x", "z"), [])
+
+    def test_index_save_and_load(self):
+        """测试索引持久化"""
+        path = os.path.join(self._tmp.name, "test.index")
+        self.index.save(path)
+        loaded = BigramIndex.load(path)
+        self.assertEqual(loaded.candidates("1", "z"), self.index.candidates("1", "z"))
+        self.assertEqual(loaded.postings.keys(), self.index.postings.keys())
+
+        with open(path, "wb") as f:
+            pickle.dump(self.index.postings, f)
+        with self.assertRaises(ValueError):
+            BigramIndex.load(path)
+
+    def test_content_manager_fallback(self):
+        """测试画像为空时退回随机抽取，年级无效时返回 None"""
+        manager = AdaptiveContentManager(self.corpus, self.index)
+        self.assertIsNotNone(manager.get_sentence_for_grade("1"))
+        self.assertIsNone(manager.get_sentence_for_grade("9"))
+        manager.profile = self.weak_z_profile()
+        self.assertEqual(manager.get_sentence_for_grade("1"), "zebra zoo zigzag")
+
+    def test_recent_history_is_bounded(self):
+        """测试最近选过的记录不超过 history 条，history 为 0 时不保留"""
+        for history in (0, 3):
+            with self.subTest(history=history):
+                manager = AdaptiveContentManager(self.corpus, self.index, history=history)
+                for _ in range(10):
+                    manager.get_sentence_for_grade("1")
+                self.assertEqual(len(manager._recent), history)
+
+
+if __name__ == "__main__":
+    unittest.main()
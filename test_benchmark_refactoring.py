@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准套件单元测试
+==================
+
+验证基线读写与回归门槛
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_refactoring import compare, load_baseline, main, save_baseline
+
+
+class TestRegressionGate(unittest.TestCase):
+    """测试基线比较"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "baseline.json")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_compare_statuses(self):
+        """测试 ok / faster / regression / new 四种状态"""
+        baseline = {"a": 1.0, "b": 1.0, "c": 1.0}
+        rows = compare(baseline, {"a": 1.1, "b": 0.5, "c": 1.5, "d": 2.0},
+                       threshold=20)
+        statuses = {name: status for name, _, _, _, status in rows}
+        self.assertEqual(statuses, {"a": "ok", "b": "faster", "c": "regression",
+                                    "d": "new"})
+
+    def test_baseline_roundtrip_keeps_other_entries(self):
+        """测试部分更新基线时保留未运行的条目"""
+        save_baseline(self.path, {"input_processing": 2e-6})
+        save_baseline(self.path, {"statistics_update": 1e-7},
+                      load_baseline(self.path))
+        self.assertEqual(load_baseline(self.path),
+                         {"input_processing": 2e-6, "statistics_update": 1e-7})
+        self.assertEqual(load_baseline(self.path + ".missing"), {})
+
+    def test_main_fails_on_regression(self):
+        """测试变慢超过阈值时返回非 0"""
+        save_baseline(self.path, {"statistics_update": 1e-12})
+        argv = ["--baseline", self.path, "--only", "statistics_update",
+                "--repeat", "1"]
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(main(argv), 1)
+        self.assertIn("regression", out.getvalue())
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main(argv + ["--update"]), 0)
+            self.assertEqual(main(argv + ["--threshold", "1000"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按键延迟分析单元测试
+==================
+
+验证分位数草图的误差界、最慢双键组合查询，以及纯 Python 回退
+"""
+
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bigram_latency
+from bigram_latency import (
+    RELATIVE_ACCURACY, KeystrokeAnalytics, LatencyTable, synthesize_streams
+)
+
+
+class TestLatencyTable(unittest.TestCase):
+    """测试分位数草图"""
+
+    def test_relative_error_bound(self):
+        """测试各分位数的相对误差不超过 RELATIVE_ACCURACY"""
+        rng = random.Random(3)
+        samples = sorted(rng.uniform(0.02, 2.0) for _ in range(5000))
+        table = LatencyTable()
+        for value in samples:
+            table.add(ord("a"), value)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            exact = samples[int(q * (len(samples) - 1))]
+            self.assertLessEqual(abs(table.quantile("a", q) - exact) / exact,
+                                 RELATIVE_ACCURACY + 1e-9)
+        self.assertEqual(table.count("a"), 5000)
+        self.assertIsNone(table.quantile("b"))
+
+
+class TestKeystrokeAnalytics(unittest.TestCase):
+    """测试按键流录入与查询"""
+
+    def test_transitions(self):
+        """测试退格、段边界与停顿不计入双键组合"""
+        analytics = KeystrokeAnalytics()
+        analytics.ingest_many("3-2", [
+            ("ab#\bc", [0.0, 0.1, 0.3, 0.4, 0.6]),
+            ("cd", [10.0, 15.0]),
+        ])
+        _, bigrams = analytics.tables("3-2")
+        self.assertEqual(bigrams.count("ab"), 1)
+        self.assertEqual(bigrams.count("b#"), 1)
+        self.assertEqual(bigrams.count("#\b") + bigrams.count("\bc"), 0)
+        # 上一段的 c 与下一段的 c 之间没有转换，5 秒的间隔视为停顿
+        self.assertEqual(bigrams.count("cc") + bigrams.count("cd"), 0)
+        self.assertAlmostEqual(analytics.quantile("3-2", "c"), 0.2,
+                               delta=0.2 * RELATIVE_ACCURACY)
+
+    def test_slowest_bigrams(self):
+        """测试模拟数据中人为放慢的双键组合排在前面，且与纯 Python 结果一致"""
+        streams = synthesize_streams(300, length=200)
+        analytics = KeystrokeAnalytics()
+        analytics.ingest_many("3-2", streams)
+        top = analytics.slowest_bigrams("3-2", n=5, min_count=10)
+        self.assertEqual({label for label, _, _ in top}, {"qu", "zx", "br", "ck", "mn"})
+        self.assertEqual(top[0][0], "zx")
+
+        with mock.patch.object(bigram_latency, "np", None):
+            fallback = KeystrokeAnalytics()
+            for keys, times in streams:
+                fallback.ingest("3-2", keys, times)
+            self.assertEqual(fallback.slowest_bigrams("3-2", n=5, min_count=10), top)
+
+    def test_merged(self):
+        """测试多个班级合并后的计数"""
+        analytics = KeystrokeAnalytics()
+        analytics.ingest("a", "xyxy", [0.0, 0.1, 0.2, 0.3])
+        analytics.ingest("b", "xy", [0.0, 0.1])
+        school = analytics.merged()
+        self.assertEqual(school.tables(None)[1].count("xy"), 3)
+        self.assertEqual(analytics.merged({"b"}).tables(None)[1].count("xy"), 1)
+        self.assertEqual((school.keystrokes, analytics.merged({"b"}).keystrokes), (6, 2))
+
+    def test_queries_do_not_create_classes(self):
+        """测试查询不存在的班级不会留下空条目"""
+        analytics = KeystrokeAnalytics()
+        self.assertEqual(analytics.slowest_bigrams("9-9"), [])
+        self.assertEqual(analytics.slowest_keys("9-9"), [])
+        self.assertIsNone(analytics.quantile("9-9", "ab"))
+        self.assertEqual(analytics.nbytes, 0)
+
+    def test_mismatched_timestamps(self):
+        """测试时间戳个数与按键数不一致时报错且不录入"""
+        analytics = KeystrokeAnalytics()
+        for backend in (bigram_latency.np, None):
+            with self.subTest(numpy=backend is not None), \
+                    mock.patch.object(bigram_latency, "np", backend):
+                with self.assertRaises(ValueError):
+                    analytics.ingest_many("3-2", [("ab", [0.0, 0.1]), ("abc", [0.0, 0.1])])
+        self.assertEqual(analytics.keystrokes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
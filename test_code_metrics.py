@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+代码静态指标单元测试
+==================
+
+验证圈复杂度、类 / 方法 / 文档统计、重复检测与内容哈希缓存
+"""
+
+import ast
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from code_metrics import (
+    MetricsCache, analyze_files, analyze_source, cyclomatic_complexity,
+    duplicated_lines, summarize
+)
+
+SAMPLE = '''"""Module."""
+
+
+class Game:
+    """Game."""
+
+    def start(self):
+        """Start."""
+        return 1
+
+    def score(self, a, b):
+        if a and b:
+            return 2
+        for x in range(a):
+            if x:
+                continue
+        return 0
+
+
+def helper():
+    return [x for x in range(3) if x]
+'''
+
+
+class TestAnalyzeSource(unittest.TestCase):
+    """测试单文件分析"""
+
+    def test_cyclomatic_complexity(self):
+        """测试 if / for / 布尔运算 / 推导式各自计入复杂度"""
+        tree = ast.parse(SAMPLE)
+        functions = {node.name: node for node in ast.walk(tree)
+                     if isinstance(node, ast.FunctionDef)}
+        self.assertEqual(cyclomatic_complexity(functions["start"]), 1)
+        # 1 + if + and + for + if
+        self.assertEqual(cyclomatic_complexity(functions["score"]), 5)
+        # 1 + comprehension + 条件
+        self.assertEqual(cyclomatic_complexity(functions["helper"]), 3)
+
+    def test_counts_and_docstrings(self):
+        """测试类、方法、函数数量与文档字符串覆盖"""
+        metrics = analyze_source(SAMPLE)
+        self.assertEqual((metrics["classes"], metrics["methods"], metrics["functions"]),
+                         (1, 2, 1))
+        # 模块、Game、start 有文档；score、helper 没有
+        self.assertEqual((metrics["documented"], metrics["documentable"]), (3, 5))
+        self.assertEqual(metrics["complexity_max"], 5)
+        self.assertTrue(metrics["complexity_max_name"].startswith("score:"))
+
+    def test_syntax_error(self):
+        """测试语法错误的文件只返回 error，汇总时不计入"""
+        metrics = analyze_source("def broken(:\n")
+        self.assertIn("error", metrics)
+        self.assertIsNone(summarize({"bad.py": metrics}))
+        summary = summarize({"bad.py": metrics, "ok.py": analyze_source(SAMPLE)})
+        self.assertEqual((summary["files"], summary["errors"]), (1, 1))
+
+
+class TestAnalyzeFiles(unittest.TestCase):
+    """测试多文件分析、重复检测与缓存"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.root, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_duplication_across_files(self):
+        """测试复制到另一个文件的代码算作重复，独有代码不算"""
+        unique = "".join(f"value_{i} = {i}\n" for i in range(10))
+        a = self.write("a.py", SAMPLE)
+        b = self.write("b.py", SAMPLE + unique)
+        results, _, _ = analyze_files([a, b])
+        duplicated = duplicated_lines(results)
+        self.assertEqual(duplicated[a], results[a]["code_lines"])
+        self.assertEqual(duplicated[b], results[a]["code_lines"])
+        self.assertAlmostEqual(summarize({a: results[a]})["duplication"], 0.0)
+
+    def test_cache_hits_by_content(self):
+        """测试内容不变的文件改名后仍命中缓存，修改后重新分析"""
+        cache_path = os.path.join(self.root, "metrics.json")
+        a = self.write("a.py", SAMPLE)
+        cache = MetricsCache(cache_path)
+        results, hits, _ = analyze_files([a, os.path.join(self.root, "missing.py")], cache)
+        self.assertEqual((list(results), hits), ([a], 0))
+        cache.save()
+
+        renamed = os.path.join(self.root, "renamed.py")
+        os.rename(a, renamed)
+        results, hits, _ = analyze_files([renamed], MetricsCache(cache_path))
+        self.assertEqual(hits, 1)
+        self.assertEqual(results[renamed]["classes"], 1)
+
+        self.write("renamed.py", SAMPLE + "\nclass Extra:\n    pass\n")
+        cache = MetricsCache(cache_path)
+        results, hits, digests = analyze_files([renamed], cache)
+        self.assertEqual(hits, 0)
+        self.assertEqual(results[renamed]["classes"], 2)
+        # 只保留本次见到的版本，修改前的条目被丢弃
+        cache.save(keep=digests)
+        self.assertEqual(set(MetricsCache(cache_path).entries), digests)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语料库单元测试
+============
+
+验证 content_corpus 的文件格式、年级接口与过滤抽样
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from content_corpus import (
+    CHARSET_LOWER, CHARSET_PUNCT, CHARSET_SPACE, CHARSET_UPPER,
+    CorpusContentManager, build_corpus, charset_mask, synthesize_passages
+)
+
+
+class TestCorpusContentManager(unittest.TestCase):
+    """测试语料文件读写"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "test.corpus")
+        self.passages = list(synthesize_passages(500, seed=3))
+        self.passages.append(("Hi Tom", 6, 1))
+        build_corpus(self.path, self.passages)
+        self.corpus = CorpusContentManager(self.path, rng=random.Random(5))
+
+    def tearDown(self):
+        self.corpus.close()
+        self._tmp.cleanup()
+
+    def test_grades(self):
+        """测试年级接口与 ContentManager 一致"""
+        self.assertEqual(self.corpus.get_available_grades(),
+                         ["1", "2", "3", "4", "5", "6"])
+        self.assertTrue(self.corpus.validate_grade("3"))
+        self.assertFalse(self.corpus.validate_grade("7"))
+        self.assertFalse(self.corpus.validate_grade("invalid"))
+        self.assertIsNone(self.corpus.get_sentence_for_grade("invalid"))
+
+    def test_sentence_for_grade(self):
+        """测试取到的文本属于指定年级"""
+        by_grade = {}
+        for text, grade, _ in self.passages:
+            by_grade.setdefault(str(grade), set()).add(text)
+        for _ in range(50):
+            self.assertIn(self.corpus.get_sentence_for_grade("2"), by_grade["2"])
+
+    def test_all_passages_roundtrip(self):
+        """测试全部文本可按记录号读回"""
+        self.assertEqual(len(self.corpus), len(self.passages))
+        stored = sorted(self.corpus.get_passage(i) for i in range(len(self.corpus)))
+        self.assertEqual(stored, sorted(text for text, _, _ in self.passages))
+
+    def test_filtered_sample(self):
+        """测试按难度、长度与字符集过滤"""
+        for _ in range(50):
+            text = self.corpus.sample(grade="4", difficulty=2, min_length=20,
+                                      max_length=40,
+                                      charset=CHARSET_LOWER | CHARSET_SPACE)
+            self.assertIsNotNone(text)
+            self.assertTrue(20 <= len(text) <= 40)
+            self.assertEqual(charset_mask(text) & (CHARSET_UPPER | CHARSET_PUNCT), 0)
+            self.assertIn((text, 4, 2), self.passages)
+        self.assertIsNone(self.corpus.sample(min_length=10_000))
+        self.assertEqual(self.corpus.sample(grade="6", difficulty=1, max_length=6,
+                                            charset=CHARSET_UPPER | CHARSET_LOWER
+                                            | CHARSET_SPACE), "Hi Tom")
+
+    def test_rejects_other_files(self):
+        """测试打开非语料文件"""
+        other = os.path.join(self._tmp.name, "other.txt")
+        with open(other, "wb") as f:
+            f.write(b"x" * 100)
+        with self.assertRaises(ValueError):
+            CorpusContentManager(other)
+
+
+if __name__ == "__main__":
+    unittest.main()
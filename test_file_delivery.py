@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大文件发送与 Range 请求单元测试
+============================
+
+验证 Range 解析、条件请求，以及两种服务引擎对磁盘文件和内存资源的
+单段 / 多段区间响应
+"""
+
+import email.parser
+import email.policy
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asset_cache import AssetCache, Conditions, parse_range, response_plan
+from async_server import AsyncServerThread
+from file_delivery import DELIVERY_MODES, SMALL_FILE_SIZE
+from threaded_server import create_server
+
+# 大于 SMALL_FILE_SIZE，确保走 sendfile / mmap 路径
+DATA = bytes(range(256)) * (SMALL_FILE_SIZE // 128 + 7)
+
+
+def make_root():
+    tmp = tempfile.TemporaryDirectory()
+    with open(os.path.join(tmp.name, "sounds.bin"), "wb") as f:
+        f.write(DATA)
+    with open(os.path.join(tmp.name, "page.html"), "w", encoding="utf-8") as f:
+        f.write("<html>" + "typing practice " * 100 + "</html>")
+    return tmp
+
+
+def request(port, method, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request(method, path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def multipart_parts(response, body):
+    """解析 multipart/byteranges 响应，返回 [(Content-Range, 正文)]"""
+    raw = f"Content-Type: {response.getheader('Content-Type')}\r\n\r\n".encode() + body
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(raw)
+    return [(part["Content-Range"], part.get_payload(decode=True))
+            for part in message.iter_parts()]
+
+
+class TestRangePlan(unittest.TestCase):
+    """测试 Range 解析与响应计划"""
+
+    def test_parse_range(self):
+        """测试普通、开放、后缀区间的合并，以及无效和不可满足的情况"""
+        self.assertEqual(parse_range("bytes=0-9", 100), [(0, 10)])
+        self.assertEqual(parse_range("bytes=90-", 100), [(90, 100)])
+        self.assertEqual(parse_range("bytes=-10", 100), [(90, 100)])
+        self.assertEqual(parse_range("bytes=50-200", 100), [(50, 100)])
+        self.assertEqual(parse_range("bytes=20-29, 0-4,25-39", 100), [(0, 5), (20, 40)])
+        self.assertEqual(parse_range("bytes=100-", 100), [])
+        for header in ("items=0-1", "bytes=5-1", "bytes=x-1", "bytes=-", "bytes=",
+                       "bytes=" + ",".join(f"{i}-{i}" for i in range(0, 40, 2))):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 100))
+
+    def test_plan_statuses(self):
+        """测试 304 / 412 / 416，以及 If-Range 不匹配时返回完整内容"""
+        etag, mtime = '"v1"', 1_700_000_000.5
+        plan = lambda **kw: response_plan(Conditions(**kw), 100, etag, mtime, "audio/mpeg")
+        self.assertEqual(plan(if_none_match='W/"v1"')[0], 304)
+        self.assertEqual(plan(if_match='"v0"')[0], 412)
+        self.assertEqual(plan(if_modified_since="Tue, 14 Nov 2023 22:13:20 GMT")[0], 304)
+        self.assertEqual(plan(if_unmodified_since="Tue, 14 Nov 2023 22:13:19 GMT")[0], 412)
+        status, headers, _, _ = plan(range="bytes=200-")
+        self.assertEqual((status, dict(headers)["Content-Range"]), (416, "bytes */100"))
+        self.assertEqual(plan(range="bytes=0-9", if_range='"v0"')[0], 200)
+        status, headers, parts, _ = plan(range="bytes=0-9", if_range=etag)
+        self.assertEqual((status, parts), (206, [(b"", 0, 10)]))
+
+
+class ThreadedRangeTestCase(unittest.TestCase):
+    """测试线程模式服务器的 Range 与条件请求"""
+
+    def setUp(self):
+        self._tmp = make_root()
+        cache = AssetCache(self._tmp.name, max_file_size=SMALL_FILE_SIZE)
+        cache.refresh()
+        self.httpd = create_server(0, 2, host="127.0.0.1", asset_cache=cache,
+                                   directory=self._tmp.name)
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._tmp.cleanup()
+
+    def test_disk_ranges_in_every_mode(self):
+        """测试各发送方式下磁盘文件的完整、单段与多段响应"""
+        for mode in DELIVERY_MODES:
+            with self.subTest(mode=mode):
+                self.httpd.file_delivery = mode
+                response, body = request(self.port, "GET", "/sounds.bin")
+                self.assertEqual((response.status, body), (200, DATA))
+                self.assertEqual(response.getheader("Accept-Ranges"), "bytes")
+
+                response, body = request(self.port, "GET", "/sounds.bin",
+                                         {"Range": "bytes=-70000"})
+                self.assertEqual(response.status, 206)
+                self.assertEqual(body, DATA[-70000:])
+                self.assertEqual(response.getheader("Content-Range"),
+                                 f"bytes {len(DATA) - 70000}-{len(DATA) - 1}/{len(DATA)}")
+
+                response, body = request(self.port, "GET", "/sounds.bin",
+                                         {"Range": "bytes=10-19,70000-99999"})
+                self.assertEqual(response.status, 206)
+                self.assertEqual(multipart_parts(response, body), [
+                    (f"bytes 10-19/{len(DATA)}", DATA[10:20]),
+                    (f"bytes 70000-99999/{len(DATA)}", DATA[70000:100000]),
+                ])
+
+    def test_disk_head_and_conditional(self):
+        """测试 HEAD、ETag / 日期条件请求与 416"""
+        response, body = request(self.port, "HEAD", "/sounds.bin")
+        self.assertEqual((response.status, body), (200, b""))
+        self.assertEqual(int(response.getheader("Content-Length")), len(DATA))
+        etag = response.getheader("ETag")
+        modified = response.getheader("Last-Modified")
+
+        response, _ = request(self.port, "GET", "/sounds.bin", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        response, _ = request(self.port, "GET", "/sounds.bin",
+                              {"If-Modified-Since": modified})
+        self.assertEqual(response.status, 304)
+        response, body = request(self.port, "GET", "/sounds.bin",
+                                 {"Range": "bytes=0-3", "If-Range": '"stale"'})
+        self.assertEqual((response.status, len(body)), (200, len(DATA)))
+        response, _ = request(self.port, "GET", "/sounds.bin",
+                              {"Range": f"bytes={len(DATA)}-"})
+        self.assertEqual(response.status, 416)
+
+    def test_cached_asset_range(self):
+        """测试内存资源的区间针对协商出的编码版本"""
+        response, full = request(self.port, "GET", "/page.html")
+        response, body = request(self.port, "GET", "/page.html",
+                                 {"Range": "bytes=6-11", "If-Range": response.getheader("ETag")})
+        self.assertEqual((response.status, body), (206, full[6:12]))
+        self.assertIsNone(response.getheader("Content-Encoding"))
+
+
+class TestAsyncRanges(unittest.TestCase):
+    """测试 asyncio 引擎的 Range 请求"""
+
+    def test_disk_ranges(self):
+        """测试单段、多段区间与 304"""
+        tmp = make_root()
+        server = AsyncServerThread(tmp.name)
+        port = server.start()
+        try:
+            response, body = request(port, "GET", "/sounds.bin", {"Range": "bytes=100-199"})
+            self.assertEqual((response.status, body), (206, DATA[100:200]))
+            response, body = request(port, "GET", "/sounds.bin",
+                                     {"Range": "bytes=0-0,-1"})
+            self.assertEqual([payload for _, payload in multipart_parts(response, body)],
+                             [DATA[:1], DATA[-1:]])
+            response, _ = request(port, "GET", "/sounds.bin",
+                                  {"If-None-Match": response.getheader("ETag")})
+            self.assertEqual(response.status, 304)
+        finally:
+            server.stop()
+            tmp.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
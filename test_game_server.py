@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多会话游戏服务器单元测试
+======================
+
+验证 WebSocket 帧编解码、会话计分与排行榜合并推送
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from achievements import AchievementEngine, Rule
+from async_server import AsyncStaticServer
+from game_server import (
+    OP_CLOSE, OP_TEXT, WEBSOCKET_PATH, GameServer, WebSocketClient, WebSocketError,
+    encode_frame, read_frame, websocket_accept
+)
+
+
+class TestFraming(unittest.IsolatedAsyncioTestCase):
+    """测试帧编解码"""
+
+    def test_accept_key(self):
+        """测试 RFC 6455 中的示例握手"""
+        self.assertEqual(websocket_accept("dGhlIHNhbXBsZSBub25jZQ=="),
+                         "s3pPLMBiTxaQ9kYGzzhZRbK+xOo=")
+
+    async def test_masked_roundtrip(self):
+        """测试各种长度的 mask 帧往返"""
+        for size in (0, 5, 125, 126, 70000):
+            payload = bytes(range(256)) * (size // 256) + bytes(size % 256)
+            reader = asyncio.StreamReader()
+            reader.feed_data(encode_frame(OP_TEXT, payload, mask=True))
+            fin, opcode, data = await read_frame(reader, max_size=1 << 20)
+            self.assertTrue(fin)
+            self.assertEqual(opcode, OP_TEXT)
+            self.assertEqual(data, payload)
+
+    async def test_server_requires_masked_frames(self):
+        """测试服务器拒绝客户端发来的未 mask 帧"""
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_frame(OP_TEXT, b"{}"))
+        with self.assertRaises(WebSocketError):
+            await read_frame(reader, require_mask=True)
+
+
+class TestGameServer(unittest.IsolatedAsyncioTestCase):
+    """测试游戏服务器"""
+
+    async def asyncSetUp(self):
+        self.game = GameServer(tick_rate=20, achievements=AchievementEngine([
+            Rule("combo_5", "combo", 5, "Combo 5", "5+ combo"),
+            Rule("hello", "correct_chars", 3, "Hello", "", passage="hello"),
+        ]))
+        self.server = AsyncStaticServer(
+            websocket_routes={WEBSOCKET_PATH: self.game.handle})
+        self.port = await self.server.start("127.0.0.1", 0)
+        self.clients = []
+
+    async def asyncTearDown(self):
+        for client in self.clients:
+            await client.close()
+        await self.game.close()
+        await self.server.close()
+
+    async def connect(self):
+        client = await WebSocketClient.connect("127.0.0.1", self.port)
+        self.clients.append(client)
+        return client
+
+    async def recv_type(self, client, kind):
+        while True:
+            message = await asyncio.wait_for(client.recv(), 2)
+            if message["type"] == kind:
+                return message
+
+    async def test_join_and_type(self):
+        """测试加入房间、上传按键并查询统计"""
+        client = await self.connect()
+        await client.send({"type": "join", "room": "3-2", "name": "Amy",
+                           "text": "hello"})
+        joined = await self.recv_type(client, "joined")
+        self.assertEqual(joined["text"], "hello")
+        self.assertEqual([s["id"] for s in joined["segments"]], ["s0"])
+        await client.send({"type": "keys", "keys": "hex\bllo"})
+        await client.send({"type": "state"})
+        state = await self.recv_type(client, "state")
+        self.assertEqual(state["position"], 5)
+        self.assertEqual(state["errors"], 0)
+        self.assertEqual(state["incorrect_chars"], 1)
+
+    async def test_leaderboard_is_coalesced(self):
+        """测试同一节拍内的多批按键只产生一次推送，旁观者也能收到"""
+        teacher = await self.connect()
+        await teacher.send({"type": "watch", "room": "a"})
+        fast = await self.connect()
+        slow = await self.connect()
+        for client, name in ((fast, "fast"), (slow, "slow")):
+            await client.send({"type": "join", "room": "a", "name": name,
+                               "text": "abcdefghij"})
+            await self.recv_type(client, "joined")
+
+        for char in "abcdefgh":
+            await fast.send({"type": "keys", "keys": char})
+        await slow.send({"type": "keys", "keys": "a"})
+        await asyncio.sleep(0.2)
+        self.assertLess(self.game.frames_sent, 3 * 8)
+
+        board = await self.recv_type(teacher, "leaderboard")
+        while board["players"] < 2 or board["entries"][0]["progress"] < 80:
+            board = await self.recv_type(teacher, "leaderboard")
+        self.assertEqual([e["name"] for e in board["entries"]], ["fast", "slow"])
+
+    async def test_achievements(self):
+        """测试节拍内批量求值成就，并只推送给解锁的玩家一次"""
+        amy = await self.connect()
+        bob = await self.connect()
+        await amy.send({"type": "join", "room": "c", "text": "abcdefgh",
+                        "passage": "hello"})
+        await bob.send({"type": "join", "room": "c", "text": "abcdefgh"})
+        await self.recv_type(amy, "joined")
+        await self.recv_type(bob, "joined")
+        await amy.send({"type": "keys", "keys": "abcdef"})
+        await bob.send({"type": "keys", "keys": "abcd"})
+        first = await self.recv_type(amy, "achievement")
+        second = await self.recv_type(amy, "achievement")
+        self.assertEqual({first["id"], second["id"]}, {"combo_5", "hello"})
+        await bob.send({"type": "keys", "keys": "e"})
+        unlocked = await self.recv_type(bob, "achievement")
+        self.assertEqual(unlocked["id"], "combo_5")
+        await amy.send({"type": "keys", "keys": "g"})
+        await asyncio.sleep(0.2)
+        self.assertEqual(self.game.achievements_unlocked, 3)
+
+    async def test_rejects_bad_messages(self):
+        """测试非法消息返回错误而不断开连接"""
+        client = await self.connect()
+        await client.send({"type": "keys", "keys": "a"})
+        error = await self.recv_type(client, "error")
+        self.assertIn("keys", error["error"])
+        await client.send({"type": "join", "room": "b"})
+        await self.recv_type(client, "error")
+        await client.send({"type": "join", "room": "b", "text": "ok"})
+        await self.recv_type(client, "joined")
+
+    async def test_deeply_nested_message(self):
+        """测试深层嵌套的消息返回错误而不是让连接处理协程崩溃"""
+        client = await self.connect()
+        client.writer.write(encode_frame(OP_TEXT, b"[" * 60000, mask=True))
+        await client.writer.drain()
+        error = await self.recv_type(client, "error")
+        self.assertIn("nested", error["error"])
+        await client.send({"type": "join", "room": "c", "text": "ok"})
+        await self.recv_type(client, "joined")
+
+    async def test_unmasked_frame_closes_with_1002(self):
+        """测试客户端发出未 mask 的帧时服务器以 1002 关闭连接"""
+        client = await self.connect()
+        client.writer.write(encode_frame(OP_TEXT, b'{"type": "state"}'))
+        await client.writer.drain()
+        _, opcode, payload = await asyncio.wait_for(read_frame(client.reader), 2)
+        self.assertEqual((opcode, payload), (OP_CLOSE, b"\x03\xea"))
+
+
+if __name__ == "__main__":
+    unittest.main()
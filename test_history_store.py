@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成绩历史库单元测试
+================
+
+验证 history_store 的写入、查询、崩溃恢复与合并
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from history_store import ENTRY_SIZE, HistoryStore
+
+
+class TestHistoryStore(unittest.TestCase):
+    """测试会话历史库"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_best_queries(self):
+        """测试每个用户 / 每段文本的最佳 WPM"""
+        with HistoryStore(self.directory) as store:
+            store.append(1, 10, wpm=30.0, accuracy=90.0)
+            store.append(1, 11, wpm=45.0, accuracy=95.0)
+            store.append(2, 10, wpm=50.0, accuracy=80.0)
+            store.flush()
+            self.assertEqual(len(store), 3)
+            self.assertEqual(store.best_for_user(1).wpm, 45.0)
+            self.assertEqual(store.best_for_passage(10).user_id, 2)
+            self.assertIsNone(store.best_for_user(3))
+
+    def test_concurrent_writers(self):
+        """测试多线程并发写入不丢记录"""
+        with HistoryStore(self.directory) as store:
+            def writer(user):
+                for i in range(500):
+                    store.append(user, i % 7, wpm=float(i), accuracy=100.0)
+
+            threads = [threading.Thread(target=writer, args=(u,)) for u in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            store.flush()
+            self.assertEqual(len(store), 4000)
+            self.assertEqual(store.best_for_user(5).wpm, 499.0)
+
+    def test_reopen_after_close(self):
+        """测试关闭后重新打开，索引从快照恢复"""
+        with HistoryStore(self.directory) as store:
+            for i in range(100):
+                store.append(i % 5, i, wpm=float(i), accuracy=99.0)
+        with HistoryStore(self.directory) as store:
+            self.assertEqual(len(store), 100)
+            self.assertEqual(store.best_for_user(4).wpm, 99.0)
+            self.assertEqual(len(list(store.iter_records())), 100)
+            store.append(0, 0, wpm=200.0, accuracy=99.0)
+        with HistoryStore(self.directory) as store:
+            self.assertEqual(len(store), 101)
+            self.assertEqual(store.best_for_user(0).wpm, 200.0)
+
+    def test_truncates_torn_tail(self):
+        """测试未正常关闭时截掉不完整的尾部记录"""
+        store = HistoryStore(self.directory)
+        store.append(1, 1, wpm=10.0, accuracy=100.0)
+        store.append(1, 2, wpm=20.0, accuracy=100.0)
+        store.flush()
+        path = store._segment_path(store._active_seq)
+        with open(path, "ab") as f:
+            f.write(b"\x00" * (ENTRY_SIZE - 3))
+        with HistoryStore(self.directory) as reopened:
+            self.assertEqual(len(reopened), 2)
+            self.assertEqual(os.path.getsize(path), 2 * ENTRY_SIZE)
+
+    def test_write_error_is_reported(self):
+        """测试写盘失败后 append / flush / close 抛出错误，flush 不会一直等待"""
+        store = HistoryStore(self.directory)
+        store._active.close()
+        # 模拟磁盘已满：写线程的下一次写入失败
+        store._active = open(os.devnull, "rb")
+        store.append(1, 1, wpm=10.0, accuracy=100.0)
+        with self.assertRaises(OSError):
+            store.flush(timeout=10)
+        with self.assertRaises(OSError):
+            store.append(1, 2, wpm=20.0, accuracy=100.0)
+        with self.assertRaises(OSError):
+            store.flush(timeout=10)
+        with self.assertRaises(OSError):
+            store.close()
+        self.assertFalse(store._writer.is_alive())
+
+    def test_rotation_and_compaction(self):
+        """测试段切分、后台合并与合并后的记录完整性"""
+        with HistoryStore(self.directory, segment_size=ENTRY_SIZE * 10,
+                          compact_after=3) as store:
+            for i in range(95):
+                store.append(i % 3, i % 4, wpm=float(i), accuracy=100.0)
+                if i % 10 == 9:
+                    store.flush()
+            store.flush()
+        segments = [n for n in os.listdir(self.directory) if n.endswith(".seg")]
+        self.assertLess(len(segments), 10)
+        with HistoryStore(self.directory) as store:
+            self.assertEqual(len(store), 95)
+            wpms = sorted(r.wpm for r in store.iter_records())
+            self.assertEqual(wpms, [float(i) for i in range(95)])
+            self.assertEqual(store.best_for_passage(2).wpm, 94.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点计时单元测试
+==============
+
+验证直方图、Prometheus 导出，以及开启 / 关闭计时包装
+"""
+
+import http.client
+import os
+import sys
+import threading
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import instrumentation
+import play
+from instrumentation import Histogram, Registry
+from typing_scoring import ScoringService, ScoringSession
+
+
+class TestHistogram(unittest.TestCase):
+    """测试直方图与导出格式"""
+
+    def test_quantiles(self):
+        """测试分位数取桶上界"""
+        histogram = Histogram((0.001, 0.01, 0.1))
+        for _ in range(90):
+            histogram.observe(0.0005)
+        for _ in range(10):
+            histogram.observe(0.05)
+        self.assertEqual(histogram.quantile(0.5), 0.001)
+        self.assertEqual(histogram.quantile(0.99), 0.1)
+        self.assertIsNone(Histogram().quantile(0.5))
+
+    def test_prometheus_text(self):
+        """测试累计桶、+Inf、_sum 与 _count"""
+        registry = Registry()
+        registry.histogram("fetch_seconds", 'source="a"', "Fetch time")
+        registry.observe("fetch_seconds", 0.003, 'source="a"')
+        registry.observe("fetch_seconds", 20.0, 'source="a"')
+        text = registry.render_prometheus()
+        self.assertIn("# HELP fetch_seconds Fetch time", text)
+        self.assertIn("# TYPE fetch_seconds histogram", text)
+        self.assertIn('fetch_seconds_bucket{source="a",le="0.005"} 1', text)
+        self.assertIn('fetch_seconds_bucket{source="a",le="+Inf"} 2', text)
+        self.assertIn('fetch_seconds_count{source="a"} 2', text)
+
+
+class TestEnableDisable(unittest.TestCase):
+    """测试热点方法的包装与还原"""
+
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_wraps_and_restores(self):
+        """测试开启时记录耗时，关闭后恢复原始方法"""
+        original = ScoringSession.__dict__["feed"]
+        registry = instrumentation.enable(Registry())
+        self.assertIsNot(ScoringSession.__dict__["feed"], original)
+
+        service = ScoringService()
+        session_id, _ = service.create("hello")
+        service.feed(session_id, "hel")
+        session = ScoringSession("abc")
+        session.feed("abc")
+        self.assertTrue(session.is_complete)
+        counts = {name: h.count for (name, _), h in registry.items()}
+        self.assertEqual(counts["typing_input_seconds"], 2)
+        self.assertEqual(counts["typing_level_start_seconds"], 1)
+
+        instrumentation.disable()
+        self.assertIs(ScoringSession.__dict__["feed"], original)
+        self.assertFalse(instrumentation.is_enabled())
+
+    def test_metrics_endpoint(self):
+        """测试线程模式服务器的 /metrics"""
+        registry = instrumentation.enable(Registry())
+        ScoringSession("abc").feed("a")
+        httpd = play.create_server(0, workers=2, host="127.0.0.1", metrics=registry)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1],
+                                              timeout=10)
+            conn.request("GET", "/metrics")
+            response = conn.getresponse()
+            body = response.read().decode("utf-8")
+            conn.close()
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        self.assertEqual(response.status, 200)
+        self.assertIn("text/plain", response.getheader("Content-Type"))
+        self.assertIn("typing_input_seconds_count 1", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+键盘布局查找表单元测试
+====================
+
+验证三种布局的键位 / 手指查表、磁盘缓存失效，以及批量指法代价
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import keyboard_layouts
+from keyboard_layouts import (
+    LAYOUTS, SHIFT_COST, UNKNOWN_COST, load_layout, locate_by_scan, passage_costs,
+    rank_passages
+)
+
+
+class TestLookupTables(unittest.TestCase):
+    """测试查找表"""
+
+    def test_matches_row_scan(self):
+        """测试每种布局下所有 ASCII 字符的查表结果与逐行查找一致"""
+        for name in LAYOUTS:
+            layout = load_layout(name, cache_path=None)
+            for point in range(128):
+                char = chr(point)
+                found = locate_by_scan(name, char)
+                highlight = layout.highlight(char)
+                if found is None:
+                    self.assertIsNone(highlight, (name, char))
+                else:
+                    self.assertEqual((highlight.key.code, highlight.finger,
+                                      highlight.shift), found, (name, char))
+
+    def test_highlighted_codes(self):
+        """测试大写字母由另一只手的 Shift 配合"""
+        qwerty = load_layout("qwerty", cache_path=None)
+        self.assertEqual(qwerty.highlighted_codes("a"), ["KeyA"])
+        self.assertEqual(qwerty.highlighted_codes("A"), ["ShiftRight", "KeyA"])
+        self.assertEqual(qwerty.highlighted_codes("J"), ["ShiftLeft", "KeyJ"])
+        self.assertEqual(qwerty.highlighted_codes("é"), [])
+        dvorak = load_layout("dvorak", cache_path=None)
+        self.assertEqual(dvorak.highlighted_codes("s"), ["Semicolon"])
+        self.assertEqual(dvorak.highlight("s").finger, "right pinky")
+        colemak = load_layout("colemak", cache_path=None)
+        self.assertEqual(colemak.highlight("t").key.code, "KeyF")
+
+    def test_disk_cache(self):
+        """测试缓存命中时不重新计算，定义变化后自动重建"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "layouts.json")
+            load_layout("colemak", path)
+            with open(path, encoding="utf-8") as f:
+                self.assertIn("colemak", json.load(f)["layouts"])
+            with mock.patch.object(keyboard_layouts, "build_tables") as build:
+                load_layout("colemak", path)
+                build.assert_not_called()
+            with mock.patch.object(keyboard_layouts, "SHIFT_COST", SHIFT_COST * 2):
+                layout = load_layout("colemak", path)
+            self.assertAlmostEqual(layout.cost[ord("A")], 2 * SHIFT_COST)
+            # 基准键也是定义的一部分
+            home = dict(keyboard_layouts.HOME_KEYS)
+            home[0] = "KeyQ"
+            with mock.patch.object(keyboard_layouts, "HOME_KEYS", home):
+                layout = load_layout("colemak", path)
+            self.assertGreater(layout.cost[ord("a")], 0)
+
+
+class TestPassageCosts(unittest.TestCase):
+    """测试批量指法代价"""
+
+    def setUp(self):
+        self.layout = load_layout("qwerty", cache_path=None)
+
+    def test_costs(self):
+        """测试基准键为 0、Shift 与同指连击加价、段之间互不影响"""
+        costs = passage_costs(["asdf", "aA", "", "fr", "é", "ftfr"], self.layout)
+        self.assertAlmostEqual(costs[0], 0.0)
+        self.assertAlmostEqual(costs[1], SHIFT_COST / 2)
+        self.assertEqual(costs[2], 0.0)
+        # f→r 同为左手食指：r 离基准键的距离 + 两键距离
+        r = self.layout.cost[ord("r")]
+        self.assertAlmostEqual(costs[3], 2 * r / 2, places=3)
+        self.assertAlmostEqual(costs[4], UNKNOWN_COST)
+        # 与分别计算一致：上一段的 f 不会和下一段开头的 f 连起来
+        for text, cost in zip(["fr", "ftfr"], costs[3::2]):
+            self.assertAlmostEqual(passage_costs([text], self.layout)[0], cost)
+
+    def test_python_fallback_and_ranking(self):
+        """测试纯 Python 回退结果一致，home row 文本排在前面"""
+        texts = ["jazz quiz", "a sad lass", "Pumpkin #42!", "flask"]
+        expected = list(passage_costs(texts, self.layout))
+        with mock.patch.object(keyboard_layouts, "np", None):
+            fallback = passage_costs(texts, self.layout)
+            self.assertEqual(rank_passages(texts, self.layout)[0], 1)
+        for a, b in zip(expected, fallback):
+            self.assertAlmostEqual(a, b)
+        self.assertEqual(rank_passages(texts, self.layout)[0], 1)
+        self.assertEqual(rank_passages(texts, self.layout)[-1], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
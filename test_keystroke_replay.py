@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量回放单元测试
+==============
+
+验证 keystroke_replay 的向量化与纯 Python 回放结果一致
+"""
+
+import os
+import sys
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import keystroke_replay
+from keystroke_replay import (
+    KeystrokeLog, key_error_rates, replay_batch, replay_python, synthesize_logs
+)
+
+
+class TestReplayPython(unittest.TestCase):
+    """测试纯 Python 回放"""
+
+    def test_single_log(self):
+        """测试一条含错误与退格的记录"""
+        log = KeystrokeLog("abc", "ax\bbc", [0.0, 1.0, 2.0, 3.0, 6.0])
+        result = replay_python(log)
+        self.assertEqual(result["correct_chars"], 3)
+        self.assertEqual(result["incorrect_chars"], 1)
+        self.assertAlmostEqual(result["accuracy"], 75.0)
+        self.assertEqual(result["max_combo"], 2)
+        # 3 字符 / 5 / 0.1 分钟
+        self.assertAlmostEqual(result["wpm"], 6.0)
+        self.assertEqual(result["key_errors"]["b"], (1, 2))
+        self.assertEqual(key_error_rates(result)["b"], 0.5)
+
+    def test_empty_log(self):
+        """测试没有按键的记录"""
+        result = replay_python(KeystrokeLog("abc", "", []))
+        self.assertEqual(result["wpm"], 0.0)
+        self.assertEqual(result["accuracy"], 100.0)
+
+
+@unittest.skipIf(keystroke_replay.np is None, "NumPy not installed")
+class TestReplayNumpy(unittest.TestCase):
+    """测试向量化回放与纯 Python 一致"""
+
+    def test_matches_python(self):
+        """测试随机记录与边界记录"""
+        logs = synthesize_logs(200, length=60, error_rate=0.2)
+        logs += [
+            KeystrokeLog("abc", "\b\bab#\bc", [0, 1, 2, 3, 4, 5, 6]),
+            KeystrokeLog("abc", "abcdd", [0, 1, 2, 3, 4]),
+            KeystrokeLog("abcabc", "ab#cab\b\bx", list(range(9))),
+            KeystrokeLog("abc", "", []),
+        ]
+        vectorized = replay_batch(logs, use_numpy=True)
+        expected = [replay_python(log) for log in logs]
+        self.assertEqual(vectorized, expected)
+
+
+class TestReplayBatch(unittest.TestCase):
+    """测试批量接口"""
+
+    def test_processes_preserve_order(self):
+        """测试多进程模式结果顺序与单进程一致"""
+        logs = synthesize_logs(30, length=40)
+        serial = replay_batch(logs, use_numpy=False)
+        parallel = replay_batch(logs, processes=2, use_numpy=False, chunk_size=7)
+        self.assertEqual(serial, parallel)
+
+
+if __name__ == "__main__":
+    unittest.main()
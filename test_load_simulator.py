@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+负载模拟器单元测试
+================
+
+验证学生分布可复现、按键批次能还原文本，以及各压测目标的报告
+"""
+
+import asyncio
+import http.server
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from game_server import OP_CLOSE, encode_frame, handshake_response, read_message
+from load_simulator import (
+    HttpTarget, TypistProfile, WebSocketTarget, draw_profiles, keystroke_batches,
+    run_benchmark, write_report
+)
+from typing_scoring import ScoringSession
+
+
+class TestTypists(unittest.TestCase):
+    """测试模拟学生"""
+
+    def test_profiles_are_reproducible(self):
+        """测试相同种子得到相同的学生，分布均值接近配置"""
+        profiles = draw_profiles(2000, wpm=50, wpm_sd=10, error_rate=0.1, seed=4)
+        self.assertEqual(profiles, draw_profiles(2000, wpm=50, wpm_sd=10,
+                                                 error_rate=0.1, seed=4))
+        mean_wpm = sum(p.wpm for p in profiles) / len(profiles)
+        mean_errors = sum(p.error_rate for p in profiles) / len(profiles)
+        self.assertAlmostEqual(mean_wpm, 50, delta=1)
+        self.assertAlmostEqual(mean_errors, 0.1, delta=0.01)
+
+    def test_batches_replay_the_passage(self):
+        """测试批次按速度切分，改正错误后正好打完全文"""
+        text = "the quick brown fox jumps over the lazy dog"
+        profile = TypistProfile(wpm=30, error_rate=0.2)
+        batches = list(keystroke_batches(text, profile, random.Random(1), interval=0.2))
+        # 30 WPM = 2.5 字符/秒，每批平均 0.5 个字符
+        self.assertEqual(len(batches), 2 * len(text))
+        session = ScoringSession(text)
+        session.feed("".join(batches))
+        self.assertTrue(session.is_complete)
+        self.assertEqual(session.errors, 0)
+        self.assertGreater(session.incorrect_chars, 0)
+
+
+class TestSimulation(unittest.TestCase):
+    """测试短时间模拟"""
+
+    def check_report(self, report, students):
+        summary = report["summary"]
+        self.assertEqual(report["config"]["students"], students)
+        self.assertGreater(summary["batches"], 0)
+        self.assertEqual(summary["failures"], 0)
+        self.assertGreater(summary["rss_peak_mb"], 0)
+        self.assertTrue(report["timeline"])
+        self.assertGreaterEqual(summary["p99_ms"], summary["p50_ms"])
+
+    def test_engine_target(self):
+        """测试直接驱动计分引擎，报告可以写成 JSON"""
+        report = run_benchmark(students=50, duration=1.5, target="engine",
+                               wpm=60, sample_interval=0.5)
+        self.check_report(report, 50)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "report.json")
+            write_report(report, path)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f)["summary"], report["summary"])
+
+    def test_network_targets(self):
+        """测试经由 HTTP 计分接口与 WebSocket 游戏服务器"""
+        for target in ("http", "ws"):
+            with self.subTest(target=target):
+                report = run_benchmark(students=20, duration=1.5, target=target,
+                                       wpm=60, sample_interval=0.5)
+                self.check_report(report, 20)
+                self.assertTrue(report["config"]["server_in_process"])
+
+
+async def _read_headers(reader):
+    headers = {}
+    await reader.readline()
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+
+async def _closing_game_server(reader, writer):
+    """应答加入房间，收到第一批按键后发送关闭帧（连接保持打开）"""
+    writer.write(handshake_response(await _read_headers(reader)))
+    await read_message(reader, writer)
+    writer.write(encode_frame(0x1, json.dumps({"type": "joined"}).encode("utf-8")))
+    await read_message(reader, writer)
+    writer.write(encode_frame(OP_CLOSE, b"\x03\xe8"))
+    await asyncio.sleep(30)
+
+
+async def _silent_server(reader, writer):
+    """读取请求但从不回复"""
+    await _read_headers(reader)
+    await asyncio.sleep(30)
+
+
+class TestBrokenServers(unittest.TestCase):
+    """测试服务器断开或不回复时，按键批次计为失败而不是一直等待"""
+
+    def drive(self, target_class, handler, **kwargs):
+        async def run():
+            server = await asyncio.start_server(handler, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            target = target_class(1, url=f"http://127.0.0.1:{port}", **kwargs)
+            await target.start()
+            try:
+                handle = await target.open("hello world")
+                await target.send(handle, "hello")
+            finally:
+                server.close()
+                await target.stop()
+
+        asyncio.run(run())
+
+    def test_websocket_closed_before_reply(self):
+        """测试连接关闭后，等待 state 的 send 立即失败"""
+        began = time.perf_counter()
+        with self.assertRaises(ConnectionError):
+            self.drive(WebSocketTarget, _closing_game_server, timeout=30)
+        self.assertLess(time.perf_counter() - began, 10)
+
+    def test_reply_timeout(self):
+        """测试服务器不回复时在 timeout 后失败"""
+        for target_class in (WebSocketTarget, HttpTarget):
+            with self.subTest(target=target_class.name):
+                began = time.perf_counter()
+                with self.assertRaises(asyncio.TimeoutError):
+                    self.drive(target_class, _silent_server, timeout=0.2)
+                self.assertLess(time.perf_counter() - began, 10)
+
+    def test_unparsable_replies_count_as_failures(self):
+        """测试非 JSON 或损坏的回复计为失败，模拟照常结束并给出报告"""
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                broken = self.path.endswith("broken")
+                body = b"{not json" if broken else b"501 Not Implemented\n"
+                self.send_response(201 if broken else 501)
+                self.send_header("Content-Type",
+                                 "application/json" if broken else "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{httpd.server_address[1]}"
+            report = run_benchmark(students=3, duration=0.5, target="http", url=url,
+                                   sample_interval=0.25)
+            self.assertGreater(report["summary"]["failures"], 0)
+
+            async def broken():
+                target = HttpTarget(1, url=url)
+                await target.start()
+                try:
+                    await target.request("POST", "/broken", {})
+                finally:
+                    await target.stop()
+
+            with self.assertRaises(ValueError):
+                asyncio.run(broken())
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
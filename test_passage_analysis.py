@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+练习文本分析缓存单元测试
+======================
+
+验证分析结果与各模块原有推导一致、LRU 按字符数淘汰，以及磁盘缓存的读写和版本失效
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import passage_analysis
+from content_corpus import charset_mask
+from passage_analysis import AnalysisCache, analyze_passage, passage_digest
+from passage_tokens import tokenize_passage
+from readability import readability_grade, tag_passage
+
+
+class TestAnalyzePassage(unittest.TestCase):
+    """测试单段文本分析"""
+
+    def test_matches_existing_derivations(self):
+        """测试分段、字符集、年级难度与原有函数一致"""
+        text = "The Cat sat on 2 mats. Don't stop!"
+        analysis = analyze_passage(text)
+        self.assertEqual(analysis.segments, tokenize_passage(text))
+        self.assertEqual(analysis.words, 8)
+        self.assertEqual(analysis.charset, charset_mask(text))
+        self.assertEqual((analysis.grade, analysis.difficulty, analysis.charset),
+                         tag_passage(text))
+        self.assertAlmostEqual(analysis.readability, readability_grade(text))
+        self.assertEqual(sum(analysis.histogram), len(text))
+        self.assertEqual(analysis.class_counts()["upper"], 3)
+        self.assertEqual(analysis.class_counts()["digit"], 1)
+        self.assertIn("th", analysis.bigrams)
+        self.assertNotIn("Th", analysis.bigrams)
+
+    def test_payload(self):
+        """测试开局响应字段"""
+        payload = analyze_passage("hi there").payload()
+        self.assertEqual([s["kind"] for s in payload["segments"]], ["word", "space", "word"])
+        self.assertEqual(payload["passage"]["words"], 2)
+        self.assertEqual(payload["passage"]["length"], 8)
+
+    def test_does_not_import_build_pipeline(self):
+        """测试导入分析模块不会连带加载文本包构建流水线"""
+        code = ("import sys, passage_analysis; "
+                "print(any(m in sys.modules for m in ('passage_packs', 'report_engine')))")
+        root = os.path.dirname(os.path.abspath(__file__))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "False")
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """测试内存与磁盘缓存"""
+
+    def test_lru_bounded_by_chars(self):
+        """测试命中计数，以及超过字符数上限时淘汰最久未用的结果"""
+        cache = AnalysisCache(max_chars=20)
+        first = cache.get("a" * 8)
+        self.assertIs(cache.get("a" * 8), first)
+        cache.get("b" * 8)
+        cache.get("a" * 8)
+        cache.get("c" * 8)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+        self.assertEqual((stats["entries"], stats["chars"]), (2, 16))
+        cache.get("a" * 8)
+        self.assertEqual(cache.stats()["hits"], 3)
+        cache.get("b" * 8)
+        self.assertEqual(cache.stats()["misses"], 4)
+
+    def test_disk_cache_roundtrip_and_version(self):
+        """测试重启后从磁盘读取，版本不符时重新计算"""
+        text = "Quick brown fox, 42 times."
+        with tempfile.TemporaryDirectory() as tmp:
+            expected = AnalysisCache(cache_dir=tmp).get(text)
+            reader = AnalysisCache(cache_dir=tmp)
+            self.assertEqual(reader.get(text), expected)
+            self.assertEqual(reader.stats()["disk_hits"], 1)
+            self.assertEqual(os.listdir(tmp), [f"{passage_digest(text)}.json"])
+
+            path = os.path.join(tmp, os.listdir(tmp)[0])
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            data["version"] = passage_analysis.ANALYSIS_VERSION + 1
+            data["words"] = -1
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            stale = AnalysisCache(cache_dir=tmp)
+            self.assertEqual(stale.get(text), expected)
+            self.assertEqual(stale.stats()["misses"], 1)
+
+    def test_disk_cache_bounded_by_files(self):
+        """测试磁盘缓存超过文件数上限时删除最早写入的结果，重启后仍然有效"""
+        texts = [f"passage number {i}" for i in range(5)]
+        names = [f"{passage_digest(text)}.json" for text in texts]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = AnalysisCache(cache_dir=tmp, max_files=3)
+            for text in texts:
+                cache.get(text)
+            self.assertEqual(sorted(os.listdir(tmp)), sorted(names[2:]))
+            self.assertEqual(cache.stats()["files"], 3)
+
+            for age, name in enumerate(reversed(names[2:])):
+                os.utime(os.path.join(tmp, name), (1_000_000 - age, 1_000_000 - age))
+            AnalysisCache(cache_dir=tmp, max_files=2)
+            self.assertEqual(sorted(os.listdir(tmp)), sorted(names[3:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
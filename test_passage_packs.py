@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+练习文本包单元测试
+================
+
+验证规范化、去重、年级标注、增量构建，以及服务器对文本包的缓存头
+"""
+
+import gzip
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import play
+from asset_cache import IMMUTABLE_CACHE_CONTROL
+from pack_store import MANIFEST_NAME, PackStore
+from passage_packs import build_packs, normalize, split_passages, tag_passage
+
+EASY = "The cat sat on the mat. The dog ran to the sun."
+HARD = ("Consequently, extraordinary environmental considerations necessitated "
+        "comprehensive international collaboration.")
+
+
+class TestTextProcessing(unittest.TestCase):
+    """测试文本处理"""
+
+    def test_normalize(self):
+        """测试排版符号替换与空白合并"""
+        self.assertEqual(normalize("“Don’t”  stop —\n now…"),
+                         '"Don\'t" stop - now...')
+
+    def test_split_passages(self):
+        """测试按空行分段、长段按句拆分、短段丢弃"""
+        long_paragraph = " ".join(["This sentence is long enough to count."] * 12)
+        passages = split_passages(f"{EASY}\n\n  too short \n\n{long_paragraph}")
+        self.assertEqual(passages[0], EASY)
+        self.assertGreater(len(passages), 2)
+        self.assertTrue(all(20 <= len(p) <= 280 for p in passages))
+
+    def test_tagging(self):
+        """测试简单文本年级低于复杂文本，大写与标点提高难度"""
+        easy_grade, easy_difficulty, _ = tag_passage(EASY.lower().replace(".", ""))
+        hard_grade, hard_difficulty, _ = tag_passage(HARD)
+        self.assertEqual(easy_grade, 1)
+        self.assertEqual(hard_grade, 6)
+        self.assertLess(easy_difficulty, hard_difficulty)
+
+
+class TestBuild(unittest.TestCase):
+    """测试构建与服务"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.sources = os.path.join(self._tmp.name, "sources")
+        self.output = os.path.join(self._tmp.name, "packs")
+        os.makedirs(self.sources)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, name, content):
+        with open(os.path.join(self.sources, name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def manifest(self):
+        with open(os.path.join(self.output, MANIFEST_NAME)) as f:
+            return json.load(f)
+
+    def test_incremental_build(self):
+        """测试去重、只处理改动的源文件、重建后旧包被删除"""
+        self.write("a.txt", f"{EASY}\n\n{HARD}")
+        self.write("b.txt", f"{EASY.upper()}")
+        result = build_packs(self.sources, self.output)
+        self.assertEqual((result.passages, result.duplicates, result.processed),
+                         (2, 1, 2))
+        first = self.manifest()
+        self.assertEqual(first["build"], 1)
+        with gzip.open(os.path.join(self.output, first["packs"]["1"]["file"])) as f:
+            passage = json.load(f)["passages"][0]
+        self.assertEqual(passage["text"], EASY)
+        self.assertGreater(passage["effort"], 0)
+
+        result = build_packs(self.sources, self.output)
+        self.assertEqual((result.processed, result.written, result.build), (0, 0, 1))
+
+        self.write("b.txt", "A fish can swim in the big blue sea all day.")
+        result = build_packs(self.sources, self.output)
+        self.assertEqual((result.processed, result.written, result.removed), (1, 1, 1))
+        second = self.manifest()
+        self.assertEqual(second["build"], 2)
+        self.assertNotEqual(first["packs"]["1"]["file"], second["packs"]["1"]["file"])
+        self.assertEqual(second["packs"]["6"], first["packs"]["6"])
+
+    def test_served_with_long_lived_caching(self):
+        """测试文本包以 gzip + immutable 返回，manifest 需要重新验证"""
+        self.write("a.txt", f"{EASY}\n\n{HARD}")
+        build_packs(self.sources, self.output)
+        pack_file = self.manifest()["packs"]["6"]["file"]
+        httpd = play.create_server(0, workers=2, host="127.0.0.1",
+                                   packs=PackStore(self.output))
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            def get(path, headers=None):
+                conn = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1],
+                                                  timeout=10)
+                conn.request("GET", path, headers=headers or {})
+                response = conn.getresponse()
+                body = response.read()
+                conn.close()
+                return response, body
+
+            response, body = get(f"/packs/{pack_file}", {"Accept-Encoding": "gzip"})
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.getheader("Cache-Control"), IMMUTABLE_CACHE_CONTROL)
+            self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+            self.assertEqual(json.loads(gzip.decompress(body))["grade"], 6)
+
+            response, body = get(f"/packs/{pack_file}")
+            self.assertEqual(json.loads(body)["passages"][0]["text"], HARD)
+
+            response, _ = get("/packs/manifest.json")
+            self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+            etag = response.getheader("ETag")
+            response, _ = get("/packs/manifest.json", {"If-None-Match": etag})
+            self.assertEqual(response.status, 304)
+            response, _ = get("/packs/grade-9.0000000000000000.json.gz")
+            self.assertEqual(response.status, 404)
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+练习文本分段单元测试
+==================
+
+验证分段覆盖全文、id 稳定，以及增量渲染与整段重建结果一致
+"""
+
+import os
+import random
+import sys
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from passage_tokens import DisplayState, full_render, tokenize_passage
+
+
+class TestTokenize(unittest.TestCase):
+    """测试文本分段"""
+
+    def test_segments_cover_text(self):
+        """测试段首尾相接、覆盖全文，类型正确"""
+        text = "Don't stop -- it's  3.5x faster!\n"
+        segments = tokenize_passage(text)
+        self.assertEqual(segments[0].start, 0)
+        self.assertEqual(segments[-1].end, len(text))
+        for before, after in zip(segments, segments[1:]):
+            self.assertEqual(before.end, after.start)
+        self.assertEqual([s.id for s in segments], [f"s{i}" for i in range(len(segments))])
+        pieces = [(text[s.start:s.end], s.kind) for s in segments]
+        self.assertEqual(pieces[:5], [("Don't", "word"), (" ", "space"), ("stop", "word"),
+                                      (" ", "space"), ("-", "punct")])
+        self.assertIn(("  ", "space"), pieces)
+
+
+class TestDisplayState(unittest.TestCase):
+    """测试增量渲染"""
+
+    def render(self, state):
+        return "".join(f'<span class="char {state.class_of(i)}">{ch}</span>'
+                       for i, ch in enumerate(state.text))
+
+    def test_patch_matches_full_render(self):
+        """测试随机输入、退格、粘贴后增量结果与整段重建一致"""
+        rng = random.Random(7)
+        text = "the quick brown fox jumps over the lazy dog"
+        state = DisplayState(text)
+        typed = ""
+        for _ in range(300):
+            action = rng.random()
+            if action < 0.6:
+                typed += text[len(typed)] if len(typed) < len(text) and rng.random() < 0.8 else "#"
+            elif action < 0.85:
+                typed = typed[:-rng.randint(1, 3)]
+            else:
+                cut = rng.randint(0, len(typed))
+                typed = typed[:cut] + "xy" + typed[cut:]
+            typed = typed[:len(text) + 2]
+            changed = state.update(typed)
+            self.assertEqual(changed, sorted(set(changed)))
+            self.assertEqual(self.render(state), full_render(text, typed))
+            expected_errors = sum(a != b for a, b in zip(typed, text))
+            self.assertEqual(state.errors, expected_errors)
+
+    def test_only_changed_spans(self):
+        """测试追加一个字符只修改一个 span"""
+        state = DisplayState("abcdef")
+        self.assertEqual(state.update("abc"), [0, 1, 2])
+        self.assertEqual(state.update("abcd"), [3])
+        self.assertEqual(state.update("ab"), [2, 3])
+        self.assertEqual(state.cursor, 2)
+
+    def test_combo_outside_render(self):
+        """测试连击只由新敲入的字符决定，退格不重置"""
+        state = DisplayState("abcdef")
+        state.update("abc")
+        self.assertEqual(state.combo, 3)
+        state.update("abcx")
+        self.assertEqual((state.combo, state.max_combo), (0, 3))
+        state.update("abc")
+        self.assertEqual(state.combo, 0)
+        state.update("abcdef")
+        self.assertEqual((state.combo, state.max_combo), (3, 3))
+        self.assertIsNone(state.cursor)
+        self.assertNotIn("current", self.render(state))
+
+
+if __name__ == "__main__":
+    unittest.main()
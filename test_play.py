@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动器单元测试
+============
+
+验证 play.py 静态服务器各服务模式的行为
+"""
+
+import gzip
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import play
+from asset_cache import AssetCache, parse_accept_encoding
+from async_server import AsyncServerThread
+from scoring_api import MAX_PASSAGE_LENGTH
+
+
+class ServerTestCase(unittest.TestCase):
+    """在临时端口上启动服务器的测试基类"""
+
+    workers = None
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        os.chdir(self.serve_root())
+        self.httpd = play.create_server(0, self.workers, host="127.0.0.1",
+                                        asset_cache=self.make_cache())
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def serve_root(self):
+        return os.path.dirname(os.path.abspath(__file__))
+
+    def make_cache(self):
+        return None
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        os.chdir(self._cwd)
+
+    def connect(self):
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+
+
+class TestThreadPoolServer(ServerTestCase):
+    """测试线程池 + 持久连接模式"""
+
+    workers = 4
+
+    def test_keep_alive_reuses_connection(self):
+        """测试同一连接上连续请求"""
+        conn = self.connect()
+        for _ in range(3):
+            conn.request("GET", "/modern-demo.html")
+            response = conn.getresponse()
+            body = response.read()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.version, 11)
+            self.assertFalse(response.will_close)
+            self.assertIn(b"<html", body)
+        conn.close()
+
+    def test_concurrent_clients(self):
+        """测试并发客户端多于工作线程时全部成功"""
+        latencies, _, _, failed = play.run_load(self.port, 10, 3)
+        self.assertEqual(failed, 0)
+        self.assertEqual(len(latencies), 30)
+
+
+class TestScoreApi(ServerTestCase):
+    """测试计分 JSON 接口"""
+
+    workers = 2
+
+    def call(self, method, path, payload=None):
+        conn = self.connect()
+        body = None if payload is None else json.dumps(payload)
+        conn.request(method, path, body=body,
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        data = response.read()
+        conn.close()
+        return response.status, json.loads(data) if data else None
+
+    def test_segments_without_session(self):
+        """测试分段接口不创建计分会话"""
+        status, data = self.call("POST", "/api/segments", {"text": "hi there"})
+        self.assertEqual(status, 200)
+        self.assertEqual([s["kind"] for s in data["segments"]], ["word", "space", "word"])
+        self.assertNotIn("session", data)
+        self.assertEqual(len(self.httpd.scoring), 0)
+        status, _ = self.call("POST", "/api/segments", {})
+        self.assertEqual(status, 400)
+
+    def test_passage_length_limit(self):
+        """测试过长的练习文本被拒绝，不做分析也不创建会话"""
+        text = "a" * (MAX_PASSAGE_LENGTH + 1)
+        for path in ("/api/segments", "/api/score"):
+            with self.subTest(path=path):
+                status, _ = self.call("POST", path, {"text": text})
+                self.assertEqual(status, 400)
+        self.assertEqual(len(self.httpd.scoring), 0)
+
+    def test_session_roundtrip(self):
+        """测试创建会话、追加按键与读取统计"""
+        status, created = self.call("POST", "/api/score", {"text": "typing"})
+        self.assertEqual(status, 201)
+        self.assertEqual(created["segments"],
+                         [{"id": "s0", "kind": "word", "start": 0, "end": 6}])
+        self.assertEqual(created["passage"]["words"], 1)
+        session = created["session"]
+
+        status, stats = self.call("POST", f"/api/score/{session}", {"keys": "tyx"})
+        self.assertEqual(status, 200)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["combo"], 0)
+        self.assertEqual(stats["max_combo"], 2)
+
+        status, stats = self.call("GET", f"/api/score/{session}")
+        self.assertEqual(stats["position"], 3)
+
+        status, _ = self.call("DELETE", f"/api/score/{session}")
+        self.assertEqual(status, 204)
+        status, _ = self.call("GET", f"/api/score/{session}")
+        self.assertEqual(status, 404)
+
+    def test_prefix_lookalikes_are_not_sessions(self):
+        """测试 /api/scoreboard 等路径不被当作计分会话"""
+        status, _ = self.call("POST", "/api/score?lang=en", {"text": "ok"})
+        self.assertEqual(status, 201)
+        for method, path in (("GET", "/api/scoreboard"), ("POST", "/api/scores.json"),
+                             ("DELETE", "/api/score1")):
+            conn = self.connect()
+            conn.request(method, path, body=b"{}")
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            self.assertIn(response.status, (404, 501), path)
+            self.assertNotEqual(response.getheader("Content-Type"), "application/json")
+        self.assertEqual(len(self.httpd.scoring), 1)
+
+    def test_bad_requests(self):
+        """测试缺少文本与非法 JSON"""
+        status, _ = self.call("POST", "/api/score", {})
+        self.assertEqual(status, 400)
+        conn = self.connect()
+        conn.request("POST", "/api/score", body="{not json")
+        self.assertEqual(conn.getresponse().status, 400)
+        conn.close()
+
+
+class TestLegacyServer(ServerTestCase):
+    """测试默认单线程模式保持不变"""
+
+    def test_http10_response(self):
+        """测试默认模式仍为 HTTP/1.0"""
+        conn = self.connect()
+        conn.request("GET", "/modern-demo.html")
+        response = conn.getresponse()
+        response.read()
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.will_close)
+        conn.close()
+
+
+class TestAssetCache(ServerTestCase):
+    """测试内存缓存、压缩协商与条件请求"""
+
+    workers = 2
+
+    def serve_root(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.page = os.path.join(self._tmp.name, "page.html")
+        with open(self.page, "w", encoding="utf-8") as f:
+            f.write("<html>" + "typing practice " * 100 + "</html>")
+        return self._tmp.name
+
+    def make_cache(self):
+        self.cache = AssetCache(self._tmp.name)
+        self.cache.refresh()
+        return self.cache
+
+    def tearDown(self):
+        super().tearDown()
+        self._tmp.cleanup()
+
+    def get(self, headers=None):
+        conn = self.connect()
+        conn.request("GET", "/page.html", headers=headers or {})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response, body
+
+    def test_gzip_negotiation(self):
+        """测试按 Accept-Encoding 返回 gzip 版本"""
+        response, body = self.get({"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertIn(b"typing practice", gzip.decompress(body))
+
+        response, body = self.get()
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertTrue(body.startswith(b"<html>"))
+
+    def test_if_none_match(self):
+        """测试 ETag 命中时返回 304"""
+        response, _ = self.get()
+        etag = response.getheader("ETag")
+        self.assertTrue(etag.startswith('"'))
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+
+        response, body = self.get({"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+
+    def test_refresh_invalidates_changed_file(self):
+        """测试文件修改后缓存失效"""
+        response, _ = self.get()
+        old_etag = response.getheader("ETag")
+        time.sleep(0.01)
+        with open(self.page, "w", encoding="utf-8") as f:
+            f.write("<html>edited</html>")
+        self.assertEqual(self.cache.refresh(), 1)
+
+        response, body = self.get({"If-None-Match": old_etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<html>edited</html>")
+
+    def test_parse_accept_encoding(self):
+        """测试 Accept-Encoding 解析"""
+        self.assertEqual(parse_accept_encoding("gzip;q=0.5, br"),
+                         {"gzip": 0.5, "br": 1.0})
+        asset = self.cache.get(self.page)
+        self.assertEqual(asset.negotiate("gzip;q=0, identity")[0], "identity")
+
+
+class TestAsyncScoreApi(TestScoreApi):
+    """测试 asyncio 引擎上的同一组计分接口"""
+
+    def setUp(self):
+        self.server = AsyncServerThread(self.serve_root())
+        self.port = self.server.start()
+        self.httpd = self.server.server
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_keep_alive_across_api_calls(self):
+        """测试读取请求体后同一连接可继续使用"""
+        conn = self.connect()
+        for text in ("one", "two"):
+            conn.request("POST", "/api/segments", body=json.dumps({"text": text}))
+            response = conn.getresponse()
+            self.assertEqual(json.loads(response.read())["passage"]["length"], 3)
+            self.assertFalse(response.will_close)
+        conn.close()
+
+
+class TestAsyncioEngine(unittest.TestCase):
+    """测试 asyncio 服务引擎"""
+
+    def setUp(self):
+        root = os.path.dirname(os.path.abspath(__file__))
+        self.server = AsyncServerThread(root)
+        self.port = self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_ready_and_keep_alive(self):
+        """测试就绪后立即可用，且同一连接可连续请求"""
+        self.assertTrue(self.server.ready.is_set())
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        size = os.path.getsize("modern-demo.html")
+        for method in ("GET", "HEAD", "GET"):
+            conn.request(method, "/modern-demo.html")
+            response = conn.getresponse()
+            body = response.read()
+            self.assertEqual(response.status, 200)
+            self.assertFalse(response.will_close)
+            self.assertEqual(int(response.getheader("Content-Length")), size)
+            self.assertEqual(len(body), 0 if method == "HEAD" else size)
+        conn.close()
+
+    def test_stalled_headers_time_out(self):
+        """测试只发送部分请求头后停下的连接在超时后被关闭"""
+        self.server.server.keepalive_timeout = 0.3
+        with socket.create_connection(("127.0.0.1", self.port), timeout=10) as sock:
+            sock.sendall(b"GET / HTTP/1.1\r\nHost: x\r\n")
+            began = time.perf_counter()
+            self.assertEqual(sock.recv(1024), b"")
+            self.assertLess(time.perf_counter() - began, 5)
+
+    def test_directory_redirect(self):
+        """测试目录缺少结尾斜杠时重定向（文件查找在线程池中进行）"""
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        conn.request("GET", "/src")
+        response = conn.getresponse()
+        response.read()
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/src/")
+        conn.close()
+
+    def test_not_found_and_traversal(self):
+        """测试缺失文件与目录穿越返回 404"""
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        for path in ("/missing.html", "/../../etc/passwd"):
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            self.assertEqual(response.status, 404)
+        conn.close()
+
+
+class TestBenchmarkHelpers(unittest.TestCase):
+    """测试压测辅助函数"""
+
+    def test_percentile(self):
+        """测试百分位数计算"""
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(play.percentile(values, 50), 50.0)
+        self.assertEqual(play.percentile(values, 99), 99.0)
+        self.assertEqual(play.percentile([], 50), 0.0)
+
+    def test_parse_args_rejects_zero_workers(self):
+        """测试拒绝无效的工作线程数"""
+        with self.assertRaises(SystemExit):
+            play.parse_args(["--workers", "0"])
+
+
+class TestStartup(unittest.TestCase):
+    """测试快速启动路径"""
+
+    def test_bind_skips_taken_port(self):
+        """测试首选端口被占用时绑定下一个端口"""
+        with play.bind_socket(0) as taken:
+            port = taken.getsockname()[1]
+            with play.bind_socket(port) as sock:
+                self.assertNotEqual(sock.getsockname()[1], port)
+
+    def test_server_adopts_bound_socket(self):
+        """测试服务器直接接管已监听的套接字，无需等待即可响应"""
+        sock = play.bind_socket(0, host="127.0.0.1")
+        port = sock.getsockname()[1]
+        httpd = play.create_server(port, workers=2, sock=sock)
+        self.assertIs(httpd.socket, sock)
+        # serve_forever 开始之前连接已可建立，请求在监听队列中等待
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.connect()
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            conn.request("GET", "/")
+            response = conn.getresponse()
+            response.read()
+            self.assertEqual(response.status, 200)
+        finally:
+            conn.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+    def test_launcher_does_not_import_engines(self):
+        """测试启动器本身不导入 http.server / asyncio"""
+        code = ("import sys, play; "
+                "print(any(m in sys.modules for m in ('http.server', 'asyncio')))")
+        root = os.path.dirname(os.path.abspath(__file__))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "False")
+
+
+if __name__ == "__main__":
+    unittest.main()
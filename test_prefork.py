@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预派生服务单元测试
+================
+
+验证多个工作进程共享端口、请求计数汇总与崩溃重启
+"""
+
+import http.client
+import os
+import signal
+import sys
+import unittest
+from unittest import mock
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import play
+from prefork import PreforkSupervisor, reuseport_supported
+
+
+def fetch(port, path="/modern-demo.html"):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+@unittest.skipUnless(reuseport_supported(), "SO_REUSEPORT / fork not available")
+class TestPreforkSupervisor(unittest.TestCase):
+    """测试预派生监督者"""
+
+    def setUp(self):
+        self.supervisor = PreforkSupervisor(2, host="127.0.0.1")
+        self.port = self.supervisor.start()
+
+    def tearDown(self):
+        self.supervisor.stop()
+
+    def test_serves_and_counts(self):
+        """测试各进程处理的请求数汇总正确，计分接口在预派生模式下关闭"""
+        for _ in range(10):
+            status, body = fetch(self.port)
+            self.assertEqual(status, 200)
+            self.assertIn(b"<html", body.lower())
+        self.assertEqual(fetch(self.port, "/api/score/1")[0], 404)
+        stats = self.supervisor.stats()
+        self.assertEqual(stats["requests"], 11)
+        self.assertEqual(len({w["pid"] for w in stats["workers"]}), 2)
+        self.assertTrue(all(w["alive"] for w in stats["workers"]))
+
+    def test_restarts_crashed_worker(self):
+        """测试被杀死的工作进程被重启，计数不清零，端口继续可用"""
+        fetch(self.port)
+        before = self.supervisor.stats()
+        victim = before["workers"][0]["pid"]
+        os.kill(victim, signal.SIGKILL)
+        self.assertEqual(self.supervisor.check(timeout=5), [0])
+        after = self.supervisor.stats()
+        self.assertNotEqual(after["workers"][0]["pid"], victim)
+        self.assertEqual(after["restarts"], 1)
+        self.assertEqual(after["requests"], before["requests"])
+        for _ in range(5):
+            self.assertEqual(fetch(self.port)[0], 200)
+
+
+class TestArguments(unittest.TestCase):
+    """测试 play.py 的 --processes 参数"""
+
+    def test_invalid_combinations(self):
+        """测试 --processes 不能与 asyncio 引擎或压测一起使用"""
+        self.assertEqual(play.parse_args(["--processes", "4"]).processes, 4)
+        for argv in (["--processes", "0"], ["--processes", "2", "--engine", "asyncio"],
+                     ["--processes", "2", "--bench"]):
+            with self.assertRaises(SystemExit), \
+                    open(os.devnull, "w") as devnull, \
+                    mock.patch("sys.stderr", devnull):
+                play.parse_args(argv)
+
+
+if __name__ == "__main__":
+    unittest.main()
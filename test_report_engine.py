@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比报告引擎单元测试
+==================
+
+验证分块行数统计、扫描缓存与逐节写出报告
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from refactoring_demo import create_comparison_report
+from report_engine import ScanCache, count_lines, iter_source_files, scan_files, write_report
+
+
+class TestReportEngine(unittest.TestCase):
+    """测试报告引擎"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_count_lines_matches_readlines(self):
+        """测试各种结尾和分块边界下与 readlines 一致"""
+        for content in ("", "a", "a\n", "a\nb", "a\n\n", "\n" * 10, "ab\n" * 7):
+            path = self.write("f.txt", content)
+            with open(path, encoding="utf-8") as f:
+                expected = len(f.readlines())
+            for chunk_size in (1, 2, 3, 1024):
+                self.assertEqual(count_lines(path, chunk_size), expected, repr(content))
+
+    def test_scan_cache_skips_unchanged_files(self):
+        """测试未改动的文件命中缓存，改动后重新统计"""
+        a = self.write("v1/a.py", "x\ny\n")
+        self.write("v2/b.py", "z\n")
+        self.write(".hidden/c.py", "ignored\n")
+        cache_path = os.path.join(self.root, "cache.json")
+        paths = list(iter_source_files(self.root))
+        self.assertEqual(len(paths), 2)
+
+        cache = ScanCache(cache_path)
+        results, hits = scan_files(paths, cache)
+        cache.save()
+        self.assertEqual(hits, 0)
+        self.assertEqual(results[a]["lines"], 2)
+
+        cache = ScanCache(cache_path)
+        _, hits = scan_files(paths, cache)
+        self.assertEqual(hits, 2)
+
+        self.write("v1/a.py", "x\ny\nz\n")
+        os.utime(a, ns=(time.time_ns(), time.time_ns() + 10**9))
+        results, hits = scan_files(paths + [os.path.join(self.root, "gone.py")], cache)
+        self.assertEqual(hits, 1)
+        self.assertEqual(results[a]["lines"], 3)
+        self.assertEqual(len(results), 2)
+
+    def test_comparison_report_prunes_removed_files(self):
+        """测试重新生成报告时丢弃已删除文件的扫描缓存条目"""
+        keep = self.write("repo/keep.py", "x = 1\n")
+        gone = self.write("repo/gone.py", "y = 2\n")
+        cache_path = os.path.join(self.root, "scan.json")
+        options = dict(output=os.path.join(self.root, "report.md"),
+                       root=os.path.join(self.root, "repo"), cache_path=cache_path,
+                       metrics_cache_path=os.path.join(self.root, "metrics.json"))
+        create_comparison_report(**options)
+        self.assertIn(gone, ScanCache(cache_path).entries)
+
+        os.remove(gone)
+        create_comparison_report(**options)
+        entries = ScanCache(cache_path).entries
+        self.assertIn(keep, entries)
+        self.assertNotIn(gone, entries)
+
+    def test_write_report_is_atomic(self):
+        """测试生成中途失败时保留旧报告"""
+        path = os.path.join(self.root, "report.md")
+        write_report(path, iter(["# a\n", "## b\n"]))
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "# a\n## b\n")
+        # 与普通新建文件相同，按 umask 设置权限
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o666 & ~umask)
+
+        def failing():
+            yield "# new\n"
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            write_report(path, failing())
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "# a\n## b\n")
+        self.assertEqual(sorted(os.listdir(self.root)), ["report.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
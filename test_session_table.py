@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多会话统计表单元测试
+==================
+
+验证 SlottedGameStatistics 与 SessionTable 的计数语义和内存上限
+"""
+
+import os
+import sys
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from session_table import SessionTable, SlottedGameStatistics, run_benchmark
+
+
+class TestSlottedGameStatistics(unittest.TestCase):
+    """测试 __slots__ 版本的统计"""
+
+    def test_counters(self):
+        """测试输入、关卡与准确率统计"""
+        stats = SlottedGameStatistics()
+        self.assertEqual(stats.get_accuracy(), 100.0)
+        stats.record_correct_input()
+        stats.record_correct_input()
+        stats.record_incorrect_input()
+        self.assertEqual(stats.total_chars, 3)
+        self.assertEqual(stats.max_combo, 2)
+        self.assertEqual(stats.score, 0)
+        self.assertAlmostEqual(stats.get_accuracy(), 200 / 3)
+        stats.complete_level()
+        self.assertEqual(stats.current_level, 2)
+        self.assertEqual(stats.score, 1)
+
+    def test_no_instance_dict(self):
+        """测试实例没有 __dict__"""
+        with self.assertRaises(AttributeError):
+            SlottedGameStatistics().extra = 1
+
+
+class TestSessionTable(unittest.TestCase):
+    """测试结构数组会话表"""
+
+    def test_views_are_independent(self):
+        """测试不同行互不影响，且共享同一个配置"""
+        config = {"max_levels": 10}
+        table = SessionTable(config)
+        a = table.new_statistics()
+        b = table.new_statistics()
+        a.record_correct_input()
+        a.complete_level()
+        b.record_incorrect_input()
+        self.assertEqual((a.correct_chars, a.current_level, a.score), (1, 2, 1))
+        self.assertEqual((b.incorrect_chars, b.current_level, b.score), (1, 1, 0))
+        self.assertIs(a.config, b.config)
+        self.assertEqual(len(table), 2)
+
+    def test_free_rows_are_reused_and_reset(self):
+        """测试释放的行被复用并重新初始化"""
+        table = SessionTable()
+        stats = table.new_statistics()
+        stats.complete_level()
+        row = stats.row
+        stats.release()
+        self.assertEqual(len(table), 0)
+        with self.assertRaises(KeyError):
+            table.view(row)
+        reused = table.new_statistics()
+        self.assertEqual(reused.row, row)
+        self.assertEqual(reused.current_level, 1)
+        self.assertEqual(reused.score, 0)
+
+    def test_capacity_bound(self):
+        """测试超出容量上限时拒绝分配"""
+        table = SessionTable(max_sessions=2)
+        table.allocate()
+        table.allocate()
+        with self.assertRaises(MemoryError):
+            table.allocate()
+
+    def test_memory_per_session(self):
+        """测试每个会话的内存低于普通对象"""
+        result = run_benchmark(2000)
+        self.assertLess(result["slots"], result["dict"])
+        self.assertLess(result["table"], result["slots"])
+        self.assertLessEqual(result["table"] / 2000, 64)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量计分单元测试
+==============
+
+验证 typing_scoring 的运行值与浏览器逐字重扫结果一致
+"""
+
+import os
+import random
+import sys
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from typing_scoring import (
+    BACKSPACE, KeystrokeResult, ScoringService, ScoringSession, rescan_stats
+)
+
+
+class TestScoringSession(unittest.TestCase):
+    """测试单段文本计分"""
+
+    def setUp(self):
+        self.session = ScoringSession("abc", clock=lambda: 0.0)
+
+    def test_initial_state(self):
+        """测试初始状态"""
+        self.assertEqual(self.session.errors, 0)
+        self.assertEqual(self.session.total_chars, 0)
+        self.assertEqual(self.session.get_accuracy(), 100.0)
+        self.assertEqual(self.session.get_wpm(), 0.0)
+
+    def test_correct_and_incorrect(self):
+        """测试正确与错误输入"""
+        self.assertEqual(self.session.type_char("a"), KeystrokeResult.CORRECT)
+        self.assertEqual(self.session.type_char("x"), KeystrokeResult.INCORRECT)
+        self.assertEqual(self.session.errors, 1)
+        self.assertEqual(self.session.combo, 0)
+        self.assertEqual(self.session.max_combo, 1)
+        self.assertAlmostEqual(self.session.get_accuracy(), 50.0)
+
+    def test_backspace_corrects_error(self):
+        """测试退格改正错误后 errors 减少，按键计数不变"""
+        self.session.feed("ax")
+        self.assertEqual(self.session.type_char(BACKSPACE), KeystrokeResult.BACKSPACE)
+        self.assertEqual(self.session.errors, 0)
+        self.assertEqual(self.session.incorrect_chars, 1)
+        self.assertEqual(self.session.feed("bc"), KeystrokeResult.COMPLETE)
+        self.assertTrue(self.session.is_complete)
+        self.assertEqual(self.session.type_char("d"), KeystrokeResult.IGNORED)
+
+    def test_wpm(self):
+        """测试 WPM 按 5 字符一词计算"""
+        session = ScoringSession("a" * 10)
+        for i in range(10):
+            session.type_char("a", now=i * 6.0 / 9)
+        # 10 字符 = 2 词，用时 6 秒 = 0.1 分钟
+        self.assertAlmostEqual(session.get_wpm(), 20.0)
+
+    def test_matches_rescan(self):
+        """测试随机按键序列下与逐字重扫结果一致"""
+        rng = random.Random(7)
+        text = "the quick brown fox jumps over the lazy dog"
+        session = ScoringSession(text, clock=lambda: 0.0)
+        typed = []
+        for _ in range(200):
+            roll = rng.random()
+            if roll < 0.1:
+                key = BACKSPACE
+                if typed:
+                    typed.pop()
+            elif len(typed) < len(text):
+                key = text[len(typed)] if roll < 0.8 else "#"
+                typed.append(key)
+            else:
+                continue
+            session.type_char(key)
+            self.assertEqual(session.errors, rescan_stats(typed, text)[0])
+
+    def test_empty_text_rejected(self):
+        """测试空文本"""
+        with self.assertRaises(ValueError):
+            ScoringSession("")
+
+
+class TestScoringService(unittest.TestCase):
+    """测试会话管理"""
+
+    def test_lifecycle(self):
+        """测试创建、追加、读取与关闭"""
+        service = ScoringService()
+        session_id, snapshot = service.create("hello")
+        self.assertEqual(snapshot["length"], 5)
+        snapshot = service.feed(session_id, "hex\bl")
+        self.assertEqual(snapshot["position"], 3)
+        self.assertEqual(snapshot["errors"], 0)
+        self.assertEqual(service.get(session_id)["incorrect_chars"], 1)
+        self.assertTrue(service.close(session_id))
+        self.assertIsNone(service.feed(session_id, "l"))
+
+    def test_evicts_oldest(self):
+        """测试超过上限时淘汰最久未使用的会话"""
+        service = ScoringService(max_sessions=2)
+        first, _ = service.create("a")
+        second, _ = service.create("b")
+        service.feed(first, "a")
+        service.create("c")
+        self.assertIsNotNone(service.get(first))
+        self.assertIsNone(service.get(second))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+暖启动器单元测试
+==============
+
+验证冷 / 暖启动都以 __main__ 身份执行脚本并报告就绪耗时
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from refactoring_demo import launch_game
+from warm_launcher import WarmLauncher, cold_run
+
+SCRIPT = '''import os, sys
+if __name__ == "__main__":
+    with open(os.path.join(os.path.dirname(sys.argv[0]), "ran.txt"), "w") as f:
+        f.write(__name__)
+    sys.exit(3)
+'''
+
+
+class TestWarmLauncher(unittest.TestCase):
+    """测试游戏脚本的启动方式"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.script = os.path.join(self._tmp.name, "game.py")
+        with open(self.script, "w", encoding="utf-8") as f:
+            f.write(SCRIPT)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def assert_ran(self, result, mode):
+        self.assertEqual(result.mode, mode)
+        self.assertEqual(result.exit_code, 3)
+        self.assertGreater(result.ready_s, 0)
+        with open(os.path.join(self._tmp.name, "ran.txt")) as f:
+            self.assertEqual(f.read(), "__main__")
+
+    def test_cold_run(self):
+        """测试新解释器启动"""
+        self.assert_ran(cold_run(self.script, ("json",)), "cold")
+
+    def test_warm_run(self):
+        """测试从 forkserver fork 启动，可以重复运行"""
+        launcher = WarmLauncher(("json",))
+        if not launcher.available:
+            self.skipTest("forkserver not available")
+        launcher.start_in_background()
+        self.assert_ran(launcher.run(self.script), "warm")
+        os.unlink(os.path.join(self._tmp.name, "ran.txt"))
+        self.assert_ran(launcher.run(self.script), "warm")
+
+    def test_launch_game_records_timings(self):
+        """测试演示菜单记录启动耗时，缺失的脚本直接提示"""
+        timings = {}
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            launch_game(self.script, "测试版本", None, timings)
+            self.assertIsNone(launch_game(self.script + ".missing", "缺失版本"))
+        self.assertEqual(len(timings["cold"]), 1)
+        self.assertIn("启动耗时", out.getvalue())
+        self.assertIn("找不到", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+线程模式 HTTP 服务引擎
+===================
+
+play.py 默认引擎：单线程 TCPServer，或线程池 + HTTP/1.1 持久连接。
+http.server 会连带导入 http.client 和 email 等模块，启动器只在
+真正使用该引擎时才导入本模块。
+"""
+
+import http.server
+import json
+import os
+import socketserver
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asset_cache import cached_response, request_conditions, response_plan
+from file_delivery import DEFAULT_DELIVERY, file_etag, write_file_parts
+from instrumentation import METRICS_PATH, PROMETHEUS_CONTENT_TYPE
+from pack_store import PACKS_URL
+from scoring_api import api_response, body_length, is_api_request
+from typing_scoring import ScoringService
+
+# 持久连接空闲超时（秒），防止空闲连接长期占用工作线程
+KEEPALIVE_TIMEOUT = 5
+
+
+class QuietHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """静默日志的静态文件处理器
+
+    服务器带有 asset_cache 时优先从内存缓存返回，未命中再回落到磁盘。
+    /api/score 下是计分会话的 JSON 接口，/api/segments 只返回文本分段
+    （页面在本地计分，不需要会话），两者的逻辑在 scoring_api 中；服务器带有 metrics 时
+    /metrics 提供 Prometheus 文本格式的热点延迟直方图；服务器带有
+    packs（pack_store.PackStore）时 /packs/ 下提供预构建的文本包。
+
+    内存资源和磁盘上的普通文件都支持条件请求与单段 / 多段 Range；
+    磁盘文件按服务器的 file_delivery 方式（默认 os.sendfile）发送。
+    目录（重定向、index.html、目录列表）仍交给 SimpleHTTPRequestHandler。
+    """
+
+    def __init__(self, *args, **kwargs):
+        server = args[2] if len(args) > 2 else kwargs.get("server")
+        kwargs.setdefault("directory", getattr(server, "directory", None))
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass  # 静默日志输出
+
+    def do_GET(self):
+        if is_api_request("GET", self.path.split("?", 1)[0]):
+            self.handle_api()
+        elif self.path == METRICS_PATH and getattr(self.server, "metrics", None):
+            self.send_metrics()
+        elif self.path.startswith(PACKS_URL) and getattr(self.server, "packs", None):
+            self.send_pack()
+        elif not self.send_cached_asset() and not self.send_file():
+            super().do_GET()
+
+    def do_POST(self):
+        if is_api_request("POST", self.path.split("?", 1)[0]):
+            self.handle_api()
+        else:
+            self.send_error(501, "Unsupported method (POST)")
+
+    def do_DELETE(self):
+        if is_api_request("DELETE", self.path.split("?", 1)[0]):
+            self.handle_api()
+        else:
+            self.send_error(501, "Unsupported method (DELETE)")
+
+    def do_HEAD(self):
+        if self.path.startswith(PACKS_URL) and getattr(self.server, "packs", None):
+            self.send_pack(head_only=True)
+        elif (not self.send_cached_asset(head_only=True)
+              and not self.send_file(head_only=True)):
+            super().do_HEAD()
+
+    def send_json(self, status, payload=None):
+        """发送 JSON 响应"""
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_metrics(self):
+        """发送 Prometheus 文本格式的指标"""
+        body = self.server.metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_api(self):
+        """计分与分段接口（见 scoring_api），读取请求体后交给共用的处理逻辑"""
+        length, error = body_length(self.headers.get("Content-Length"))
+        if error:
+            self.send_json(*error)
+            return
+        body = self.rfile.read(length) if length else b""
+        self.send_json(*api_response(getattr(self.server, "scoring", None),
+                                     self.command, self.path.split("?", 1)[0], body))
+
+    def send_pack(self, head_only=False):
+        """发送文本包或其 manifest"""
+        packs = self.server.packs
+        asset = packs.get(self.path)
+        if asset is None:
+            self.send_error(404, "File not found")
+        else:
+            self.send_asset(packs, asset, head_only)
+
+    def send_cached_asset(self, head_only=False):
+        """从内存缓存发送文件，未命中时返回 False"""
+        cache = getattr(self.server, "asset_cache", None)
+        if cache is None:
+            return False
+        asset = cache.get(self.translate_path(self.path))
+        if asset is None:
+            return False
+        self.send_asset(cache, asset, head_only)
+        return True
+
+    def send_asset(self, cache, asset, head_only=False):
+        """发送内存中的资源，处理编码协商、条件请求与 Range"""
+        status, headers, body = cached_response(
+            cache, asset, self.headers.get("Accept-Encoding"),
+            self.headers.get("If-None-Match"), request_conditions(self.headers))
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if body and not head_only:
+            self.wfile.write(body)
+
+    def send_file(self, head_only=False):
+        """从磁盘发送普通文件，目录或无法打开的文件返回 False"""
+        url_path = self.path.split("?", 1)[0].split("#", 1)[0]
+        path = self.translate_path(self.path)
+        if url_path.endswith("/") or os.path.isdir(path):
+            return False
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return False
+        with f:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                return False
+            etag = file_etag(st)
+            status, headers, parts, tail = response_plan(
+                request_conditions(self.headers), st.st_size, etag, st.st_mtime,
+                self.guess_type(path))
+            self.send_response(status)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", self.date_time_string(int(st.st_mtime)))
+            if status != 304:
+                self.send_header("Accept-Ranges", "bytes")
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if parts and not head_only:
+                write_file_parts(self.connection, self.wfile, f, parts, tail,
+                                 getattr(self.server, "file_delivery", DEFAULT_DELIVERY))
+        return True
+
+
+class KeepAliveHTTPRequestHandler(QuietHTTPRequestHandler):
+    """支持 HTTP/1.1 持久连接的静态文件处理器"""
+
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+    # 响应头与正文分两次写出，关闭 Nagle 避免持久连接上的 40ms 延迟确认停顿
+    disable_nagle_algorithm = True
+
+
+class ThreadPoolHTTPServer(socketserver.TCPServer):
+    """线程池 HTTP 服务器
+
+    主线程只负责 accept，连接交给固定大小的线程池处理。
+    没有空闲工作线程时暂停 accept，新连接留在内核的监听队列中，
+    队列长度由 backlog 限定。
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=8,
+                 backlog=64, bind_and_activate=True):
+        self.request_queue_size = backlog
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers)
+        self._pool = ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix="http-worker")
+        super().__init__(server_address, handler_class, bind_and_activate)
+
+    def process_request(self, request, client_address):
+        """把连接交给线程池，所有工作线程都忙时阻塞 accept"""
+        self._slots.acquire()
+        try:
+            self._pool.submit(self._process_request_worker, request, client_address)
+        except RuntimeError:
+            # 线程池已关闭
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_server(port, workers=None, backlog=64, host="",
+                  asset_cache=None, sock=None, metrics=None, packs=None,
+                  directory=None, file_delivery=DEFAULT_DELIVERY):
+    """创建HTTP服务器
+
+    workers 为空时沿用单线程 TCPServer（HTTP/1.0，逐个处理请求）；
+    否则使用线程池 + HTTP/1.1 持久连接。
+    asset_cache 不为空时静态文件从内存缓存提供。
+    sock 为已经绑定并监听的套接字时直接接管它，不再自行绑定端口。
+    metrics 为 instrumentation.Registry 时在 /metrics 导出。
+    packs 为 pack_store.PackStore 时在 /packs/ 下提供文本包。
+    directory 为静态文件根目录，为空时使用当前目录；file_delivery 为
+    磁盘文件的发送方式（见 file_delivery.DELIVERY_MODES）。
+    """
+    bind = sock is None
+    if workers:
+        httpd = ThreadPoolHTTPServer((host, port), KeepAliveHTTPRequestHandler,
+                                     workers=workers, backlog=backlog,
+                                     bind_and_activate=bind)
+    else:
+        httpd = socketserver.TCPServer((host, port), QuietHTTPRequestHandler,
+                                       bind_and_activate=bind)
+    if not bind:
+        httpd.socket.close()
+        httpd.socket = sock
+        httpd.server_address = sock.getsockname()
+    httpd.asset_cache = asset_cache
+    httpd.metrics = metrics
+    httpd.packs = packs
+    httpd.directory = directory
+    httpd.file_delivery = file_delivery
+    httpd.scoring = ScoringService()
+    return httpd
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量打字计分引擎
+==============
+
+与 GameStatistics / InputHandler 的接口保持一致的服务端计分模块。
+浏览器的 calculateStats() 每次按键都重新比对整段输入，
+这里把错误数、准确率、WPM 和连击都维护成运行值，每次按键 O(1) 更新。
+"""
+
+import argparse
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+
+# 退格在按键序列中的表示
+BACKSPACE = "\b"
+# 每个"单词"按 5 个字符计算（与浏览器 WPM 算法一致）
+CHARS_PER_WORD = 5
+# 服务端同时保留的最大会话数
+MAX_SESSIONS = 1000
+
+
+class KeystrokeResult(Enum):
+    """单次按键的判定结果"""
+    CORRECT = "correct"
+    INCORRECT = "incorrect"
+    BACKSPACE = "backspace"
+    COMPLETE = "complete"
+    IGNORED = "ignored"
+
+
+class ScoringSession:
+    """单段文本的增量计分
+
+    计数器语义与 GameStatistics 相同：correct_chars / incorrect_chars /
+    total_chars 统计全部按键，退格不会减少它们；errors 则是当前输入中
+    尚未改正的错误数，与浏览器 calculateStats() 中的 errors 一致。
+    """
+
+    __slots__ = ("text", "_clock", "_marks", "errors", "correct_chars",
+                 "incorrect_chars", "combo", "max_combo", "start_time", "last_time")
+
+    def __init__(self, text, clock=time.monotonic):
+        if not text:
+            raise ValueError("text must not be empty")
+        self.text = text
+        self._clock = clock
+        # 当前输入每个位置是否正确（1 正确 / 0 错误）
+        self._marks = bytearray()
+        self.errors = 0
+        self.correct_chars = 0
+        self.incorrect_chars = 0
+        self.combo = 0
+        self.max_combo = 0
+        self.start_time = None
+        self.last_time = None
+
+    @property
+    def total_chars(self):
+        return self.correct_chars + self.incorrect_chars
+
+    @property
+    def position(self):
+        """当前输入长度"""
+        return len(self._marks)
+
+    @property
+    def is_complete(self):
+        return len(self._marks) >= len(self.text)
+
+    def type_char(self, char, now=None):
+        """处理一次字符输入或退格"""
+        if now is None:
+            now = self._clock()
+        if self.start_time is None:
+            self.start_time = now
+        self.last_time = now
+
+        if char == BACKSPACE:
+            if self._marks and not self._marks.pop():
+                self.errors -= 1
+            return KeystrokeResult.BACKSPACE
+        if self.is_complete:
+            return KeystrokeResult.IGNORED
+
+        if char == self.text[len(self._marks)]:
+            self._marks.append(1)
+            self.correct_chars += 1
+            self.combo += 1
+            if self.combo > self.max_combo:
+                self.max_combo = self.combo
+            result = KeystrokeResult.CORRECT
+        else:
+            self._marks.append(0)
+            self.errors += 1
+            self.incorrect_chars += 1
+            self.combo = 0
+            result = KeystrokeResult.INCORRECT
+        return KeystrokeResult.COMPLETE if self.is_complete else result
+
+    def feed(self, keys, now=None):
+        """依次处理一串按键，返回最后一次的判定结果"""
+        result = None
+        for char in keys:
+            result = self.type_char(char, now)
+        return result
+
+    def get_accuracy(self):
+        """按键准确率（百分比），没有输入时为 100"""
+        total = self.total_chars
+        if total == 0:
+            return 100.0
+        return self.correct_chars / total * 100
+
+    def get_wpm(self, now=None):
+        """当前输入长度折算的每分钟单词数"""
+        if self.start_time is None:
+            return 0.0
+        if now is None:
+            now = self.last_time
+        minutes = (now - self.start_time) / 60
+        if minutes <= 0:
+            return 0.0
+        return len(self._marks) / CHARS_PER_WORD / minutes
+
+    def get_progress(self):
+        """完成进度（百分比）"""
+        return len(self._marks) / len(self.text) * 100
+
+    def snapshot(self, now=None):
+        """返回可直接序列化为 JSON 的统计快照"""
+        return {
+            "position": len(self._marks),
+            "length": len(self.text),
+            "errors": self.errors,
+            "correct_chars": self.correct_chars,
+            "incorrect_chars": self.incorrect_chars,
+            "accuracy": round(self.get_accuracy(), 2),
+            "wpm": round(self.get_wpm(now), 1),
+            "combo": self.combo,
+            "max_combo": self.max_combo,
+            "progress": round(self.get_progress(), 2),
+            "complete": self.is_complete,
+        }
+
+
+class ScoringService:
+    """按会话 ID 管理 ScoringSession，供 HTTP 接口使用
+
+    超过 max_sessions 时淘汰最久未使用的会话。所有方法线程安全。
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, text):
+        """创建会话，返回 (会话ID, 快照)"""
+        session = ScoringSession(text, self._clock)
+        with self._lock:
+            session_id = str(next(self._ids))
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id, session.snapshot()
+
+    def feed(self, session_id, keys):
+        """向会话追加按键，会话不存在时返回 None"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            session.feed(keys)
+            return session.snapshot()
+
+    def get(self, session_id):
+        """读取会话快照，会话不存在时返回 None"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return None if session is None else session.snapshot(self._clock())
+
+    def close(self, session_id):
+        """删除会话，返回是否存在"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+def rescan_stats(user_input, text):
+    """浏览器 calculateStats() 的逐字重扫算法，用作基准对照"""
+    errors = 0
+    for i in range(len(user_input)):
+        if user_input[i] != text[i]:
+            errors += 1
+    accuracy = (len(user_input) - errors) / len(user_input) * 100 if user_input else 100
+    return errors, accuracy
+
+
+def make_passage(length):
+    """生成指定长度的练习文本"""
+    words = ("the quick brown fox jumps over the lazy dog while students "
+             "practice typing every morning before class").split()
+    parts = []
+    size = 0
+    for word in itertools.cycle(words):
+        parts.append(word)
+        size += len(word) + 1
+        if size >= length:
+            break
+    return " ".join(parts)[:length]
+
+
+def run_benchmark(length=10_000, error_every=37):
+    """在 length 字符的文本上比较增量计分与逐字重扫，返回每次按键耗时（微秒）"""
+    text = make_passage(length)
+    keys = [("#" if i % error_every == 0 else c) for i, c in enumerate(text)]
+
+    session = ScoringSession(text, clock=lambda: 0.0)
+    began = time.perf_counter()
+    for i, key in enumerate(keys):
+        session.type_char(key, now=i * 0.2)
+        session.snapshot()
+    incremental = (time.perf_counter() - began) / len(keys) * 1e6
+
+    typed = []
+    began = time.perf_counter()
+    for key in keys:
+        typed.append(key)
+        rescan_stats(typed, text)
+    rescan = (time.perf_counter() - began) / len(keys) * 1e6
+
+    return {"length": length, "incremental_us": incremental, "rescan_us": rescan,
+            "errors": session.errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental typing scorer benchmark")
+    parser.add_argument("--length", type=int, default=10_000,
+                        help="passage length in characters (default: %(default)s)")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.length)
+    print(f"📊 Scoring {result['length']} keystrokes ({result['errors']} errors)")
+    print(f"   incremental: {result['incremental_us']:8.2f} µs/keystroke")
+    print(f"   full rescan: {result['rescan_us']:8.2f} µs/keystroke")
+    print(f"   speedup:     {result['rescan_us'] / result['incremental_us']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
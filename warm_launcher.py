@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+暖启动器
+======
+
+refactoring_demo.py 的菜单每次运行游戏都用 subprocess 启动一个新解释器，
+要重新付出解释器启动和导入 tkinter 的时间。WarmLauncher 使用
+multiprocessing 的 forkserver：服务进程启动时预先导入 PRELOAD_MODULES，
+之后每次运行都从这个已经导入完毕的进程 fork 出子进程，再以 __main__
+身份执行游戏脚本。
+
+启动耗时统一按“发出请求 → 子进程即将执行脚本代码”计算，冷启动与
+暖启动使用同一个子进程入口，数字可以直接比较。
+
+    python3 warm_launcher.py              # 冷 / 暖启动耗时对比
+    python3 warm_launcher.py --runs 20
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from multiprocessing.connection import Connection
+
+# 游戏脚本会用到的模块，在 forkserver 中预先导入
+PRELOAD_MODULES = ("tkinter", "tkinter.messagebox", "tkinter.font",
+                   "random", "json", "logging")
+
+LaunchResult = namedtuple("LaunchResult", "mode ready_s exit_code")
+
+
+def _import_modules(modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def _run_script(script, modules, ready):
+    """子进程入口：导入依赖后通知就绪，再以 __main__ 身份执行脚本
+
+    暖启动时依赖已在 forkserver 中导入，这里只是查 sys.modules。
+    """
+    _import_modules(modules)
+    ready.send_bytes(b"1")
+    ready.close()
+    script = os.path.abspath(script)
+    sys.argv = [script]
+    sys.path.insert(0, os.path.dirname(script))
+    runpy.run_path(script, run_name="__main__")
+
+
+def _wait_ready(reader, began):
+    """等待子进程就绪，返回耗时；子进程在就绪前退出时返回 None"""
+    try:
+        reader.recv_bytes()
+    except EOFError:
+        return None
+    finally:
+        reader.close()
+    return time.perf_counter() - began
+
+
+def cold_launch(script, modules=PRELOAD_MODULES):
+    """以新解释器启动脚本，返回 (Popen, 就绪耗时)"""
+    reader, writer = multiprocessing.Pipe(duplex=False)
+    began = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--exec", script,
+         "--ready-fd", str(writer.fileno()), "--modules", ",".join(modules)],
+        pass_fds=(writer.fileno(),))
+    writer.close()
+    return proc, _wait_ready(reader, began)
+
+
+def cold_run(script, modules=PRELOAD_MODULES):
+    """冷启动并等待脚本退出"""
+    proc, ready_s = cold_launch(script, modules)
+    try:
+        exit_code = proc.wait()
+    except KeyboardInterrupt:
+        proc.terminate()
+        proc.wait()
+        raise
+    return LaunchResult("cold", ready_s, exit_code)
+
+
+class WarmLauncher:
+    """从预先导入依赖的 forkserver 进程 fork 出游戏进程
+
+    平台不支持 forkserver（如 Windows）时 available 为 False，
+    run() 退回冷启动。
+    """
+
+    def __init__(self, modules=PRELOAD_MODULES):
+        self.modules = tuple(modules)
+        self.available = "forkserver" in multiprocessing.get_all_start_methods()
+        self._ctx = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动 forkserver 并完成预导入，返回耗时；重复调用无开销
+
+        可以在后台线程中提前调用，launch() 会等待它完成。
+        """
+        with self._lock:
+            if self._ctx is not None or not self.available:
+                return 0.0
+            began = time.perf_counter()
+            ctx = multiprocessing.get_context("forkserver")
+            ctx.set_forkserver_preload(list(self.modules))
+            # forkserver 在第一次创建进程时才启动，这里用一个空进程把它拉起来
+            proc = ctx.Process(target=_import_modules, args=((),))
+            proc.start()
+            proc.join()
+            self._ctx = ctx
+            return time.perf_counter() - began
+
+    def start_in_background(self):
+        """在守护线程中启动 forkserver，不阻塞调用方"""
+        threading.Thread(target=self.start, daemon=True).start()
+
+    def launch(self, script):
+        """从暖进程启动脚本，返回 (Process, 就绪耗时)"""
+        self.start()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        began = time.perf_counter()
+        proc = self._ctx.Process(target=_run_script,
+                                 args=(script, self.modules, writer))
+        proc.start()
+        writer.close()
+        return proc, _wait_ready(reader, began)
+
+    def run(self, script):
+        """启动脚本并等待退出，返回 LaunchResult"""
+        if not self.available:
+            return cold_run(script, self.modules)
+        proc, ready_s = self.launch(script)
+        try:
+            proc.join()
+        except KeyboardInterrupt:
+            proc.terminate()
+            proc.join()
+            raise
+        return LaunchResult("warm", ready_s, proc.exitcode)
+
+
+def run_benchmark(runs=10, modules=PRELOAD_MODULES):
+    """比较冷启动与暖启动的就绪耗时（毫秒中位数）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, "noop_game.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write("import tkinter\n")
+
+        cold = [cold_run(script, modules).ready_s for _ in range(runs)]
+        launcher = WarmLauncher(modules)
+        startup_s = launcher.start()
+        warm = [launcher.run(script).ready_s for _ in range(runs)]
+
+    def median_ms(samples):
+        return statistics.median(samples) * 1000
+
+    return {"runs": runs, "cold_ms": median_ms(cold), "warm_ms": median_ms(warm),
+            "startup_ms": startup_s * 1000, "mode": "warm" if launcher.available else "cold"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs warm launch benchmark")
+    parser.add_argument("--runs", type=int, default=10,
+                        help="launches per mode (default: %(default)s)")
+    parser.add_argument("--exec", dest="script", help=argparse.SUPPRESS)
+    parser.add_argument("--ready-fd", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--modules", default=",".join(PRELOAD_MODULES),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.script:
+        # cold_launch() 的子进程
+        _run_script(args.script, [m for m in args.modules.split(",") if m],
+                    Connection(args.ready_fd, readable=False))
+        return
+
+    r = run_benchmark(args.runs)
+    print(f"📊 launch latency, median of {r['runs']} runs ({r['mode']} launcher)")
+    print(f"   cold (new interpreter)   {r['cold_ms']:8.1f} ms")
+    print(f"   warm (fork from server)  {r['warm_ms']:8.1f} ms")
+    print(f"   one-off forkserver start {r['startup_ms']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()